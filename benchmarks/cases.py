@@ -0,0 +1,309 @@
+import copy
+import glob
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import torch
+
+from vibevoice.modular.modeling_vibevoice_streaming_inference import (
+    VibeVoiceStreamingForConditionalGenerationInference,
+    clone_prefilled_outputs,
+)
+from vibevoice.modular.modular_vibevoice_tokenizer import SConv1d, SConvTranspose1d, VibeVoiceTokenizerStreamingCache
+from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+
+SAMPLE_RATE = 24000
+DEMO_VOICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo", "voices", "streaming_model")
+
+# Fixed texts so that numbers are comparable between commits.
+SHORT_TEXT = "Hello there, how can I help you today?"
+LONG_TEXT = (
+    "VibeVoice is a novel framework designed for generating expressive, long-form, multi-speaker "
+    "conversational audio, such as podcasts, from text. It addresses significant challenges in "
+    "traditional Text-to-Speech systems, particularly in scalability, speaker consistency, and "
+    "natural turn-taking."
+)
+
+
+@dataclass
+class Context:
+    model: VibeVoiceStreamingForConditionalGenerationInference
+    processor: VibeVoiceStreamingProcessor
+    voice_preset: Dict[str, Any]
+    cfg_scale: float = 1.5
+    seed: int = 0
+
+    @property
+    def device(self) -> torch.device:
+        return self.model.device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return self.model.dtype
+
+
+@dataclass
+class Case:
+    """
+    One timed call. `run` is repeated; `calls` is how many operations one run performs (the value
+    is the time per operation). With `unit="rtf"`, `run` returns the seconds of audio it produced
+    and the value is the real-time factor instead of milliseconds.
+    """
+    run: Callable[[], Optional[float]]
+    unit: str = "ms"
+    calls: int = 1
+
+
+def load_context(model_path: Optional[str], device: str, voice: Optional[str] = None, seed: int = 0) -> Context:
+    """Load `model_path`, or build the tiny random-weight model in memory when it is None."""
+    if model_path is None:
+        from vibevoice.scripts.tiny_model import build_tiny
+
+        model, processor, presets = build_tiny(seed=seed, device=device)
+        preset = presets[voice] if voice else next(iter(presets.values()))
+    else:
+        if device == "cuda":
+            load_dtype, attn_impl = torch.bfloat16, "flash_attention_2"
+        else:
+            load_dtype, attn_impl = torch.float32, "sdpa"
+        processor = VibeVoiceStreamingProcessor.from_pretrained(model_path)
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            model_path, torch_dtype=load_dtype, device_map=None, attn_implementation=attn_impl,
+        )
+        model.to(device)
+        voices_dir = os.path.join(model_path, "voices")
+        if not os.path.isdir(voices_dir):
+            voices_dir = DEMO_VOICES
+        paths = sorted(glob.glob(os.path.join(voices_dir, "*.pt")))
+        if voice:
+            paths = [path for path in paths if os.path.splitext(os.path.basename(path))[0] == voice]
+        if not paths:
+            raise RuntimeError(f"No voice preset {voice or '(.pt)'} found in {voices_dir}")
+        preset = torch.load(paths[0], map_location=device, weights_only=False)
+    model.eval()
+    model.set_ddpm_inference_steps(num_steps=5)
+    return Context(model=model, processor=processor, voice_preset=preset, seed=seed)
+
+
+def _decoder(ctx: Context):
+    return ctx.model.model.acoustic_tokenizer.decoder
+
+
+def _latent(ctx: Context, frames: int = 1) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(ctx.seed)
+    latent = torch.randn(1, frames, ctx.model.config.acoustic_vae_dim, generator=generator)
+    return latent.to(device=ctx.device, dtype=ctx.dtype)
+
+
+def _warm_decoder_cache(ctx: Context) -> VibeVoiceTokenizerStreamingCache:
+    # A few decoded frames fill every streaming convolution's context.
+    cache = VibeVoiceTokenizerStreamingCache()
+    indices = torch.LongTensor([0]).to(ctx.device)
+    for _ in range(4):
+        ctx.model.model.acoustic_tokenizer.decode(_latent(ctx), cache=cache, sample_indices=indices, use_cache=True)
+    return cache
+
+
+def streaming_cache(ctx: Context) -> Case:
+    """`get` then `set` of every layer state held during streaming decode."""
+    cache = _warm_decoder_cache(ctx)
+    layer_ids = sorted({layer_id for layer_id, _ in cache.cache})
+    indices = torch.LongTensor([0])
+
+    def run():
+        for layer_id in layer_ids:
+            cache.set(layer_id, indices, cache.get(layer_id, indices))
+
+    return Case(run, calls=len(layer_ids))
+
+
+def _first(ctx: Context, module_type: type):
+    for module in _decoder(ctx).modules():
+        if isinstance(module, module_type):
+            return module
+    raise RuntimeError(f"No {module_type.__name__} in the acoustic decoder")
+
+
+def _conv_step(ctx: Context, module_type: type) -> Case:
+    # The decoder's first layer of the type, fed one latent frame at a time as in `generate`.
+    conv = _first(ctx, module_type)
+    cache = VibeVoiceTokenizerStreamingCache()
+    indices = torch.LongTensor([0]).to(ctx.device)
+    x = torch.randn(1, conv.in_channels, 1, device=ctx.device, dtype=ctx.dtype)
+    conv(x, cache=cache, sample_indices=indices, use_cache=True)
+
+    def run():
+        conv(x, cache=cache, sample_indices=indices, use_cache=True)
+
+    return Case(run)
+
+
+def sconv1d_step(ctx: Context) -> Case:
+    return _conv_step(ctx, SConv1d)
+
+
+def sconv_transpose1d_step(ctx: Context) -> Case:
+    return _conv_step(ctx, SConvTranspose1d)
+
+
+def decoder_frame(ctx: Context) -> Case:
+    """One latent through the whole streaming acoustic decoder (3200 samples)."""
+    cache = _warm_decoder_cache(ctx)
+    indices = torch.LongTensor([0]).to(ctx.device)
+    latent = _latent(ctx)
+
+    def run():
+        ctx.model.model.acoustic_tokenizer.decode(latent, cache=cache, sample_indices=indices, use_cache=True)
+
+    return Case(run)
+
+
+def _conditions(ctx: Context):
+    condition = ctx.voice_preset["tts_lm"].last_hidden_state[:, -1, :]
+    neg_condition = ctx.voice_preset["neg_tts_lm"].last_hidden_state[:, -1, :]
+    return condition, neg_condition
+
+
+def diffusion_head_forward(ctx: Context) -> Case:
+    """One denoising call of the prediction head on the cfg batch (positive + negative)."""
+    condition = torch.cat(_conditions(ctx), dim=0)
+    noisy = torch.randn(2, ctx.model.config.acoustic_vae_dim, device=ctx.device, dtype=ctx.dtype)
+    timesteps = torch.full((2,), 500, device=ctx.device, dtype=ctx.dtype)
+
+    def run():
+        ctx.model.model.prediction_head(noisy, timesteps, condition=condition)
+
+    return Case(run)
+
+
+def sample_speech_tokens(ctx: Context) -> Case:
+    """One speech latent: all diffusion steps with classifier-free guidance."""
+    condition, neg_condition = _conditions(ctx)
+    scheduler = ctx.model.make_noise_scheduler()
+
+    def run():
+        ctx.model.sample_speech_tokens(condition, neg_condition, cfg_scale=ctx.cfg_scale, noise_scheduler=scheduler)
+
+    return Case(run)
+
+
+def dpm_solver_step(ctx: Context) -> Case:
+    """`DPMSolverMultistepScheduler.step` over a full trajectory with a fixed model output."""
+    scheduler = ctx.model.make_noise_scheduler()
+    steps = ctx.model.ddpm_inference_steps
+    sample = torch.randn(2, ctx.model.config.acoustic_vae_dim, device=ctx.device, dtype=ctx.dtype)
+    model_output = torch.randn_like(sample)
+
+    def run():
+        scheduler.set_timesteps(steps)
+        speech = sample
+        for t in scheduler.timesteps:
+            speech = scheduler.step(model_output, t, speech).prev_sample
+
+    return Case(run, calls=steps)
+
+
+def _incremental(ctx: Context, stream: str, forward: Callable[[Any, torch.Tensor], None], tokens: int) -> Case:
+    # Each run appends `tokens` to the voice prompt's cache and crops it back, so every run sees
+    # the same context length.
+    cache = copy.deepcopy(ctx.voice_preset[stream].past_key_values)
+    length = cache.get_seq_length()
+    cache_position = torch.arange(length, length + tokens, device=ctx.device)
+
+    def run():
+        forward(cache, cache_position)
+        cache.crop(length)
+
+    return Case(run)
+
+
+def forward_lm_window(ctx: Context) -> Case:
+    """Incremental `forward_lm` of one text window (5 tokens) on the voice prompt."""
+    input_ids = torch.randint(0, 256, (1, 5), device=ctx.device)
+
+    def forward(cache, cache_position):
+        ctx.model.forward_lm(
+            input_ids=input_ids, past_key_values=cache, cache_position=cache_position, use_cache=True, return_dict=True,
+        )
+
+    return _incremental(ctx, "lm", forward, input_ids.shape[1])
+
+
+def forward_tts_lm_step(ctx: Context) -> Case:
+    """Incremental `forward_tts_lm` of one speech token on the voice prompt."""
+    input_ids = torch.ones(1, 1, dtype=torch.long, device=ctx.device)
+    acoustic_embed = ctx.model.model.acoustic_connector(_latent(ctx))
+
+    def forward(cache, cache_position):
+        ctx.model.forward_tts_lm(
+            input_ids=input_ids,
+            past_key_values=cache,
+            cache_position=cache_position,
+            lm_last_hidden_state=acoustic_embed,
+            tts_text_masks=torch.zeros_like(input_ids),
+            use_cache=True,
+            return_dict=True,
+        )
+
+    return _incremental(ctx, "tts_lm", forward, 1)
+
+
+def processor_tokenize(ctx: Context) -> Case:
+    """`process_input_with_cached_prompt` of a paragraph."""
+    def run():
+        ctx.processor.process_input_with_cached_prompt(
+            text=LONG_TEXT, cached_prompt=ctx.voice_preset, padding=True, return_tensors="pt", return_attention_mask=True,
+        )
+
+    return Case(run)
+
+
+def _generate(ctx: Context, text: str) -> Case:
+    inputs = ctx.processor.process_input_with_cached_prompt(
+        text=text, cached_prompt=ctx.voice_preset, padding=True, return_tensors="pt", return_attention_mask=True,
+    )
+    inputs = {k: v.to(ctx.device) if torch.is_tensor(v) else v for k, v in inputs.items()}
+
+    def run():
+        # Same noise every run, so that (with the same weights) every run produces the same audio.
+        torch.manual_seed(ctx.seed)
+        outputs = ctx.model.generate(
+            **inputs,
+            max_new_tokens=None,
+            cfg_scale=ctx.cfg_scale,
+            tokenizer=ctx.processor.tokenizer,
+            generation_config={"do_sample": False},
+            show_progress_bar=False,
+            all_prefilled_outputs=clone_prefilled_outputs(ctx.voice_preset),
+        )
+        audio = outputs.speech_outputs[0]
+        return audio.shape[-1] / SAMPLE_RATE if audio is not None else 0.0
+
+    return Case(run, unit="rtf")
+
+
+def generate_short(ctx: Context) -> Case:
+    return _generate(ctx, SHORT_TEXT)
+
+
+def generate_long(ctx: Context) -> Case:
+    return _generate(ctx, LONG_TEXT)
+
+
+# Ordered from the innermost hot path outwards; `generate_*` report RTF, the rest ms per call.
+CASES: Dict[str, Callable[[Context], Case]] = {
+    "streaming_cache_get_set": streaming_cache,
+    "sconv1d_step": sconv1d_step,
+    "sconv_transpose1d_step": sconv_transpose1d_step,
+    "decoder_frame": decoder_frame,
+    "diffusion_head_forward": diffusion_head_forward,
+    "sample_speech_tokens": sample_speech_tokens,
+    "dpm_solver_step": dpm_solver_step,
+    "forward_lm_window": forward_lm_window,
+    "forward_tts_lm_step": forward_tts_lm_step,
+    "processor_tokenize": processor_tokenize,
+    "generate_short": generate_short,
+    "generate_long": generate_long,
+}
+
@@ -0,0 +1,59 @@
+import argparse
+import sys
+
+from results import RESULTS_DIR, git_commit, load_result, machine_key
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results and flag regressions")
+    parser.add_argument("base", type=str, help="Baseline: a results JSON file or a git revision")
+    parser.add_argument("head", type=str, nargs="?", default=None, help="Candidate: a results JSON file or a git revision (default: the working tree)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown of the median that counts as a regression")
+    parser.add_argument("--device", type=str, default="cpu", help="Device of the results, for the default machine key")
+    parser.add_argument("--machine", type=str, default=None, help="Machine key of the results (default: <hostname>-<device>)")
+    parser.add_argument("--results_dir", type=str, default=RESULTS_DIR)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    machine = args.machine or machine_key(args.device)
+    try:
+        base = load_result(args.base, args.results_dir, machine)
+        head = load_result(args.head or git_commit(), args.results_dir, machine)
+    except FileNotFoundError as e:
+        sys.exit(f"Error: {e}")
+    if base.get("model") != head.get("model") or base.get("device") != head.get("device"):
+        print(
+            f"Warning: comparing {base.get('model')} on {base.get('device')} with {head.get('model')} on {head.get('device')}",
+            file=sys.stderr,
+        )
+
+    print(f"base {base['commit']} ({base['machine']}) -> head {head['commit']} ({head['machine']}), threshold {args.threshold:.0%}")
+    print(f"{'case':<26}{'base':>12}{'head':>12}{'change':>10}")
+    regressions = []
+    for name, head_stats in head["results"].items():
+        base_stats = base["results"].get(name)
+        if base_stats is None:
+            print(f"{name:<26}{'-':>12}{head_stats['median']:>12.4f}{'new':>10}")
+            continue
+        change = head_stats["median"] / base_stats["median"] - 1.0 if base_stats["median"] > 0 else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{name:<26}{base_stats['median']:>12.4f}{head_stats['median']:>12.4f}{change:>+10.1%}  {head_stats['unit']}{flag}")
+    for name in base["results"]:
+        if name not in head["results"]:
+            print(f"{name:<26}{base['results'][name]['median']:>12.4f}{'-':>12}{'missing':>10}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
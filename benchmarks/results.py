@@ -0,0 +1,50 @@
+import json
+import os
+import platform
+import re
+import subprocess
+from typing import Any, Dict
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def git_commit() -> str:
+    """Short hash of HEAD, with a `-dirty` suffix when tracked files have uncommitted changes."""
+    try:
+        commit = _git("rev-parse", "--short=12", "HEAD")
+        if _git("status", "--porcelain", "--untracked-files=no"):
+            commit += "-dirty"
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit
+
+
+def machine_key(device: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", f"{platform.node() or 'unknown'}-{device}")
+
+
+def result_path(results_dir: str, machine: str, commit: str) -> str:
+    return os.path.join(results_dir, machine, f"{commit}.json")
+
+
+def load_result(ref: str, results_dir: str, machine: str) -> Dict[str, Any]:
+    """Results of `ref`: a JSON file, or a git revision (HEAD, a hash, a branch) run on `machine`."""
+    if os.path.isfile(ref):
+        path = ref
+    else:
+        commit = ref
+        if not ref.endswith("-dirty"):
+            try:
+                commit = _git("rev-parse", "--short=12", ref)
+            except (OSError, subprocess.CalledProcessError):
+                pass
+        path = result_path(results_dir, machine, commit)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No results for {ref} ({commit}) on {machine}: run benchmarks/run_benchmarks.py at that commit first")
+    with open(path, "r") as f:
+        return json.load(f)
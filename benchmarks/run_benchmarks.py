@@ -0,0 +1,120 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, List
+
+import torch
+
+from cases import CASES, Case, load_context
+from results import RESULTS_DIR, git_commit, machine_key, result_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time VibeVoice hot paths in isolation and end to end, and store the results by commit and machine")
+    parser.add_argument(
+        "--model_path",
+        type=str,
+        default=None,
+        help="Checkpoint to benchmark (default: the tiny random-weight model of vibevoice.scripts.tiny_model, built in memory)",
+    )
+    parser.add_argument("--device", type=str, default="cpu", choices=["cpu", "cuda", "mps"])
+    parser.add_argument("--voice", type=str, default=None, help="Voice preset name (default: the first one)")
+    parser.add_argument("--cases", type=str, default=",".join(CASES), help=f"Comma separated cases, from: {', '.join(CASES)}")
+    parser.add_argument("--num_threads", type=int, default=None, help="torch intra-op threads (default: torch's choice)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the tiny model, inputs and diffusion noise")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed runs per case")
+    parser.add_argument("--min_runs", type=int, default=5, help="Timed runs per case, at least")
+    parser.add_argument("--min_time_sec", type=float, default=1.0, help="Timed seconds per case, at least")
+    parser.add_argument("--results_dir", type=str, default=RESULTS_DIR, help="Results go to <results_dir>/<machine>/<commit>.json")
+    parser.add_argument("--machine", type=str, default=None, help="Machine key of the results (default: <hostname>-<device>)")
+    parser.add_argument("--output_json", type=str, default=None, help="Write the results here instead of the results directory")
+    return parser.parse_args()
+
+
+def machine_info(device: str) -> Dict[str, Any]:
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+    }
+    if device == "cuda":
+        info["gpu"] = torch.cuda.get_device_name()
+    return info
+
+
+def measure(case: Case, warmup: int, min_runs: int, min_time_sec: float, device: str) -> Dict[str, Any]:
+    """Time `case` until it has at least `min_runs` runs and `min_time_sec` of timed work."""
+    def timed() -> float:
+        start = time.perf_counter()
+        work = case.run()
+        if device == "cuda":
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+        if case.unit == "rtf":
+            return elapsed / work if work else float("inf")
+        return elapsed * 1000 / case.calls
+
+    with torch.no_grad():
+        for _ in range(warmup):
+            case.run()
+        values: List[float] = []
+        started = time.perf_counter()
+        while len(values) < min_runs or time.perf_counter() - started < min_time_sec:
+            values.append(timed())
+    values.sort()
+    return {
+        "unit": case.unit,
+        "median": values[len(values) // 2],
+        "min": values[0],
+        "max": values[-1],
+        "runs": len(values),
+    }
+
+
+def main():
+    args = parse_args()
+    names = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown cases: {unknown}. Available: {list(CASES)}")
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+    torch.manual_seed(args.seed)
+
+    ctx = load_context(args.model_path, args.device, voice=args.voice, seed=args.seed)
+    results = {}
+    print(f"{'case':<26}{'median':>12}{'min':>12}{'runs':>7}")
+    for name in names:
+        with torch.no_grad():
+            case = CASES[name](ctx)
+        stats = measure(case, args.warmup, args.min_runs, args.min_time_sec, args.device)
+        results[name] = stats
+        print(f"{name:<26}{stats['median']:>12.4f}{stats['min']:>12.4f}{stats['runs']:>7}  {stats['unit']}")
+
+    commit = git_commit()
+    machine = args.machine or machine_key(args.device)
+    report = {
+        "commit": commit,
+        "machine": machine,
+        "machine_info": machine_info(args.device),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "model": args.model_path or "tiny",
+        "device": args.device,
+        "seed": args.seed,
+        "results": results,
+    }
+    output_json = args.output_json or result_path(args.results_dir, machine, commit)
+    os.makedirs(os.path.dirname(os.path.abspath(output_json)), exist_ok=True)
+    with open(output_json, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+from typing import Dict, List
+
+import numpy as np
+
+from web.audio_codecs import negotiate_encoder
+
+SAMPLE_RATE = 24000
+# Chunk size of the streaming server: one speech latent at 7.5 Hz.
+CHUNK_SAMPLES = 3200
+
+# Output formats a client can negotiate with the `codec` / `sample_rate` / `bitrate` query parameters.
+FORMATS = {
+    "pcm16_24k": {},
+    "pcm16_16k": {"sample_rate": "16000"},
+    "mulaw_8k": {"codec": "mulaw"},
+    "opus_24k_32kbps": {"codec": "opus"},
+    "opus_16k_24kbps": {"codec": "opus", "sample_rate": "16000", "bitrate": "24000"},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure bandwidth and encoder CPU cost per stream of the web demo audio codecs")
+    parser.add_argument("--wav_path", type=str, default=None, help="Speech to encode (default: 10 s of a synthetic voiced signal)")
+    parser.add_argument("--repeats", type=int, default=5, help="Encodes per format; the CPU time of the fastest is reported")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path to write the measurements")
+    return parser.parse_args()
+
+
+def load_audio(wav_path: str) -> np.ndarray:
+    import librosa
+
+    audio, _ = librosa.load(wav_path, sr=SAMPLE_RATE, mono=True)
+    return audio.astype(np.float32)
+
+
+def synthetic_speech(seconds: float = 10.0, seed: int = 0) -> np.ndarray:
+    # Harmonics of a gliding pitch, syllable-rate amplitude modulation and a little noise.
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 20))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2
+    audio = 0.1 * voiced * envelope + 0.005 * rng.standard_normal(t.size)
+    return audio.astype(np.float32)
+
+
+def measure(audio: np.ndarray, params: Dict[str, str], repeats: int) -> Dict[str, float]:
+    runs: List[Dict[str, float]] = []
+    for _ in range(repeats):
+        encoder = negotiate_encoder(params, SAMPLE_RATE)
+        for start in range(0, audio.size, CHUNK_SAMPLES):
+            encoder.encode(audio[start:start + CHUNK_SAMPLES])
+        encoder.flush()
+        runs.append(encoder.stats())
+    return min(runs, key=lambda stats: stats["encode_cpu_ms"])
+
+
+def main():
+    args = parse_args()
+    audio = load_audio(args.wav_path) if args.wav_path else synthetic_speech()
+    print(f"Encoding {audio.size / SAMPLE_RATE:.1f} s of audio in {CHUNK_SAMPLES}-sample chunks")
+    print(f"{'format':<18}{'kbps':>10}{'KB/min':>10}{'cpu ms/audio s':>16}")
+    results = {}
+    for name, params in FORMATS.items():
+        stats = measure(audio, params, args.repeats)
+        results[name] = stats
+        kb_per_min = stats["kbps"] * 60 / 8
+        print(f"{name:<18}{stats['kbps']:>10.1f}{kb_per_min:>10.0f}{stats['encode_cpu_ms_per_audio_sec']:>16.3f}")
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved measurements to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import multiprocessing as mp
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from vibevoice.modular.modeling_vibevoice_streaming_inference import (
+    VibeVoiceStreamingForConditionalGenerationInference,
+    clone_prefilled_outputs,
+)
+from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+from vibevoice.processor.vibevoice_tokenizer_processor import AudioNormalizer
+
+from realtime_model_inference_from_file import VoiceMapper
+
+SAMPLE_RATE = 24000
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+|(?<=[.!?;:][\"')\]])\s+")
+
+# Per-process state of a pool worker, filled by `_init_worker`.
+_worker = {}
+
+
+def segment_text(text: str, mode: str = "sentence", max_chars: int = 400) -> List[str]:
+    """
+    Split a document into synthesis segments.
+
+    Paragraphs (blank-line separated) are never merged. In "sentence" mode paragraphs are split into
+    sentences, and consecutive sentences are packed up to `max_chars` so each segment keeps some
+    prosodic context and the per-call overhead stays small.
+    """
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if mode == "paragraph":
+        return paragraphs
+
+    segments = []
+    for paragraph in paragraphs:
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+    return segments
+
+
+def load_model(model_path: str, device: str):
+    if device == "mps":
+        load_dtype, attn_impl, device_map = torch.float32, "sdpa", None
+    elif device.startswith("cuda"):
+        load_dtype, attn_impl, device_map = torch.bfloat16, "flash_attention_2", device
+    else:
+        load_dtype, attn_impl, device_map = torch.float32, "sdpa", "cpu"
+    try:
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            model_path, torch_dtype=load_dtype, device_map=device_map, attn_implementation=attn_impl,
+        )
+    except Exception:
+        if attn_impl != "flash_attention_2":
+            raise
+        print(traceback.format_exc())
+        print("Error loading the model with flash_attention_2, falling back to SDPA.")
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            model_path, torch_dtype=load_dtype, device_map=device_map, attn_implementation="sdpa",
+        )
+    if device == "mps":
+        model.to("mps")
+    model.eval()
+    model.set_ddpm_inference_steps(num_steps=5)
+    return model
+
+
+def synthesize(model, processor, text: str, prefilled_outputs, cfg_scale: float, device: str, long_form: bool = False) -> np.ndarray:
+    inputs = processor.process_input_with_cached_prompt(
+        text=text,
+        cached_prompt=prefilled_outputs,
+        padding=True,
+        return_tensors="pt",
+        return_attention_mask=True,
+    )
+    for k, v in inputs.items():
+        if torch.is_tensor(v):
+            inputs[k] = v.to(device)
+
+    outputs = model.generate(
+        **inputs,
+        max_new_tokens=None,
+        cfg_scale=cfg_scale,
+        tokenizer=processor.tokenizer,
+        generation_config={"do_sample": False},
+        show_progress_bar=False,
+        long_form=long_form,
+        all_prefilled_outputs=clone_prefilled_outputs(prefilled_outputs),
+    )
+    audio = outputs.speech_outputs[0]
+    if audio is None:
+        return np.zeros(0, dtype=np.float32)
+    return audio.detach().float().cpu().numpy().reshape(-1)
+
+
+def _init_worker(model_path: str, devices, voice_path: str, cfg_scale: float, num_threads: int):
+    device = devices.get()
+    torch.set_num_threads(num_threads)
+    _worker["device"] = device
+    _worker["cfg_scale"] = cfg_scale
+    _worker["processor"] = VibeVoiceStreamingProcessor.from_pretrained(model_path)
+    _worker["model"] = load_model(model_path, device)
+    _worker["prefilled_outputs"] = torch.load(voice_path, map_location=device, weights_only=False)
+    print(f"[worker {os.getpid()}] ready on {device}", flush=True)
+
+
+def _synthesize_segment(index: int, text: str) -> Tuple[int, np.ndarray, float, float]:
+    start = time.time()
+    audio = synthesize(
+        _worker["model"], _worker["processor"], text, _worker["prefilled_outputs"],
+        _worker["cfg_scale"], _worker["device"],
+    )
+    return index, audio, start, time.time()
+
+
+def stitch(segments: List[np.ndarray], crossfade_ms: float = 20.0, target_dB_FS: Optional[float] = -25.0) -> np.ndarray:
+    """
+    Join segment audio with equal-power crossfades.
+
+    Each segment is first brought to the same RMS level with `AudioNormalizer`, so separately generated
+    segments do not jump in loudness; the result is scaled down once at the end if it would clip.
+    """
+    normalizer = AudioNormalizer(target_dB_FS=target_dB_FS) if target_dB_FS is not None else None
+    fade_len = int(SAMPLE_RATE * crossfade_ms / 1000)
+    out = np.zeros(0, dtype=np.float32)
+    for audio in segments:
+        if audio.size == 0:
+            continue
+        if normalizer is not None:
+            audio, _, _ = normalizer.tailor_dB_FS(audio)
+        n = min(fade_len, out.size, audio.size)
+        if n > 0:
+            t = np.linspace(0.0, np.pi / 2, n, dtype=np.float32)
+            overlap = out[-n:] * np.cos(t) + audio[:n] * np.sin(t)
+            out = np.concatenate([out[:-n], overlap, audio[n:]])
+        else:
+            out = np.concatenate([out, audio])
+    if normalizer is not None:
+        out, _ = normalizer.avoid_clipping(out)
+    return out.astype(np.float32)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="VibeVoice parallel long-form synthesis from a txt file")
+    parser.add_argument("--model_path", type=str, default="microsoft/VibeVoice-Realtime-0.5B")
+    parser.add_argument("--txt_path", type=str, default="demo/text_examples/1p_abs.txt")
+    parser.add_argument("--speaker_name", type=str, default="Wayne")
+    parser.add_argument("--output_dir", type=str, default="./outputs")
+    parser.add_argument(
+        "--devices",
+        type=str,
+        default=("cuda" if torch.cuda.is_available() else ("mps" if torch.backends.mps.is_available() else "cpu")),
+        help="Comma separated devices, one per worker, e.g. cuda:0,cuda:1 (a single device is shared by all workers)",
+    )
+    parser.add_argument("--num_workers", type=int, default=2, help="Number of worker processes (default: 2)")
+    parser.add_argument("--segment_mode", type=str, choices=["sentence", "paragraph"], default="sentence")
+    parser.add_argument("--max_segment_chars", type=int, default=400, help="Sentences are packed into segments up to this length")
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--crossfade_ms", type=float, default=20.0, help="Crossfade between segments in milliseconds")
+    parser.add_argument("--target_dB_FS", type=float, default=-25.0, help="Loudness every segment is normalized to")
+    parser.add_argument(
+        "--compare_sequential",
+        action="store_true",
+        help="Also synthesize the whole text with a single long-form generate call and report the speed-up",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    devices = [d.strip() for d in args.devices.split(",") if d.strip()]
+    if any(d == "mps" for d in devices) and not torch.backends.mps.is_available():
+        print("Warning: MPS not available. Falling back to CPU.")
+        devices = ["cpu" if d == "mps" else d for d in devices]
+
+    if not os.path.exists(args.txt_path):
+        print(f"Error: txt file not found: {args.txt_path}")
+        return
+    with open(args.txt_path, "r", encoding="utf-8") as f:
+        text = f.read().strip().replace("’", "'").replace('“', '"').replace('”', '"')
+
+    segments = segment_text(text, args.segment_mode, args.max_segment_chars)
+    if not segments:
+        print("Error: No valid text found in the txt file")
+        return
+    num_workers = max(1, min(args.num_workers, len(segments)))
+    print(f"Split {len(text)} characters into {len(segments)} segments, synthesizing with {num_workers} workers")
+
+    voice_path = VoiceMapper(args.model_path).get_voice_path(args.speaker_name)
+    # Workers take their device from this queue; a single device is shared round-robin.
+    ctx = mp.get_context("spawn")
+    device_queue = ctx.Queue()
+    for i in range(num_workers):
+        device_queue.put(devices[i % len(devices)])
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+    results: List[Optional[np.ndarray]] = [None] * len(segments)
+    spans = []
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(args.model_path, device_queue, voice_path, args.cfg_scale, num_threads),
+    ) as executor:
+        # Longest segments first so the tail of the schedule is not one long straggler.
+        order = sorted(range(len(segments)), key=lambda i: -len(segments[i]))
+        futures = [executor.submit(_synthesize_segment, i, segments[i]) for i in order]
+        for future in as_completed(futures):
+            index, audio, start, end = future.result()
+            results[index] = audio
+            spans.append((start, end))
+            print(f"Segment {index + 1}/{len(segments)}: {audio.shape[-1] / SAMPLE_RATE:.2f} s audio in {end - start:.2f} s")
+
+    # Wall time of the synthesis itself, from the first segment start to the last segment end (model loading excluded).
+    parallel_time = max(e for _, e in spans) - min(s for s, _ in spans)
+    audio = stitch(results, args.crossfade_ms, args.target_dB_FS)
+    audio_duration = audio.shape[-1] / SAMPLE_RATE
+
+    processor = VibeVoiceStreamingProcessor.from_pretrained(args.model_path)
+    os.makedirs(args.output_dir, exist_ok=True)
+    txt_filename = os.path.splitext(os.path.basename(args.txt_path))[0]
+    output_path = os.path.join(args.output_dir, f"{txt_filename}_parallel_generated.wav")
+    processor.save_audio(audio, output_path=output_path)
+
+    sequential_time = None
+    if args.compare_sequential:
+        print("Running the sequential baseline (single long-form generate call)")
+        model = load_model(args.model_path, devices[0])
+        prefilled_outputs = torch.load(voice_path, map_location=devices[0], weights_only=False)
+        start = time.time()
+        synthesize(model, processor, text, prefilled_outputs, args.cfg_scale, devices[0], long_form=True)
+        sequential_time = time.time() - start
+
+    print("\n" + "=" * 50)
+    print("PARALLEL SYNTHESIS SUMMARY")
+    print("=" * 50)
+    print(f"Input file: {args.txt_path}")
+    print(f"Output file: {output_path}")
+    print(f"Segments: {len(segments)} ({args.segment_mode}), workers: {num_workers}, devices: {', '.join(devices)}")
+    print(f"Audio duration: {audio_duration:.2f} seconds")
+    print(f"Parallel synthesis time: {parallel_time:.2f} seconds")
+    print(f"RTF (Real Time Factor): {parallel_time / audio_duration:.2f}x" if audio_duration > 0 else "RTF (Real Time Factor): inf")
+    if sequential_time is not None:
+        print(f"Sequential synthesis time: {sequential_time:.2f} seconds")
+        print(f"Speed-up: {sequential_time / parallel_time:.2f}x")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
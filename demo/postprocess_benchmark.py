@@ -0,0 +1,92 @@
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from codec_benchmark import CHUNK_SAMPLES, SAMPLE_RATE, load_audio, synthetic_speech
+from web.audio_codecs import LookaheadLimiter, PCM16Buffer, float_to_pcm16
+
+
+def per_chunk_normalize(chunks: List[np.ndarray]) -> Callable[[], None]:
+    # The previous server path: peak normalization per chunk, then a fresh int16 array and bytes object.
+    def run() -> None:
+        for chunk in chunks:
+            audio = chunk.reshape(-1)
+            peak = np.max(np.abs(audio)) if audio.size else 0.0
+            if peak > 1.0:
+                audio = audio / peak
+            audio = audio.astype(np.float32, copy=False)
+            float_to_pcm16(audio).tobytes()
+
+    return run
+
+
+def lookahead_limiter(chunks: List[np.ndarray]) -> Callable[[], None]:
+    limiter = LookaheadLimiter(SAMPLE_RATE)
+    pcm = PCM16Buffer()
+
+    def run() -> None:
+        for chunk in chunks:
+            memoryview(pcm.convert(limiter.process(chunk)).view(np.uint8))
+        limiter.flush()
+
+    return run
+
+
+PIPELINES = {"per_chunk_normalize": per_chunk_normalize, "lookahead_limiter": lookahead_limiter}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure CPU per second of audio of the server's PCM post-processing")
+    parser.add_argument("--wav_path", type=str, default=None, help="Speech to process (default: 10 s of a synthetic voiced signal)")
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per pipeline; the CPU time of the fastest is reported")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path to write the measurements")
+    return parser.parse_args()
+
+
+def measure(make_pipeline: Callable[[List[np.ndarray]], Callable[[], None]], chunks: List[np.ndarray], repeats: int) -> Dict[str, float]:
+    audio_sec = sum(chunk.size for chunk in chunks) / SAMPLE_RATE
+    cpu = []
+    for _ in range(repeats):
+        run = make_pipeline(chunks)
+        start = time.thread_time()
+        run()
+        cpu.append(time.thread_time() - start)
+    # Peak memory allocated while processing, after a first pass has set up any reusable buffers.
+    run = make_pipeline(chunks)
+    run()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cpu_ms_per_audio_sec": round(min(cpu) * 1000 / audio_sec, 4),
+        "peak_temp_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    args = parse_args()
+    audio = load_audio(args.wav_path) if args.wav_path else synthetic_speech()
+    print(f"Processing {audio.size / SAMPLE_RATE:.1f} s of audio in {CHUNK_SAMPLES}-sample chunks")
+    print(f"{'signal':<8}{'pipeline':<22}{'cpu ms/audio s':>16}{'peak temp KB':>14}")
+    results = {}
+    # "hot" peaks above full scale, so the limiter (and the old normalization) has to act.
+    for signal, gain in (("normal", 1.0), ("hot", 12.0)):
+        scaled = (audio * gain).astype(np.float32)
+        chunks = [scaled[start:start + CHUNK_SAMPLES] for start in range(0, scaled.size, CHUNK_SAMPLES)]
+        for name, make_pipeline in PIPELINES.items():
+            stats = measure(make_pipeline, chunks, args.repeats)
+            results[f"{signal}/{name}"] = stats
+            print(f"{signal:<8}{name:<22}{stats['cpu_ms_per_audio_sec']:>16.3f}{stats['peak_temp_kb']:>14.1f}")
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved measurements to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
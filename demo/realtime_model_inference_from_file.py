@@ -18,8 +18,8 @@ logger = logging.get_logger(__name__)
 class VoiceMapper:
     """Maps speaker names to voice file paths"""
     
-    def __init__(self):
-        self.setup_voice_presets()
+    def __init__(self, model_path=None):
+        self.setup_voice_presets(model_path)
 
         # change name according to our preset voice file
         new_dict = {}
@@ -35,9 +35,12 @@ class VoiceMapper:
         self.voice_presets.update(new_dict)
         # print(list(self.voice_presets.keys()))
 
-    def setup_voice_presets(self):
+    def setup_voice_presets(self, model_path=None):
         """Setup voice presets by scanning the voices directory."""
         voices_dir = os.path.join(os.path.dirname(__file__), "voices/streaming_model")
+        # Local checkpoints may ship their own presets (e.g. the tiny model of vibevoice.scripts.tiny_model)
+        if model_path and os.path.isdir(os.path.join(model_path, "voices")):
+            voices_dir = os.path.join(model_path, "voices")
         
         # Check if voices directory exists
         if not os.path.exists(voices_dir):
@@ -129,6 +132,29 @@ def parse_args():
         default=1.5,
         help="CFG (Classifier-Free Guidance) scale for generation (default: 1.5)",
     )
+    parser.add_argument(
+        "--eos_check_interval",
+        type=int,
+        default=1,
+        help="Speech tokens whose EOS check may stay in flight on the device before the host blocks (default: 1)",
+    )
+    parser.add_argument(
+        "--long_form",
+        action="store_true",
+        help="Keep only the voice prompt plus a rolling KV window so inputs longer than the model context can be synthesized",
+    )
+    parser.add_argument(
+        "--long_form_window_size",
+        type=int,
+        default=None,
+        help="KV entries kept after the voice prompt in --long_form mode (default: half of the remaining context)",
+    )
+    parser.add_argument(
+        "--profile_trace",
+        type=str,
+        default=None,
+        help="Optional path of a Chrome trace (torch.profiler) of the generate call, e.g. outputs/trace.json",
+    )
     
     return parser.parse_args()
 
@@ -148,7 +174,7 @@ def main():
     print(f"Using device: {args.device}")
 
     # Initialize voice mapper
-    voice_mapper = VoiceMapper()
+    voice_mapper = VoiceMapper(args.model_path)
     
     # Check if txt file exists
     if not os.path.exists(args.txt_path):
@@ -247,6 +273,14 @@ def main():
 
     print(f"Starting generation with cfg_scale: {args.cfg_scale}")
 
+    profiler = None
+    if args.profile_trace:
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if args.device == "cuda":
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        profiler = torch.profiler.profile(activities=activities)
+        profiler.__enter__()
+
     # Generate audio
     start_time = time.time()
     outputs = model.generate(
@@ -256,9 +290,18 @@ def main():
         tokenizer=processor.tokenizer,
         generation_config={'do_sample': False},
         verbose=True,
+        eos_check_interval=args.eos_check_interval,
+        long_form=args.long_form,
+        long_form_window_size=args.long_form_window_size,
         all_prefilled_outputs=copy.deepcopy(all_prefilled_outputs) if all_prefilled_outputs is not None else None,
     )
     generation_time = time.time() - start_time
+
+    if profiler is not None:
+        profiler.__exit__(None, None, None)
+        os.makedirs(os.path.dirname(os.path.abspath(args.profile_trace)), exist_ok=True)
+        profiler.export_chrome_trace(args.profile_trace)
+        print(f"Saved profiler timeline to {args.profile_trace}")
     print(f"Generation time: {generation_time:.2f} seconds")
     
     # Calculate audio duration and additional metrics
@@ -0,0 +1,120 @@
+"""
+Measure the cost of handing audio chunks from the generation thread to an asyncio consumer.
+
+A producer thread stands in for `generate`: it puts one 3200-sample chunk every `--interval_ms` and
+records when. Two consumer paths are compared:
+
+  thread: AudioStreamer -> generator in a worker thread -> `await asyncio.to_thread(next, ...)`
+          (the previous web server path, two thread handoffs per chunk)
+  async:  AsyncAudioStreamer -> `async for` on the event loop (`call_soon_threadsafe` handoff)
+
+For every chunk the handoff latency (put -> consumer receives it) is reported, plus the jitter of the
+consumer's inter-chunk gaps. `--busy_tasks` adds coroutines that keep the event loop busy, as
+concurrent websocket handlers would.
+
+    python demo/streaming_handoff_benchmark.py --chunks 300 --interval_ms 20 --busy_tasks 8
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import torch
+
+from vibevoice.modular.streamer import AsyncAudioStreamer, AudioStreamer
+
+CHUNK_SAMPLES = 3200
+
+
+def produce(streamer: AudioStreamer, num_chunks: int, interval_sec: float, put_times: List[float]) -> None:
+    indices = torch.tensor([0])
+    chunk = torch.zeros(1, CHUNK_SAMPLES)
+    next_time = time.perf_counter()
+    for _ in range(num_chunks):
+        next_time += interval_sec
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        put_times.append(time.perf_counter())
+        streamer.put(chunk, indices)
+    streamer.end()
+
+
+async def busy_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        # ~0.2 ms of work per step, like serializing a log message and a websocket frame.
+        end = time.perf_counter() + 0.0002
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(0)
+
+
+async def run(path: str, num_chunks: int, interval_sec: float, busy_tasks: int) -> Dict[str, float]:
+    stop = asyncio.Event()
+    busy = [asyncio.create_task(busy_loop(stop)) for _ in range(busy_tasks)]
+    put_times: List[float] = []
+    recv_times: List[float] = []
+
+    if path == "thread":
+        streamer = AudioStreamer(batch_size=1)
+
+        def chunks():
+            yield from streamer.get_stream(0)
+
+        iterator = chunks()
+        sentinel = object()
+        producer = threading.Thread(target=produce, args=(streamer, num_chunks, interval_sec, put_times), daemon=True)
+        producer.start()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, sentinel)
+            if chunk is sentinel:
+                break
+            recv_times.append(time.perf_counter())
+    else:
+        streamer = AsyncAudioStreamer(batch_size=1)
+        producer = threading.Thread(target=produce, args=(streamer, num_chunks, interval_sec, put_times), daemon=True)
+        producer.start()
+        async for _ in streamer.get_stream(0):
+            recv_times.append(time.perf_counter())
+
+    producer.join()
+    stop.set()
+    await asyncio.gather(*busy)
+
+    latencies = sorted((r - p) * 1000 for p, r in zip(put_times, recv_times))
+    gaps = [(b - a) * 1000 for a, b in zip(recv_times, recv_times[1:])]
+    return {
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max_ms": latencies[-1],
+        "gap_jitter_ms": statistics.pstdev(gaps) if gaps else 0.0,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunk handoff latency: thread hop vs AsyncAudioStreamer")
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--interval_ms", type=float, default=20.0, help="Producer period; real generation is ~50-130 ms")
+    parser.add_argument("--busy_tasks", type=int, default=0, help="Coroutines keeping the event loop busy")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"{'path':<8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'gap jitter ms':>15}")
+    print("=" * 63)
+    for path in ("thread", "async"):
+        runs = [asyncio.run(run(path, args.chunks, args.interval_ms / 1000, args.busy_tasks)) for _ in range(args.repeats)]
+        mean = {key: statistics.fmean(r[key] for r in runs) for key in runs[0]}
+        print(
+            f"{path:<8}{mean['mean_ms']:>10.3f}{mean['p50_ms']:>10.3f}{mean['p99_ms']:>10.3f}"
+            f"{mean['max_ms']:>10.3f}{mean['gap_jitter_ms']:>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
 // VibeChrome Offscreen Document - Handles Audio Playback
 // Service workers cannot use AudioContext, so we use this offscreen document
 
+// Binary frames (framing=binary): 20-byte little-endian header, see FrameWriter in demo/web/framing.py
+const FRAME_HEADER_BYTES = 20;
+const FRAME_AUDIO = 1;
+const FRAME_EVENTS = 2;
+const PREBUFFER_SEC = 0.1;
+const MAX_PREBUFFER_SEC = 1.0;
+const REBUFFER_STEP_SEC = 0.05;
+const FEEDBACK_INTERVAL_MS = 500;
+
 class OffscreenAudioPlayer {
     constructor() {
         this.audioContext = null;
@@ -10,6 +19,9 @@ class OffscreenAudioPlayer {
         this.isPlaying = false;
         this.speed = 1.0;
         this.ws = null;
+        this.framed = null;
+        this.feedbackTimer = null;
+        this.resetJitter();
 
         this.init();
     }
@@ -70,6 +82,26 @@ class OffscreenAudioPlayer {
 
         this.audioQueue = [];
         this.scheduledTime = this.audioContext.currentTime;
+        this.resetJitter();
+    }
+
+    // Jitter buffer state. Chunks are scheduled at the context time their sample offset maps to, so a
+    // gap in the stream becomes silence and overlapping audio is trimmed. The mapping (anchor) starts
+    // `prebufferSec` plus three times the measured network jitter in the future; when a chunk arrives
+    // after its play time the stream is re-anchored with a larger prebuffer.
+    resetJitter() {
+        this.jitter = {
+            streamId: null,
+            anchorOffset: 0,
+            anchorTime: 0,
+            anchorSpeed: null,
+            nextOffset: 0,
+            expectedSeq: null,
+            lastTransit: null,
+            jitterSec: 0,
+            prebufferSec: PREBUFFER_SEC,
+            stats: { frames: 0, lostFrames: 0, concealedSamples: 0, trimmedSamples: 0, underruns: 0 },
+        };
     }
 
     async speak(text, voice, serverUrl, speed) {
@@ -112,26 +144,37 @@ class OffscreenAudioPlayer {
                 wsBaseUrl = 'ws://' + wsBaseUrl.substring(7);
             }
 
-            const wsUrl = new URL('/stream', wsBaseUrl);
-            wsUrl.searchParams.set('text', text);
+            // The text is sent as messages after connecting, so its length is not limited by the URL.
+            const wsUrl = new URL('/stream_text', wsBaseUrl);
             if (voice) wsUrl.searchParams.set('voice', voice);
             wsUrl.searchParams.set('cfg', '1.5');
             wsUrl.searchParams.set('steps', '5');
+            wsUrl.searchParams.set('framing', 'binary');
 
             console.log('[Offscreen] Connecting to:', wsUrl.toString());
 
             this.ws = new WebSocket(wsUrl.toString());
             this.ws.binaryType = 'arraybuffer';
+            this.framed = null;
 
             this.ws.onopen = () => {
                 console.log('[Offscreen] WebSocket connected!');
+                this.ws.send(JSON.stringify({ type: 'text', text }));
+                this.ws.send(JSON.stringify({ type: 'end' }));
+                this.startFeedback();
                 this.isPlaying = true;
                 this.notifyStatus('PLAYBACK_STARTED');
                 resolve();
             };
 
             this.ws.onmessage = (event) => {
-                if (event.data instanceof ArrayBuffer) {
+                // A server without framing answers with a text audio_format event first
+                if (this.framed === null) {
+                    this.framed = event.data instanceof ArrayBuffer;
+                }
+                if (event.data instanceof ArrayBuffer && this.framed) {
+                    this.handleFrame(event.data);
+                } else if (event.data instanceof ArrayBuffer) {
                     // Binary audio data (PCM16)
                     console.log('[Offscreen] Received audio chunk:', event.data.byteLength, 'bytes');
                     this.handleAudioData(event.data);
@@ -153,6 +196,7 @@ class OffscreenAudioPlayer {
 
             this.ws.onclose = (event) => {
                 console.log('[Offscreen] WebSocket closed:', event.code, event.reason);
+                this.stopFeedback();
                 this.ws = null;
 
                 // Wait for audio queue to finish, then notify complete
@@ -166,7 +210,51 @@ class OffscreenAudioPlayer {
         });
     }
 
-    handleAudioData(arrayBuffer) {
+    handleFrame(arrayBuffer) {
+        const view = new DataView(arrayBuffer, 0, FRAME_HEADER_BYTES);
+        const header = {
+            type: view.getUint8(1),
+            streamId: view.getUint16(2, true),
+            seq: view.getUint32(4, true),
+            offset: view.getUint32(8, true),
+            timestamp: view.getFloat64(12, true),
+        };
+
+        // Sequence numbers count every frame of the connection, so a jump means lost frames
+        const jitter = this.jitter;
+        if (jitter.expectedSeq !== null && header.seq !== jitter.expectedSeq) {
+            jitter.stats.lostFrames += (header.seq - jitter.expectedSeq) >>> 0;
+        }
+        jitter.expectedSeq = (header.seq + 1) >>> 0;
+
+        if (header.type === FRAME_EVENTS) {
+            // Batched JSON log events: [{event, data, t}], t in seconds on the server's connection clock
+            try {
+                const events = JSON.parse(new TextDecoder().decode(new Uint8Array(arrayBuffer, FRAME_HEADER_BYTES)));
+                events.forEach(({ event, data, t }) => console.log('[Offscreen] Server log:', event, data, `t=${t}`));
+                if (events.some(({ event }) => event === 'backend_stream_complete')) {
+                    console.log('[Offscreen] Jitter buffer:', this.jitterSummary());
+                }
+            } catch (e) {
+                // Ignore parse errors
+            }
+            return;
+        }
+        if (header.type !== FRAME_AUDIO) {
+            return;
+        }
+
+        // Interarrival jitter (RFC 3550): clock offsets cancel out in consecutive transit differences
+        const transit = performance.now() / 1000 - header.timestamp;
+        if (jitter.lastTransit !== null) {
+            jitter.jitterSec += (Math.abs(transit - jitter.lastTransit) - jitter.jitterSec) / 16;
+        }
+        jitter.lastTransit = transit;
+
+        this.handleAudioData(arrayBuffer.slice(FRAME_HEADER_BYTES), header.streamId, header.offset);
+    }
+
+    handleAudioData(arrayBuffer, streamId = null, offset = null) {
         if (!this.audioContext) {
             console.warn('[Offscreen] No audio context');
             return;
@@ -174,12 +262,52 @@ class OffscreenAudioPlayer {
 
         // Convert PCM16 to Float32
         const pcm16 = new Int16Array(arrayBuffer);
-        const float32 = new Float32Array(pcm16.length);
+        let float32 = new Float32Array(pcm16.length);
 
         for (let i = 0; i < pcm16.length; i++) {
             float32[i] = pcm16[i] / 32768.0;
         }
 
+        // Unframed audio simply continues the stream
+        const jitter = this.jitter;
+        if (offset === null) {
+            streamId = jitter.streamId;
+            offset = jitter.nextOffset;
+        }
+        const now = this.audioContext.currentTime;
+        if (streamId !== jitter.streamId) {
+            // New stream: its offsets restart at 0 and it plays after what is already scheduled
+            jitter.streamId = streamId;
+            jitter.nextOffset = 0;
+            this.anchor(0, Math.max(now, this.scheduledTime) + this.prebufferTarget());
+        } else if (this.speed !== jitter.anchorSpeed) {
+            this.anchor(jitter.nextOffset, Math.max(now, this.scheduledTime));
+        }
+
+        // Trim audio that overlaps what is already scheduled; a gap is left silent
+        if (offset < jitter.nextOffset) {
+            const overlap = Math.min(float32.length, jitter.nextOffset - offset);
+            jitter.stats.trimmedSamples += overlap;
+            float32 = float32.subarray(overlap);
+            offset += overlap;
+        } else if (offset > jitter.nextOffset) {
+            jitter.stats.concealedSamples += offset - jitter.nextOffset;
+        }
+        if (float32.length === 0) {
+            return;
+        }
+
+        let startTime = this.playTime(offset);
+        if (startTime < now) {
+            // Arrived after its play time: grow the prebuffer and restart the schedule from this chunk
+            jitter.stats.underruns += 1;
+            jitter.prebufferSec = Math.min(MAX_PREBUFFER_SEC, jitter.prebufferSec + REBUFFER_STEP_SEC);
+            this.anchor(offset, now + this.prebufferTarget());
+            startTime = this.playTime(offset);
+        }
+        jitter.nextOffset = offset + float32.length;
+        jitter.stats.frames += 1;
+
         // Apply speed adjustment by resampling
         const adjustedSamples = this.adjustSpeed(float32, this.speed);
 
@@ -188,7 +316,50 @@ class OffscreenAudioPlayer {
         audioBuffer.getChannelData(0).set(adjustedSamples);
 
         // Schedule playback
-        this.schedulePlayback(audioBuffer);
+        this.schedulePlayback(audioBuffer, startTime);
+    }
+
+    // Report the scheduled audio ahead of the playhead, so the server only coalesces chunks while it allows
+    startFeedback() {
+        this.stopFeedback();
+        this.feedbackTimer = setInterval(() => {
+            if (this.ws && this.ws.readyState === WebSocket.OPEN && this.audioContext) {
+                const bufferedSec = Math.max(0, this.scheduledTime - this.audioContext.currentTime);
+                this.ws.send(JSON.stringify({ type: 'feedback', buffered_ms: Math.round(bufferedSec * 1000) }));
+            }
+        }, FEEDBACK_INTERVAL_MS);
+    }
+
+    stopFeedback() {
+        if (this.feedbackTimer) {
+            clearInterval(this.feedbackTimer);
+            this.feedbackTimer = null;
+        }
+    }
+
+    prebufferTarget() {
+        return Math.min(MAX_PREBUFFER_SEC, this.jitter.prebufferSec + 3 * this.jitter.jitterSec);
+    }
+
+    anchor(offset, time) {
+        this.jitter.anchorOffset = offset;
+        this.jitter.anchorTime = time;
+        this.jitter.anchorSpeed = this.speed;
+    }
+
+    playTime(offset) {
+        const jitter = this.jitter;
+        return jitter.anchorTime + (offset - jitter.anchorOffset) / (this.sampleRate * jitter.anchorSpeed);
+    }
+
+    jitterSummary() {
+        const stats = this.jitter.stats;
+        return {
+            ...stats,
+            concealedMs: Math.round(stats.concealedSamples * 1000 / this.sampleRate),
+            jitterMs: Math.round(this.jitter.jitterSec * 1000),
+            prebufferMs: Math.round(this.prebufferTarget() * 1000),
+        };
     }
 
     adjustSpeed(samples, speed) {
@@ -210,19 +381,14 @@ class OffscreenAudioPlayer {
         return result;
     }
 
-    schedulePlayback(audioBuffer) {
+    schedulePlayback(audioBuffer, startTime) {
         const source = this.audioContext.createBufferSource();
         source.buffer = audioBuffer;
         source.connect(this.audioContext.destination);
 
-        // Schedule at the end of the queue
-        const now = this.audioContext.currentTime;
-        if (this.scheduledTime < now) {
-            this.scheduledTime = now;
-        }
-
-        source.start(this.scheduledTime);
-        this.scheduledTime += audioBuffer.duration;
+        // Schedule at the chunk's place in the stream, chosen by the jitter buffer
+        source.start(startTime);
+        this.scheduledTime = Math.max(this.scheduledTime, startTime + audioBuffer.duration);
 
         console.log('[Offscreen] Scheduled audio chunk, duration:', audioBuffer.duration.toFixed(2) + 's');
 
@@ -259,6 +425,8 @@ class OffscreenAudioPlayer {
     }
 
     stop() {
+        this.stopFeedback();
+
         // Close WebSocket
         if (this.ws) {
             this.ws.close();
@@ -278,6 +446,7 @@ class OffscreenAudioPlayer {
         // Reset state
         this.isPlaying = false;
         this.scheduledTime = 0;
+        this.resetJitter();
 
         this.notifyStatus('PLAYBACK_STOPPED');
     }
@@ -6,10 +6,49 @@ def main():
     p.add_argument("--model_path", type=str, default="default_model")
     p.add_argument("--device", type=str, default="cuda", choices=["cpu", "cuda", "mpx", "mps"])
     p.add_argument("--reload", action="store_true", help="Reload the model or not")
+    p.add_argument("--cache_dir", type=str, default=None, help="Directory of the synthesis result cache (disabled if not set)")
+    p.add_argument("--cache_max_mb", type=float, default=1024, help="Size bound of the result cache in MB")
+    p.add_argument("--seed", type=int, default=None, help="Default seed for requests without one (required for caching)")
+    p.add_argument("--max_buffer_sec", type=float, default=10, help="Audio buffered ahead of a client before generation pauses (0 disables)")
+    p.add_argument("--workers", type=int, default=0, help="Model replicas in worker processes (0 serves from the server process)")
+    p.add_argument("--worker_threads", type=int, default=None, help="Torch threads per worker (default: cores / workers)")
+    p.add_argument("--queue_max_depth", type=int, default=16, help="Maximum number of requests waiting for the model")
+    p.add_argument("--queue_max_wait_sec", type=float, default=60, help="Refuse requests whose estimated wait exceeds this (0 disables)")
+    p.add_argument("--rate_limit_per_min", type=float, default=30, help="Requests per minute allowed per client address (0 disables)")
+    p.add_argument("--pinned_voices", type=str, default=None, help="Comma-separated voices loaded and warmed up at startup (default: the default voice)")
+    p.add_argument("--no_warmup", action="store_true", help="Report ready without warmup generations")
+    p.add_argument("--warmup_max_sec", type=float, default=5, help="Audio seconds generated per warmup run")
+    p.add_argument("--encoder_threads", type=int, default=2, help="Threads encoding compressed or resampled audio for clients")
+    p.add_argument("--coalesce_ms", type=float, default=0, help="Audio gathered into one websocket message after a stream's first chunk (0 sends every chunk)")
+    p.add_argument("--coalesce_max_kb", type=float, default=64, help="Size at which coalesced audio is sent regardless of duration")
+    p.add_argument("--no_preempt_batch", action="store_true", help="Let batch job items run to completion instead of yielding the model to interactive requests")
+    p.add_argument("--park_dir", type=str, default=None, help="Directory for the state of suspended batch items (default: host memory)")
     args = p.parse_args()
     
     os.environ["MODEL_PATH"] = args.model_path
     os.environ["MODEL_DEVICE"] = args.device
+    if args.cache_dir:
+        os.environ["TTS_CACHE_DIR"] = args.cache_dir
+        os.environ["TTS_CACHE_MAX_MB"] = str(args.cache_max_mb)
+    if args.seed is not None:
+        os.environ["TTS_DEFAULT_SEED"] = str(args.seed)
+    os.environ["TTS_MAX_BUFFER_SEC"] = str(args.max_buffer_sec)
+    os.environ["TTS_WORKERS"] = str(args.workers)
+    if args.worker_threads:
+        os.environ["TTS_WORKER_THREADS"] = str(args.worker_threads)
+    os.environ["TTS_QUEUE_MAX_DEPTH"] = str(args.queue_max_depth)
+    os.environ["TTS_QUEUE_MAX_WAIT_SEC"] = str(args.queue_max_wait_sec)
+    os.environ["TTS_RATE_LIMIT_PER_MIN"] = str(args.rate_limit_per_min)
+    os.environ["TTS_ENCODER_THREADS"] = str(args.encoder_threads)
+    os.environ["TTS_COALESCE_MS"] = str(args.coalesce_ms)
+    os.environ["TTS_COALESCE_MAX_KB"] = str(args.coalesce_max_kb)
+    os.environ["TTS_PREEMPT_BATCH"] = "0" if args.no_preempt_batch else "1"
+    if args.park_dir:
+        os.environ["TTS_PARK_DIR"] = args.park_dir
+    if args.pinned_voices:
+        os.environ["TTS_PINNED_VOICES"] = args.pinned_voices
+    os.environ["TTS_WARMUP"] = "0" if args.no_warmup else "1"
+    os.environ["TTS_WARMUP_MAX_SEC"] = str(args.warmup_max_sec)
 
     uvicorn.run("web.app:app", host="0.0.0.0", port=args.port, reload=args.reload)
 
@@ -1,53 +1,76 @@
-import datetime
 import builtins
 import asyncio
+import contextlib
 import json
 import os
 import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from queue import Empty, Queue
-from typing import Any, Callable, Dict, Iterator, Optional, Tuple, cast
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union, cast
 
 import numpy as np
 import torch
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import FileResponse
+from fastapi import Body, FastAPI, HTTPException, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.websockets import WebSocketDisconnect, WebSocketState
 
 from vibevoice.modular.modeling_vibevoice_streaming_inference import (
+    GenerationPreemption,
+    GenerationRequest,
     VibeVoiceStreamingForConditionalGenerationInference,
+    clone_prefilled_outputs,
 )
 from vibevoice.processor.vibevoice_streaming_processor import (
     VibeVoiceStreamingProcessor,
 )
-from vibevoice.modular.streamer import AudioStreamer
+from vibevoice.modular.streamer import AsyncAudioStreamer, AudioStreamer, TextInputStreamer
 
-import copy
+from .audio_codecs import AudioEncoder, LookaheadLimiter, float_to_pcm16, negotiate_encoder
+from .batch_jobs import BatchJobManager
+from .framing import CoalescingPolicy, FrameWriter
+from .metrics import TTSMetrics
+from .request_queue import QueueFullError, RateLimitedError, RequestQueue
+from .synthesis_cache import SynthesisCache, hash_file
+from .worker_pool import WorkerPool
 
 BASE = Path(__file__).parent
 SAMPLE_RATE = 24_000
+# Samples per replayed chunk for cached results: one speech latent at 7.5 Hz.
+CACHE_CHUNK_SAMPLES = 3200
+# Noise scheduler settings of every request, applied per generation rather than on the shared model.
+SAMPLER = {"algorithm_type": "sde-dpmsolver++", "beta_schedule": "squaredcos_cap_v2"}
+
+# Warmup texts of representative lengths (short reply, a few sentences, a paragraph).
+WARMUP_TEXTS = (
+    "Hello, thanks for calling. How can I help you today?",
+    "The weather should stay clear through the afternoon, with light winds from the west. "
+    "Expect clouds to build after sunset and a chance of rain overnight.",
+    "Streaming speech synthesis has to start talking long before it knows how a paragraph ends. "
+    "It reads the text in small windows, generates a few frames of audio for each one, and hands "
+    "every frame to the listener as soon as it is decoded. Keeping that loop fast from the very "
+    "first request is what makes a voice assistant feel responsive instead of sluggish.",
+)
 
 
-def get_timestamp():
-    timestamp = datetime.datetime.utcnow().replace(
-        tzinfo=datetime.timezone.utc
-    ).astimezone(
-        datetime.timezone(datetime.timedelta(hours=8))
-    ).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    return timestamp
-
 class StreamingTTSService:
     def __init__(
         self,
         model_path: str,
         device: str = "cuda",
         inference_steps: int = 5,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 1 << 30,
+        default_seed: Optional[int] = None,
+        max_buffered_sec: Optional[float] = 10.0,
+        metrics: Optional[TTSMetrics] = None,
     ) -> None:
         # Keep model_path as string for HuggingFace repo IDs (Path() converts / to \ on Windows)
         self.model_path = model_path
         self.inference_steps = inference_steps
+        self.sampler = dict(SAMPLER)
         self.sample_rate = SAMPLE_RATE
 
         self.processor: Optional[VibeVoiceStreamingProcessor] = None
@@ -55,6 +78,14 @@ class StreamingTTSService:
         self.voice_presets: Dict[str, Path] = {}
         self.default_voice_key: Optional[str] = None
         self._voice_cache: Dict[str, Tuple[object, Path, str]] = {}
+        self._voice_hashes: Dict[str, str] = {}
+        # Results are only cached for seeded requests; `default_seed` makes every request seeded.
+        self.default_seed = default_seed
+        self.result_cache = SynthesisCache(cache_dir, cache_max_bytes, SAMPLE_RATE) if cache_dir else None
+        # Audio a stream may buffer ahead of its client before generation pauses.
+        self.max_buffered_sec = max_buffered_sec
+        self.backpressure_totals = {"streams": 0, "paused_streams": 0, "pause_sec": 0.0, "peak_buffered_sec": 0.0}
+        self.metrics = metrics
 
         if device == "mpx":
             print("Note: device 'mpx' detected, treating it as 'mps'.")
@@ -65,11 +96,28 @@ class StreamingTTSService:
         self.device = device
         self._torch_device = torch.device(device)
 
-    def load(self) -> None:
+    def load(self, model: Optional[VibeVoiceStreamingForConditionalGenerationInference] = None) -> None:
+        """Load processor, model and voices. A preloaded `model` (e.g. shared by a worker pool) skips loading weights."""
         print(f"[startup] Loading processor from {self.model_path}")
         self.processor = VibeVoiceStreamingProcessor.from_pretrained(self.model_path)
 
-        
+        if model is not None:
+            self.model = model
+        else:
+            self._load_model()
+
+        self.model.eval()
+        # The model is left as loaded: steps and sampler travel with each request (`GenerationRequest`).
+
+        self.load_voices()
+        self._ensure_voice_cached(self.default_voice_key)
+
+    def load_voices(self) -> None:
+        self.voice_presets = self._load_voice_presets()
+        preset_name = os.environ.get("VOICE_PRESET")
+        self.default_voice_key = self._determine_voice_key(preset_name)
+
+    def _load_model(self) -> None:
         # Decide dtype & attention
         if self.device == "mps":
             load_dtype = torch.float32
@@ -109,22 +157,11 @@ class StreamingTTSService:
             else:
                 raise e
 
-        self.model.eval()
-
-        self.model.model.noise_scheduler = self.model.model.noise_scheduler.from_config(
-            self.model.model.noise_scheduler.config,
-            algorithm_type="sde-dpmsolver++",
-            beta_schedule="squaredcos_cap_v2",
-        )
-        self.model.set_ddpm_inference_steps(num_steps=self.inference_steps)
-
-        self.voice_presets = self._load_voice_presets()
-        preset_name = os.environ.get("VOICE_PRESET")
-        self.default_voice_key = self._determine_voice_key(preset_name)
-        self._ensure_voice_cached(self.default_voice_key)
-
     def _load_voice_presets(self) -> Dict[str, Path]:
-        voices_dir = BASE.parent / "voices" / "streaming_model"
+        # Local checkpoints may ship their own presets (e.g. the tiny model of vibevoice.scripts.tiny_model)
+        voices_dir = Path(self.model_path) / "voices"
+        if not voices_dir.is_dir():
+            voices_dir = BASE.parent / "voices" / "streaming_model"
         if not voices_dir.exists():
             raise RuntimeError(f"Voices directory not found: {voices_dir}")
 
@@ -158,12 +195,15 @@ class StreamingTTSService:
             preset_path = self.voice_presets[key]
             print(f"[startup] Loading voice preset {key} from {preset_path}")
             print(f"[startup] Loading prefilled prompt from {preset_path}")
+            load_start = time.perf_counter()
             prefilled_outputs = torch.load(
                 preset_path,
                 map_location=self._torch_device,
                 weights_only=False,
             )
             self._voice_cache[key] = prefilled_outputs
+            if self.metrics is not None:
+                self.metrics.voice_load.observe(time.perf_counter() - load_start)
 
         return self._voice_cache[key]
 
@@ -173,9 +213,40 @@ class StreamingTTSService:
             key = next(iter(self.voice_presets))
             self.default_voice_key = key
 
+        if self.metrics is not None:
+            self.metrics.voice_cache.inc(result="hit" if key in self._voice_cache else "miss")
         prefilled_outputs = self._ensure_voice_cached(key)
         return key, prefilled_outputs
 
+    def _voice_hash(self, key: str) -> str:
+        if key not in self._voice_hashes:
+            self._voice_hashes[key] = hash_file(self.voice_presets[key])
+        return self._voice_hashes[key]
+
+    def _cache_key(self, text: str, voice_key: str, cfg_scale: float, inference_steps: int, seed: int) -> str:
+        config = self.model.config
+        return SynthesisCache.make_key(
+            text=text,
+            voice_hash=self._voice_hash(voice_key),
+            cfg_scale=cfg_scale,
+            inference_steps=inference_steps,
+            seed=seed,
+            model_revision=getattr(config, "_commit_hash", None) or str(self.model_path),
+            sampler=f"{self.sampler['algorithm_type']}/{self.sampler['beta_schedule']}",
+        )
+
+    def _replay_cached(self, audio: np.ndarray, emit: Callable[..., None]) -> Iterator[np.ndarray]:
+        generated_samples = 0
+        for start in range(0, audio.size, CACHE_CHUNK_SAMPLES):
+            chunk = audio[start:start + CACHE_CHUNK_SAMPLES]
+            generated_samples += int(chunk.size)
+            emit(
+                "model_progress",
+                generated_sec=generated_samples / self.sample_rate,
+                chunk_sec=chunk.size / self.sample_rate,
+            )
+            yield chunk
+
     def _prepare_inputs(self, text: str, prefilled_outputs: object):
         if not self.processor or not self.model:
             raise RuntimeError("StreamingTTSService not initialized")
@@ -201,19 +272,22 @@ class StreamingTTSService:
         inputs,
         audio_streamer: AudioStreamer,
         errors,
-        cfg_scale: float,
+        stop_event: threading.Event,
+        request: GenerationRequest,
         do_sample: bool,
         temperature: float,
         top_p: float,
         refresh_negative: bool,
         prefilled_outputs,
-        stop_event: threading.Event,
+        text_streamer: Optional[TextInputStreamer] = None,
+        record_metrics: bool = True,
+        preemption: Optional[GenerationPreemption] = None,
     ) -> None:
         try:
             self.model.generate(
                 **inputs,
                 max_new_tokens=None,
-                cfg_scale=cfg_scale,
+                generation_request=request,
                 tokenizer=self.processor.tokenizer,
                 generation_config={
                     "do_sample": do_sample,
@@ -224,31 +298,17 @@ class StreamingTTSService:
                 stop_check_fn=stop_event.is_set,
                 verbose=False,
                 refresh_negative=refresh_negative,
-                all_prefilled_outputs=copy.deepcopy(prefilled_outputs),
+                text_streamer=text_streamer,
+                stage_callback=self.metrics.observe_stage if self.metrics is not None and record_metrics else None,
+                all_prefilled_outputs=clone_prefilled_outputs(prefilled_outputs),
+                preemption=preemption,
             )
         except Exception as exc:  # pragma: no cover - diagnostic logging
             errors.append(exc)
             traceback.print_exc()
             audio_streamer.end()
 
-    def stream(
-        self,
-        text: str,
-        cfg_scale: float = 1.5,
-        do_sample: bool = False,
-        temperature: float = 0.9,
-        top_p: float = 0.9,
-        refresh_negative: bool = True,
-        inference_steps: Optional[int] = None,
-        voice_key: Optional[str] = None,
-        log_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
-        stop_event: Optional[threading.Event] = None,
-    ) -> Iterator[np.ndarray]:
-        if not text.strip():
-            return
-        text = text.replace("’", "'")
-        selected_voice, prefilled_outputs = self._get_voice_resources(voice_key)
-
+    def _make_emitter(self, log_callback: Optional[Callable[..., None]]) -> Callable[..., None]:
         def emit(event: str, **payload: Any) -> None:
             if log_callback:
                 try:
@@ -256,6 +316,24 @@ class StreamingTTSService:
                 except Exception as exc:
                     print(f"[log_callback] Error while emitting {event}: {exc}")
 
+        return emit
+
+    def _begin_request(
+        self,
+        text: str,
+        cfg_scale: float,
+        do_sample: bool,
+        inference_steps: Optional[int],
+        voice_key: Optional[str],
+        seed: Optional[int],
+        emit: Callable[..., None],
+    ) -> Tuple[Optional[np.ndarray], Optional[str], GenerationRequest, object, Optional[Dict[str, Any]]]:
+        """
+        Resolve voice, steps, seed and the result cache without touching shared state.
+        Returns (cached_audio, cache_key, generation request, prefilled_outputs, inputs).
+        """
+        selected_voice, prefilled_outputs = self._get_voice_resources(voice_key)
+
         steps_to_use = self.inference_steps
         if inference_steps is not None:
             try:
@@ -264,72 +342,339 @@ class StreamingTTSService:
                     steps_to_use = parsed_steps
             except (TypeError, ValueError):
                 pass
-        if self.model:
-            self.model.set_ddpm_inference_steps(num_steps=steps_to_use)
-        self.inference_steps = steps_to_use
+
+        if seed is None:
+            seed = self.default_seed
+        request = GenerationRequest(inference_steps=steps_to_use, cfg_scale=cfg_scale, sampler=self.sampler, seed=seed)
+        cache_key = None
+        # LM sampling is not covered by the seed, so only greedy requests are cacheable; streamed text
+        # (empty `text`) is not known up front.
+        if self.result_cache is not None and seed is not None and not do_sample and text.strip():
+            cache_key = self._cache_key(text, selected_voice, cfg_scale, steps_to_use, seed)
+            cached_audio = self.result_cache.get(cache_key)
+            if cached_audio is not None:
+                emit("cache_hit", audio_sec=cached_audio.size / self.sample_rate)
+                return cached_audio, cache_key, request, prefilled_outputs, None
 
         inputs = self._prepare_inputs(text, prefilled_outputs)
-        audio_streamer = AudioStreamer(batch_size=1, stop_signal=None, timeout=None)
-        errors: list = []
-        stop_signal = stop_event or threading.Event()
+        return None, cache_key, request, prefilled_outputs, inputs
 
+    def _start_generation(self, audio_streamer: AudioStreamer, errors: list, stop_signal: threading.Event, **kwargs: Any) -> threading.Thread:
         thread = threading.Thread(
             target=self._run_generation,
-            kwargs={
-                "inputs": inputs,
-                "audio_streamer": audio_streamer,
-                "errors": errors,
-                "cfg_scale": cfg_scale,
-                "do_sample": do_sample,
-                "temperature": temperature,
-                "top_p": top_p,
-                "refresh_negative": refresh_negative,
-                "prefilled_outputs": prefilled_outputs,
-                "stop_event": stop_signal,
-            },
+            kwargs={"audio_streamer": audio_streamer, "errors": errors, "stop_event": stop_signal, **kwargs},
             daemon=True,
         )
         thread.start()
+        return thread
+
+    async def _feed_text(
+        self,
+        text_stream: AsyncIterator[str],
+        text_streamer: TextInputStreamer,
+        stop_signal: threading.Event,
+        emit: Callable[..., None],
+    ) -> None:
+        text_length = 0
+        try:
+            async for piece in text_stream:
+                text_length += len(piece.strip())
+                text_streamer.put(piece)
+        finally:
+            if not text_length:
+                # Nothing to say: stop instead of generating from an empty text.
+                stop_signal.set()
+            text_streamer.end()
+            emit("text_stream_complete", text_length=text_length)
+
+    def _record_backpressure(self, audio_streamer: AudioStreamer, emit: Callable[..., None]) -> None:
+        stats = audio_streamer.backpressure_stats()
+        peak_sec = stats["peak_buffered_sec"][0]
+        totals = self.backpressure_totals
+        totals["streams"] += 1
+        totals["pause_sec"] += stats["pause_sec"]
+        totals["peak_buffered_sec"] = max(totals["peak_buffered_sec"], peak_sec)
+        if stats["pause_count"]:
+            # The client read slower than real time and held generation back.
+            totals["paused_streams"] += 1
+            emit(
+                "slow_consumer",
+                pause_count=stats["pause_count"],
+                pause_sec=round(stats["pause_sec"], 3),
+                peak_buffered_sec=round(peak_sec, 3),
+            )
+
+    def _observe_first_chunk(self, request_start: float) -> None:
+        if self.metrics is not None:
+            self.metrics.first_chunk.observe(time.perf_counter() - request_start)
+
+    def _observe_completion(
+        self, generation_start: float, generated_samples: int, audio_streamer: AudioStreamer, suspended_sec: float = 0.0,
+    ) -> None:
+        # Real-time factor of a complete generation; time the client held generation back or it was preempted is not counted.
+        if self.metrics is None or not generated_samples:
+            return
+        busy_sec = time.perf_counter() - generation_start - audio_streamer.backpressure_stats()["pause_sec"] - suspended_sec
+        self.metrics.rtf.observe(busy_sec / (generated_samples / self.sample_rate))
+
+    def _postprocess_chunk(self, audio_chunk: Any, limiter: LookaheadLimiter) -> np.ndarray:
+        if torch.is_tensor(audio_chunk):
+            audio_chunk = audio_chunk.detach().to("cpu", torch.float32).numpy()
+        # The limiter copies into a fresh array, so the tensor memory is not held on to.
+        return limiter.process(audio_chunk)
+
+    def _limited_stream(self, audio_chunks: Iterator[Any]) -> Iterator[np.ndarray]:
+        """Model chunks as float32 arrays within [-1, 1], through one limiter per stream."""
+        limiter = LookaheadLimiter(self.sample_rate)
+        for audio_chunk in audio_chunks:
+            chunk = self._postprocess_chunk(audio_chunk, limiter)
+            if chunk.size:
+                yield chunk
+        tail = limiter.flush()
+        if tail.size:
+            yield tail
+
+    async def _alimited_stream(self, audio_chunks: AsyncIterator[Any]) -> AsyncIterator[np.ndarray]:
+        limiter = LookaheadLimiter(self.sample_rate)
+        async for audio_chunk in audio_chunks:
+            chunk = self._postprocess_chunk(audio_chunk, limiter)
+            if chunk.size:
+                yield chunk
+        tail = limiter.flush()
+        if tail.size:
+            yield tail
+
+    def _store_result(self, cache_key: Optional[str], generated_chunks: list, stop_signal: threading.Event, errors: list) -> None:
+        # Only complete generations are cached: not ones stopped by the client or failed.
+        if cache_key is not None and generated_chunks and not stop_signal.is_set() and not errors:
+            try:
+                self.result_cache.put(cache_key, np.concatenate(generated_chunks))
+            except OSError as exc:
+                print(f"[cache] Failed to store result: {exc}")
+
+    def stream(
+        self,
+        text: str,
+        cfg_scale: float = 1.5,
+        do_sample: bool = False,
+        temperature: float = 0.9,
+        top_p: float = 0.9,
+        refresh_negative: bool = True,
+        inference_steps: Optional[int] = None,
+        voice_key: Optional[str] = None,
+        log_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        seed: Optional[int] = None,
+        text_streamer: Optional[TextInputStreamer] = None,
+    ) -> Iterator[np.ndarray]:
+        """Stream float32 chunks of `text`, or of the text fed to `text_streamer` while generation runs (`text` is then ignored)."""
+        if text_streamer is not None:
+            text = ""
+        elif not text.strip():
+            return
+        request_start = time.perf_counter()
+        text = text.replace("’", "'")
+        emit = self._make_emitter(log_callback)
+        cached_audio, cache_key, request, prefilled_outputs, inputs = self._begin_request(
+            text, cfg_scale, do_sample, inference_steps, voice_key, seed, emit,
+        )
+        if cached_audio is not None:
+            yield from self._replay_cached(cached_audio, emit)
+            return
+
+        audio_streamer = AudioStreamer(batch_size=1, stop_signal=None, timeout=None, max_buffered_sec=self.max_buffered_sec)
+        errors: list = []
+        stop_signal = stop_event or threading.Event()
+        thread = self._start_generation(
+            audio_streamer, errors, stop_signal,
+            inputs=inputs, request=request, do_sample=do_sample, temperature=temperature, top_p=top_p,
+            refresh_negative=refresh_negative, prefilled_outputs=prefilled_outputs,
+            text_streamer=text_streamer,
+        )
+        generation_start = time.perf_counter()
+        emit("generation_started", setup_ms=round((generation_start - request_start) * 1000.0, 2))
 
         generated_samples = 0
+        generated_chunks = []
 
         try:
-            stream = audio_streamer.get_stream(0)
-            for audio_chunk in stream:
-                if torch.is_tensor(audio_chunk):
-                    audio_chunk = audio_chunk.detach().cpu().to(torch.float32).numpy()
-                else:
-                    audio_chunk = np.asarray(audio_chunk, dtype=np.float32)
+            for chunk in self._limited_stream(audio_streamer.get_stream(0)):
+                generated_samples += int(chunk.size)
+                if generated_samples == chunk.size:
+                    self._observe_first_chunk(request_start)
+                emit(
+                    "model_progress",
+                    generated_sec=generated_samples / self.sample_rate,
+                    chunk_sec=chunk.size / self.sample_rate,
+                )
+                if cache_key is not None:
+                    generated_chunks.append(chunk)
 
-                if audio_chunk.ndim > 1:
-                    audio_chunk = audio_chunk.reshape(-1)
+                yield chunk
 
-                peak = np.max(np.abs(audio_chunk)) if audio_chunk.size else 0.0
-                if peak > 1.0:
-                    audio_chunk = audio_chunk / peak
+            if not stop_signal.is_set():
+                self._observe_completion(generation_start, generated_samples, audio_streamer)
+            self._store_result(cache_key, generated_chunks, stop_signal, errors)
+        finally:
+            stop_signal.set()
+            audio_streamer.end()
+            thread.join()
+            self._record_backpressure(audio_streamer, emit)
+            if errors:
+                emit("generation_error", message=str(errors[0]))
+                raise errors[0]
 
-                generated_samples += int(audio_chunk.size)
+    async def astream(
+        self,
+        text: str,
+        cfg_scale: float = 1.5,
+        do_sample: bool = False,
+        temperature: float = 0.9,
+        top_p: float = 0.9,
+        refresh_negative: bool = True,
+        inference_steps: Optional[int] = None,
+        voice_key: Optional[str] = None,
+        log_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        seed: Optional[int] = None,
+        text_stream: Optional[AsyncIterator[str]] = None,
+        preemption: Optional[GenerationPreemption] = None,
+    ) -> AsyncIterator[np.ndarray]:
+        """
+        Asyncio-native `stream`: the generation thread hands chunks to the event loop through
+        `AsyncAudioStreamer` (`call_soon_threadsafe`), so no thread hop is needed per chunk.
+        With `text_stream` (an async iterator of text pieces) the text is fed to the model while it
+        arrives and `text` is ignored. Close it with `aclose()` so generation is stopped and joined.
+        `preemption` lets the request queue suspend the generation between text windows.
+        """
+        if text_stream is not None:
+            text = ""
+        elif not text.strip():
+            return
+        request_start = time.perf_counter()
+        text = text.replace("’", "'")
+        emit = self._make_emitter(log_callback)
+        # Voice loading, tokenization and cache reads touch the disk; keep them off the event loop.
+        cached_audio, cache_key, request, prefilled_outputs, inputs = await asyncio.to_thread(
+            self._begin_request, text, cfg_scale, do_sample, inference_steps, voice_key, seed, emit,
+        )
+        if cached_audio is not None:
+            for chunk in self._replay_cached(cached_audio, emit):
+                yield chunk
+            return
+
+        audio_streamer = AsyncAudioStreamer(batch_size=1, stop_signal=None, timeout=None, max_buffered_sec=self.max_buffered_sec)
+        errors: list = []
+        stop_signal = stop_event or threading.Event()
+        text_streamer = None
+        feed_task = None
+        if text_stream is not None:
+            text_streamer = TextInputStreamer(self.processor.tokenizer)
+            feed_task = asyncio.create_task(self._feed_text(text_stream, text_streamer, stop_signal, emit))
+        thread = self._start_generation(
+            audio_streamer, errors, stop_signal,
+            inputs=inputs, request=request, do_sample=do_sample, temperature=temperature, top_p=top_p,
+            refresh_negative=refresh_negative, prefilled_outputs=prefilled_outputs,
+            text_streamer=text_streamer, preemption=preemption,
+        )
+        generation_start = time.perf_counter()
+        emit("generation_started", setup_ms=round((generation_start - request_start) * 1000.0, 2))
+
+        generated_samples = 0
+        generated_chunks = []
+
+        try:
+            async for chunk in self._alimited_stream(audio_streamer.get_stream(0)):
+                generated_samples += int(chunk.size)
+                if generated_samples == chunk.size:
+                    self._observe_first_chunk(request_start)
                 emit(
                     "model_progress",
                     generated_sec=generated_samples / self.sample_rate,
-                    chunk_sec=audio_chunk.size / self.sample_rate,
+                    chunk_sec=chunk.size / self.sample_rate,
                 )
+                if cache_key is not None:
+                    generated_chunks.append(chunk)
 
-                chunk_to_yield = audio_chunk.astype(np.float32, copy=False)
+                yield chunk
 
-                yield chunk_to_yield
+            if not stop_signal.is_set():
+                self._observe_completion(
+                    generation_start, generated_samples, audio_streamer,
+                    preemption.suspended_sec if preemption is not None else 0.0,
+                )
+            if cache_key is not None:
+                await asyncio.to_thread(self._store_result, cache_key, generated_chunks, stop_signal, errors)
         finally:
             stop_signal.set()
             audio_streamer.end()
-            thread.join()
+            if feed_task is not None:
+                feed_task.cancel()
+            await asyncio.to_thread(thread.join)
+            self._record_backpressure(audio_streamer, emit)
             if errors:
                 emit("generation_error", message=str(errors[0]))
                 raise errors[0]
 
+    def warmup(
+        self,
+        voice_keys: Optional[List[str]] = None,
+        texts: Tuple[str, ...] = WARMUP_TEXTS,
+        max_audio_sec: float = 5.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run synthetic generations so the first real request does not pay for kernel selection, allocator
+        growth, tokenizer setup and first-touch page faults. Every text runs once with every voice in
+        `voice_keys` (default: the default voice), each stopped after `max_audio_sec` of audio; the first
+        text and voice then run once more. Results (first-chunk latency per run, the first `cold` and the
+        repeat `warm`) bypass the result cache and the serving metrics.
+        """
+        voice_keys = voice_keys or [self.default_voice_key]
+        plan = [(voice, text) for voice in voice_keys for text in texts]
+        plan.append(plan[0])
+        request = GenerationRequest(inference_steps=self.inference_steps, cfg_scale=1.5, sampler=self.sampler, seed=0)
+        results = []
+        for index, (voice, text) in enumerate(plan):
+            key, prefilled_outputs = self._get_voice_resources(voice)
+            start = time.perf_counter()
+            inputs = self._prepare_inputs(text, prefilled_outputs)
+            audio_streamer = AudioStreamer(batch_size=1, stop_signal=None, timeout=None)
+            errors: list = []
+            stop_signal = threading.Event()
+            thread = self._start_generation(
+                audio_streamer, errors, stop_signal,
+                inputs=inputs, request=request, do_sample=False, temperature=1.0, top_p=1.0,
+                refresh_negative=True, prefilled_outputs=prefilled_outputs, record_metrics=False,
+            )
+            first_chunk_sec = None
+            audio_samples = 0
+            for audio_chunk in audio_streamer.get_stream(0):
+                if first_chunk_sec is None:
+                    first_chunk_sec = time.perf_counter() - start
+                audio_samples += int(audio_chunk.shape[-1])
+                if audio_samples >= max_audio_sec * self.sample_rate:
+                    stop_signal.set()
+            thread.join()
+            if errors:
+                raise errors[0]
+            run = "cold" if index == 0 else "warm" if index == len(plan) - 1 else "warmup"
+            results.append({
+                "voice": key,
+                "text_words": len(text.split()),
+                "run": run,
+                "first_chunk_sec": first_chunk_sec,
+                "total_sec": time.perf_counter() - start,
+                "audio_sec": audio_samples / self.sample_rate,
+            })
+            print(
+                f"[warmup] {key}, {len(text.split())} words ({run}): first chunk "
+                f"{(first_chunk_sec or 0.0) * 1000:.0f} ms, {audio_samples / self.sample_rate:.1f}s audio in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+        return results
+
     def chunk_to_pcm16(self, chunk: np.ndarray) -> bytes:
-        chunk = np.clip(chunk, -1.0, 1.0)
-        pcm = (chunk * 32767.0).astype(np.int16)
-        return pcm.tobytes()
+        return float_to_pcm16(chunk).tobytes()
 
 
 app = FastAPI()
@@ -342,153 +687,757 @@ async def _startup() -> None:
         raise RuntimeError("MODEL_PATH not set in environment")
 
     device = os.environ.get("MODEL_DEVICE", "cuda")
-    
+    default_seed = os.environ.get("TTS_DEFAULT_SEED")
+    num_workers = int(os.environ.get("TTS_WORKERS", "0"))
+
+    service_kwargs = {
+        "cache_dir": os.environ.get("TTS_CACHE_DIR"),
+        "cache_max_bytes": int(float(os.environ.get("TTS_CACHE_MAX_MB", "1024")) * (1 << 20)),
+        "default_seed": int(default_seed) if default_seed else None,
+        "max_buffered_sec": float(os.environ.get("TTS_MAX_BUFFER_SEC", "10")) or None,
+    }
+    metrics = TTSMetrics()
+    app.state.metrics = metrics
+    app.state.ready = False
+    app.state.readiness = {"phase": "loading"}
+    metrics.ready.set(0)
+    warmup_kwargs = None
+    if os.environ.get("TTS_WARMUP", "1") != "0":
+        pinned_voices = [v.strip() for v in os.environ.get("TTS_PINNED_VOICES", "").split(",") if v.strip()]
+        warmup_kwargs = {
+            "voice_keys": pinned_voices or None,
+            "max_audio_sec": float(os.environ.get("TTS_WARMUP_MAX_SEC", "5")),
+        }
+    # With a worker pool the replicas own caching and seeding; the parent only serves voices (and shared weights).
     service = StreamingTTSService(
-        model_path=model_path,
-        device=device
+        model_path=model_path, device=device, metrics=metrics, **(service_kwargs if num_workers <= 0 else {}),
     )
-    service.load()
+
+    app.state.worker_pool = None
+    if num_workers > 0:
+        shared_model = None
+        if device == "cpu":
+            # Replicas map the parent's weights from shared memory instead of loading a copy each.
+            service.load()
+            service.model.share_memory()
+            shared_model = service.model
+        else:
+            service.load_voices()
+        devices = [d.strip() for d in os.environ.get("TTS_WORKER_DEVICES", "").split(",") if d.strip()]
+        if not devices:
+            gpu_count = torch.cuda.device_count() if device == "cuda" else 0
+            devices = [f"cuda:{i}" for i in range(gpu_count)] if gpu_count > 1 else [device]
+        threads = os.environ.get("TTS_WORKER_THREADS")
+        pool = WorkerPool(
+            model_path=model_path,
+            num_workers=num_workers,
+            devices=devices,
+            threads_per_worker=int(threads) if threads else None,
+            service_kwargs=service_kwargs,
+            shared_model=shared_model,
+            metrics=metrics,
+            warmup_kwargs=warmup_kwargs,
+        )
+        app.state.worker_pool = pool
+    else:
+        service.load()
 
     app.state.tts_service = service
     app.state.model_path = model_path
     app.state.device = device
-    app.state.websocket_lock = asyncio.Lock()
-    print("[startup] Model ready.")
-
+    rate_per_min = float(os.environ.get("TTS_RATE_LIMIT_PER_MIN", "30"))
+    max_wait_sec = float(os.environ.get("TTS_QUEUE_MAX_WAIT_SEC", "60"))
+    # One model serves one stream at a time, so by default one request runs per replica.
+    app.state.request_queue = RequestQueue(
+        concurrency=int(os.environ.get("TTS_QUEUE_CONCURRENCY", str(max(1, num_workers)))),
+        max_depth=int(os.environ.get("TTS_QUEUE_MAX_DEPTH", "16")),
+        rate_per_min=rate_per_min if rate_per_min > 0 else None,
+        burst=float(os.environ.get("TTS_RATE_LIMIT_BURST", "10")),
+        max_wait_sec=max_wait_sec if max_wait_sec > 0 else None,
+        on_admit=metrics.queue_wait.observe,
+        on_resume=metrics.preempted.observe,
+    )
+    # Batch items yield the in-process model to interactive requests between text windows. Replicas serve
+    # one stream at a time and cannot set a suspended one aside, so batch work there is only deprioritized.
+    park_dir = os.environ.get("TTS_PARK_DIR") or None
+    if park_dir is not None:
+        os.makedirs(park_dir, exist_ok=True)
+    preempt_batch = os.environ.get("TTS_PREEMPT_BATCH", "1") == "1" and num_workers <= 0
+    app.state.preemption = {"enabled": preempt_batch, "park": park_dir or "host_memory"}
+    app.state.batch_jobs = BatchJobManager(
+        open_audio_stream,
+        app.state.request_queue,
+        output_dir=os.environ.get("TTS_JOBS_DIR", "outputs/tts_jobs"),
+        sample_rate=SAMPLE_RATE,
+        concurrency=int(os.environ.get("TTS_JOB_CONCURRENCY", str(max(1, num_workers)))),
+        max_items=int(os.environ.get("TTS_JOB_MAX_ITEMS", "10000")),
+        make_preemption=(lambda: GenerationPreemption(park_dir)) if preempt_batch else None,
+    )
+    app.state.coalescing = CoalescingPolicy(
+        target_ms=float(os.environ.get("TTS_COALESCE_MS", "0")),
+        max_bytes=int(float(os.environ.get("TTS_COALESCE_MAX_KB", "64")) * 1024),
+        safety_ms=float(os.environ.get("TTS_COALESCE_SAFETY_MS", "100")),
+    )
+    # Resampling and Opus encoding run here instead of on the event loop.
+    app.state.encoder_executor = ThreadPoolExecutor(
+        max_workers=int(os.environ.get("TTS_ENCODER_THREADS", "2")), thread_name_prefix="audio-encoder"
+    )
+    # The server answers /health (and queues requests) while replicas start and warm up; /ready waits for it.
+    app.state.readiness_task = asyncio.create_task(_become_ready(warmup_kwargs))
+    print("[startup] Model loaded, warming up.")
+
+
+async def _become_ready(warmup_kwargs: Optional[Dict[str, Any]]) -> None:
+    """Start the worker replicas or warm up the in-process model, holding every queue slot meanwhile."""
+    request_queue: RequestQueue = app.state.request_queue
+    metrics: TTSMetrics = app.state.metrics
+    # Requests that arrive now wait in the queue (with position updates) instead of racing the warmup.
+    for _ in range(request_queue.concurrency):
+        await request_queue.acquire("warmup", check_rate=False)
+    start = time.perf_counter()
+    app.state.readiness = {"phase": "warming_up"}
+    try:
+        pool: Optional[WorkerPool] = app.state.worker_pool
+        if pool is not None:
+            # Replicas warm themselves up before they report ready.
+            await pool.start()
+        elif warmup_kwargs is not None:
+            service: StreamingTTSService = app.state.tts_service
+            metrics.record_warmup(await asyncio.to_thread(service.warmup, **warmup_kwargs))
+    except Exception as exc:
+        traceback.print_exc()
+        app.state.readiness = {"phase": "failed", "error": f"{type(exc).__name__}: {exc}"}
+        return
+    finally:
+        for _ in range(request_queue.concurrency):
+            request_queue.release()
+    app.state.readiness = {"phase": "ready", "warmup_sec": round(time.perf_counter() - start, 2)}
+    app.state.ready = True
+    metrics.ready.set(1)
+    print(f"[startup] Ready after {time.perf_counter() - start:.1f}s of warmup.")
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    readiness_task: Optional[asyncio.Task] = getattr(app.state, "readiness_task", None)
+    if readiness_task is not None:
+        readiness_task.cancel()
+    pool: Optional[WorkerPool] = getattr(app.state, "worker_pool", None)
+    if pool is not None:
+        await pool.close()
+    executor: Optional[ThreadPoolExecutor] = getattr(app.state, "encoder_executor", None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def chunk_gap_stats(send_times: list) -> Dict[str, float]:
+    """Gaps between consecutive chunk sends: mean, jitter (standard deviation) and max, in milliseconds."""
+    if len(send_times) < 2:
+        return {}
+    gaps = np.diff(np.asarray(send_times)) * 1000.0
+    return {
+        "chunks": len(send_times),
+        "mean_gap_ms": round(float(gaps.mean()), 2),
+        "jitter_ms": round(float(gaps.std()), 2),
+        "max_gap_ms": round(float(gaps.max()), 2),
+    }
 
-def streaming_tts(text: str, **kwargs) -> Iterator[np.ndarray]:
+def parse_stream_params(source: Mapping[str, Any], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Read `cfg`, `steps`, `voice` and `seed` from query parameters or a session message into `stream` kwargs.
+    Missing or invalid values keep the value from `defaults` (the server defaults when not given).
+    """
+    params = dict(defaults) if defaults else {"cfg_scale": 1.5, "inference_steps": None, "voice_key": None, "seed": None}
+    if source.get("cfg") is not None:
+        try:
+            cfg_scale = float(source["cfg"])
+            if cfg_scale > 0:
+                params["cfg_scale"] = cfg_scale
+        except (TypeError, ValueError):
+            pass
+    if source.get("steps") is not None:
+        try:
+            inference_steps = int(source["steps"])
+            if inference_steps > 0:
+                params["inference_steps"] = inference_steps
+        except (TypeError, ValueError):
+            pass
+    if source.get("voice"):
+        params["voice_key"] = str(source["voice"])
+    if source.get("seed") is not None:
+        try:
+            params["seed"] = int(source["seed"])
+        except (TypeError, ValueError):
+            pass
+    return params
+
+
+def open_audio_stream(
+    text: str,
+    log_callback: Callable[..., None],
+    stop_event: threading.Event,
+    **params: Any,
+) -> AsyncIterator[np.ndarray]:
+    """Stream `text` from the worker pool when one is running, otherwise from the in-process model."""
+    worker_pool: Optional[WorkerPool] = app.state.worker_pool
+    if worker_pool is not None:
+        # Replicas are stopped by closing the iterator, which sends them a cancel.
+        return _track_stream(worker_pool.stream(text, log_callback=log_callback, **params))
     service: StreamingTTSService = app.state.tts_service
-    yield from service.stream(text, **kwargs)
+    return _track_stream(service.astream(text, log_callback=log_callback, stop_event=stop_event, **params))
+
+
+async def _track_stream(iterator: AsyncIterator[np.ndarray]) -> AsyncIterator[np.ndarray]:
+    # Counts streams in progress and how they ended for /metrics.
+    metrics: TTSMetrics = app.state.metrics
+    metrics.active_streams.inc()
+    outcome = "cancelled"
+    try:
+        async for chunk in iterator:
+            yield chunk
+        outcome = "completed"
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        metrics.active_streams.dec()
+        metrics.streams.inc(outcome=outcome)
+        await iterator.aclose()
+
+
+def open_frame_writer(ws: WebSocket) -> FrameWriter:
+    """Frame writer of a connection, with the server's coalescing policy and its frames counted in /metrics."""
+    metrics: TTSMetrics = app.state.metrics
+    return FrameWriter.for_connection(ws, app.state.coalescing, on_frame=metrics.observe_audio_frame)
+
+
+async def negotiate_audio_format(ws: WebSocket, writer: FrameWriter) -> Optional[AudioEncoder]:
+    """
+    Encoder for the `codec`, `sample_rate` and `bitrate` query parameters of a connection, announced to the
+    client in an `audio_format` log event. Invalid parameters are reported and the socket is closed (None).
+    """
+    try:
+        encoder = negotiate_encoder(ws.query_params, SAMPLE_RATE)
+    except ValueError as exc:
+        writer.log("backend_error", message=str(exc))
+        await writer.flush_events(force=True)
+        with contextlib.suppress(Exception):
+            await ws.close(code=1003, reason="Unsupported audio format")
+        return None
+    writer.set_rates(SAMPLE_RATE, encoder.sample_rate)
+    writer.log("audio_format", protocol="framed" if writer.framed else "raw", **encoder.describe())
+    await writer.flush_events(force=True)
+    return encoder
+
+
+async def encode_audio(encoder: AudioEncoder, chunk: Optional[np.ndarray] = None) -> Union[bytes, memoryview]:
+    """
+    Encode a chunk (or flush the encoder when `chunk` is None) off the event loop if the codec is costly.
+    The result may view a buffer of the encoder; send it before encoding the stream's next chunk.
+    """
+    work = encoder.flush if chunk is None else (lambda: encoder.encode(chunk))
+    if encoder.offload:
+        return await asyncio.get_running_loop().run_in_executor(app.state.encoder_executor, work)
+    return work()
+
 
 @app.websocket("/stream")
 async def websocket_stream(ws: WebSocket) -> None:
     await ws.accept()
     text = ws.query_params.get("text", "")
     print(f"Client connected, text={text!r}")
-    cfg_param = ws.query_params.get("cfg")
-    steps_param = ws.query_params.get("steps")
-    voice_param = ws.query_params.get("voice")
+    params = parse_stream_params(ws.query_params)
+    writer = open_frame_writer(ws)
+    encoder = await negotiate_audio_format(ws, writer)
+    if encoder is None:
+        return
 
+    request_queue: RequestQueue = app.state.request_queue
+    client_id = ws.client.host if ws.client else "unknown"
+
+    async def send_log(event: str, **data: Any) -> None:
+        writer.log(event, **data)
+        await writer.flush_events(force=True)
+
+    async def on_queue_update(position: int, estimated_wait_sec: float) -> None:
+        await send_log("backend_queued", position=position, estimated_wait_sec=round(estimated_wait_sec, 1))
+
+    async def wait_for_disconnect() -> None:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    # Watch the socket while queued so a client that leaves gives up its place.
+    disconnect_task = asyncio.create_task(wait_for_disconnect())
+    acquire_task = asyncio.create_task(request_queue.acquire(client_id, on_queue_update))
+    await asyncio.wait({acquire_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    disconnect_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, WebSocketDisconnect):
+        await disconnect_task
+    if not acquire_task.done():
+        acquire_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await acquire_task
+        print("Client disconnected while queued")
+        app.state.metrics.dropped_clients.inc(phase="queued")
+        return
     try:
-        cfg_scale = float(cfg_param) if cfg_param is not None else 1.5
-    except ValueError:
-        cfg_scale = 1.5
-    if cfg_scale <= 0:
-        cfg_scale = 1.5
-    try:
-        inference_steps = int(steps_param) if steps_param is not None else None
-        if inference_steps is not None and inference_steps <= 0:
-            inference_steps = None
-    except ValueError:
-        inference_steps = None
-
-    service: StreamingTTSService = app.state.tts_service
-    lock: asyncio.Lock = app.state.websocket_lock
-
-    if lock.locked():
-        busy_message = {
-            "type": "log",
-            "event": "backend_busy",
-            "data": {"message": "Please wait for the other requests to complete."},
-            "timestamp": get_timestamp(),
-        }
-        print("Please wait for the other requests to complete.")
-        try:
-            await ws.send_text(json.dumps(busy_message))
-        except Exception:
-            pass
+        acquire_task.result()
+    except RateLimitedError as exc:
+        print(f"Rate limited client {client_id}")
+        await send_log("backend_rate_limited", message=str(exc), retry_after_sec=round(exc.retry_after, 1))
+        await ws.close(code=1013, reason="Rate limited")
+        return
+    except QueueFullError as exc:
+        print(f"Please wait for the other requests to complete. ({exc})")
+        await send_log("backend_busy", message="Please wait for the other requests to complete.")
         await ws.close(code=1013, reason="Service busy")
         return
 
-    acquired = False
+    service_start = time.monotonic()
+    completed = False
     try:
-        await lock.acquire()
-        acquired = True
-
-        log_queue: "Queue[Dict[str, Any]]" = Queue()
-
-        def enqueue_log(event: str, **data: Any) -> None:
-            log_queue.put({"event": event, "data": data})
-
-        async def flush_logs() -> None:
-            while True:
-                try:
-                    entry = log_queue.get_nowait()
-                except Empty:
-                    break
-                message = {
-                    "type": "log",
-                    "event": entry.get("event"),
-                    "data": entry.get("data", {}),
-                    "timestamp": get_timestamp(),
-                }
-                try:
-                    await ws.send_text(json.dumps(message))
-                except Exception:
-                    break
-
+        enqueue_log = writer.log
+        writer.begin_stream()
         enqueue_log(
             "backend_request_received",
             text_length=len(text or ""),
-            cfg_scale=cfg_scale,
-            inference_steps=inference_steps,
-            voice=voice_param,
+            cfg_scale=params["cfg_scale"],
+            inference_steps=params["inference_steps"],
+            voice=params["voice_key"],
+            seed=params["seed"],
         )
 
         stop_signal = threading.Event()
-
-        iterator = streaming_tts(
-            text,
-            cfg_scale=cfg_scale,
-            inference_steps=inference_steps,
-            voice_key=voice_param,
-            log_callback=enqueue_log,
-            stop_event=stop_signal,
-        )
         sentinel = object()
+        iterator = open_audio_stream(text, enqueue_log, stop_signal, **params)
+
+        async def next_chunk() -> Any:
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                return sentinel
+
         first_ws_send_logged = False
 
-        await flush_logs()
+        await writer.flush_events(force=True)
+        writer.start()
+
+        async def receive_feedback() -> None:
+            # Buffer reports for the coalescing policy; a disconnect ends the loop below.
+            with contextlib.suppress(WebSocketDisconnect):
+                while True:
+                    message = await ws.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    try:
+                        command = json.loads(message.get("text") or "")
+                    except ValueError:
+                        continue
+                    if isinstance(command, dict) and command.get("type") == "feedback":
+                        writer.feedback(command.get("buffered_ms"), command.get("rtt_ms"))
+
+        feedback_task = asyncio.create_task(receive_feedback())
 
         try:
             while ws.client_state == WebSocketState.CONNECTED:
-                await flush_logs()
-                chunk = await asyncio.to_thread(next, iterator, sentinel)
+                chunk = await next_chunk()
+                generated_at = time.perf_counter()
                 if chunk is sentinel:
+                    completed = True
+                    await writer.send_audio(await encode_audio(encoder), 0, generated_at)
+                    await writer.end_stream()
                     break
                 chunk = cast(np.ndarray, chunk)
-                payload = service.chunk_to_pcm16(chunk)
-                await ws.send_bytes(payload)
+                payload = await encode_audio(encoder, chunk)
+                await writer.send_audio(payload, int(chunk.size), generated_at)
                 if not first_ws_send_logged:
                     first_ws_send_logged = True
                     enqueue_log("backend_first_chunk_sent")
-                await flush_logs()
+                await writer.flush_events()
+            else:
+                print("Client disconnected")
+                app.state.metrics.dropped_clients.inc(phase="streaming")
+                enqueue_log("client_disconnected")
         except WebSocketDisconnect:
             print("Client disconnected (WebSocketDisconnect)")
+            app.state.metrics.dropped_clients.inc(phase="streaming")
             enqueue_log("client_disconnected")
             stop_signal.set()
         finally:
             stop_signal.set()
-            enqueue_log("backend_stream_complete")
-            await flush_logs()
+            feedback_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await feedback_task
+            gap_stats = chunk_gap_stats(writer.frame_times)
+            if gap_stats:
+                print(f"[stream] chunk gaps: {gap_stats}")
+            print(f"[stream] audio: {encoder.stats()}")
+            enqueue_log("backend_stream_complete", **gap_stats, **writer.stream_stats(), **encoder.stats())
+            await writer.stop()
             try:
-                iterator_close = getattr(iterator, "close", None)
-                if callable(iterator_close):
-                    iterator_close()
+                await iterator.aclose()
             except Exception:
                 pass
-            # clear the log queue
-            while not log_queue.empty():
-                try:
-                    log_queue.get_nowait()
-                except Empty:
-                    break
+            writer.discard_events()
             if ws.client_state == WebSocketState.CONNECTED:
                 await ws.close()
             print("WS handler exit")
     finally:
-        if acquired:
-            lock.release()
+        # Only complete streams feed the queue's wait estimate.
+        request_queue.release(time.monotonic() - service_start if completed else None)
+
+
+@app.websocket("/stream_text")
+async def websocket_stream_text(ws: WebSocket) -> None:
+    """
+    Speak text while it is still being written, e.g. the output of an LLM.
+
+    Query parameters are those of `/stream` without `text`. The client sends the text as JSON frames
+    `{"type": "text", "text": "<delta>"}` and finishes with `{"type": "end"}`; `{"type": "cancel"}` stops.
+    Generation starts once the first text window has arrived and audio comes back as binary PCM16
+    frames while more text is sent. With `framing=binary`, audio and log events use the frames of `FrameWriter`.
+    """
+    await ws.accept()
+    params = parse_stream_params(ws.query_params)
+    writer = open_frame_writer(ws)
+    encoder = await negotiate_audio_format(ws, writer)
+    if encoder is None:
+        return
+    request_queue: RequestQueue = app.state.request_queue
+    client_id = ws.client.host if ws.client else "unknown"
+    pieces: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    stop_signal = threading.Event()
+    text_state = {"length": 0, "first_at": None, "ended": False}
+    enqueue_log = writer.log
+
+    async def on_queue_update(position: int, estimated_wait_sec: float) -> None:
+        enqueue_log("backend_queued", position=position, estimated_wait_sec=round(estimated_wait_sec, 1))
+        await writer.flush_events(force=True)
+
+    async def receive_text() -> None:
+        # Runs for the whole request: text is buffered while queued, and a cancel or disconnect stops generation.
+        try:
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                try:
+                    command = json.loads(message.get("text") or "")
+                except ValueError:
+                    command = None
+                kind = command.get("type") if isinstance(command, dict) else None
+                if kind == "text" and not text_state["ended"]:
+                    piece = str(command.get("text") or "")
+                    if piece and text_state["first_at"] is None:
+                        text_state["first_at"] = time.perf_counter()
+                    text_state["length"] += len(piece)
+                    pieces.put_nowait(piece)
+                elif kind == "end" and not text_state["ended"]:
+                    text_state["ended"] = True
+                    pieces.put_nowait(None)
+                elif kind == "cancel":
+                    break
+                elif kind == "feedback":
+                    writer.feedback(command.get("buffered_ms"), command.get("rtt_ms"))
+                elif kind not in ("text", "end"):
+                    enqueue_log("backend_error", message="Expected a JSON message of type text, end or cancel")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            stop_signal.set()
+            if not text_state["ended"]:
+                pieces.put_nowait(None)
+
+    async def text_stream() -> AsyncIterator[str]:
+        while True:
+            piece = await pieces.get()
+            if piece is None:
+                return
+            yield piece
+
+    reader_task = asyncio.create_task(receive_text())
+    acquire_task = asyncio.create_task(request_queue.acquire(client_id, on_queue_update))
+    await asyncio.wait({acquire_task, reader_task}, return_when=asyncio.FIRST_COMPLETED)
+    if not acquire_task.done():
+        acquire_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await acquire_task
+        print("Client left while queued")
+        app.state.metrics.dropped_clients.inc(phase="queued")
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.close()
+        return
+    refusal = acquire_task.exception()
+    if refusal is not None or stop_signal.is_set():
+        if refusal is None:
+            request_queue.release()
+        elif isinstance(refusal, RateLimitedError):
+            enqueue_log("backend_rate_limited", message=str(refusal), retry_after_sec=round(refusal.retry_after, 1))
+        elif isinstance(refusal, QueueFullError):
+            enqueue_log("backend_busy", message="Please wait for the other requests to complete.")
+        else:
+            raise refusal
+        reader_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await reader_task
+        if ws.client_state == WebSocketState.CONNECTED:
+            await writer.flush_events(force=True)
+            await ws.close(code=1013 if refusal is not None else 1000)
+        return
+
+    service_start = time.monotonic()
+    completed = False
+    first_audio_after_text_ms = None
+    enqueue_log(
+        "backend_request_received",
+        streaming_text=True,
+        cfg_scale=params["cfg_scale"],
+        inference_steps=params["inference_steps"],
+        voice=params["voice_key"],
+        seed=params["seed"],
+    )
+    writer.begin_stream()
+    writer.start()
+    iterator = open_audio_stream("", enqueue_log, stop_signal, text_stream=text_stream(), **params)
+    try:
+        async for chunk in iterator:
+            generated_at = time.perf_counter()
+            if stop_signal.is_set():
+                break
+            payload = await encode_audio(encoder, chunk)
+            await writer.send_audio(payload, int(chunk.size), generated_at)
+            if first_audio_after_text_ms is None and writer.frame_times:
+                first_sent = writer.frame_times[0]
+                first_audio_after_text_ms = (first_sent - (text_state["first_at"] or first_sent)) * 1000.0
+                enqueue_log("backend_first_chunk_sent", after_first_text_ms=round(first_audio_after_text_ms, 2))
+            await writer.flush_events()
+        else:
+            completed = not stop_signal.is_set()
+            if completed:
+                await writer.send_audio(await encode_audio(encoder), 0)
+                await writer.end_stream()
+    except WebSocketDisconnect:
+        print("Client disconnected (WebSocketDisconnect)")
+    finally:
+        stop_signal.set()
+        with contextlib.suppress(Exception):
+            await iterator.aclose()
+        reader_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await reader_task
+        request_queue.release(time.monotonic() - service_start if completed else None)
+        if not completed and ws.client_state != WebSocketState.CONNECTED:
+            app.state.metrics.dropped_clients.inc(phase="streaming")
+        enqueue_log(
+            "backend_stream_complete",
+            text_length=text_state["length"],
+            **chunk_gap_stats(writer.frame_times),
+            **writer.stream_stats(),
+            **encoder.stats(),
+        )
+        await writer.stop(flush=ws.client_state == WebSocketState.CONNECTED)
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.close()
+        print("WS handler exit")
+
+
+@app.websocket("/session")
+async def websocket_session(ws: WebSocket) -> None:
+    """
+    Multi-utterance session over one connection.
+
+    Query parameters (`voice`, `cfg`, `steps`, `seed`) set the session defaults; the voice is loaded when
+    the session opens and stays cached between turns. What a turn saves over a new `/stream` connection is
+    the voice load and the reconnect: each utterance still clones the prefilled voice caches (containers
+    only, see `clone_prefilled_outputs`) and allocates its own KV and decoder streaming caches.
+    The client then sends JSON text frames:
+
+        {"type": "speak", "text": "...", "id": "turn-1", "voice": ..., "cfg": ..., "steps": ..., "seed": ...}
+        {"type": "cancel"}   stop the current utterance and drop the ones still waiting in this session
+        {"type": "close"}    finish the waiting utterances, then close
+
+    Utterances run one after another, each through the request queue. Audio comes back as binary frames in
+    the format negotiated by the `codec` / `sample_rate` / `bitrate` query parameters (PCM16 by default);
+    `utterance_started` and `utterance_complete` log events (with the utterance `id`) delimit them. With
+    `framing=binary` every frame carries a header (see `FrameWriter`) and each utterance gets a new stream id.
+    """
+    await ws.accept()
+    writer = open_frame_writer(ws)
+    if await negotiate_audio_format(ws, writer) is None:
+        return
+    service: StreamingTTSService = app.state.tts_service
+    request_queue: RequestQueue = app.state.request_queue
+    client_id = ws.client.host if ws.client else "unknown"
+    defaults = parse_stream_params(ws.query_params)
+    pending: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+    current: Dict[str, Any] = {"stop": None, "acquire": None}
+    enqueue_log = writer.log
+
+    async def flush_logs() -> None:
+        await writer.flush_events(force=True)
+
+    def cancel_current() -> None:
+        if current["acquire"] is not None and not current["acquire"].done():
+            current["acquire"].cancel()
+        if current["stop"] is not None:
+            current["stop"].set()
+
+    async def receive_commands() -> None:
+        try:
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                try:
+                    command = json.loads(message.get("text") or "")
+                except ValueError:
+                    command = None
+                kind = command.get("type") if isinstance(command, dict) else None
+                if kind == "speak":
+                    pending.put_nowait(command)
+                elif kind == "cancel":
+                    while not pending.empty():
+                        dropped = pending.get_nowait()
+                        enqueue_log("utterance_complete", id=dropped.get("id"), completed=False, cancelled=True)
+                    cancel_current()
+                elif kind == "close":
+                    break
+                elif kind == "feedback":
+                    writer.feedback(command.get("buffered_ms"), command.get("rtt_ms"))
+                else:
+                    enqueue_log("backend_error", message="Expected a JSON message of type speak, cancel or close")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if ws.client_state != WebSocketState.CONNECTED:
+                cancel_current()
+            pending.put_nowait(None)
+
+    async def speak(command: Dict[str, Any], turn: int) -> None:
+        utterance_id = command.get("id", turn)
+        text = str(command.get("text") or "")
+        params = parse_stream_params(command, defaults)
+        received = time.perf_counter()
+        stop_signal = threading.Event()
+        current["stop"] = stop_signal
+        writer.begin_stream()
+        enqueue_log("utterance_started", id=utterance_id, turn=turn, text_length=len(text), voice=params["voice_key"])
+        await flush_logs()
+
+        async def on_queue_update(position: int, estimated_wait_sec: float) -> None:
+            enqueue_log("backend_queued", id=utterance_id, position=position, estimated_wait_sec=round(estimated_wait_sec, 1))
+            await flush_logs()
+
+        acquire_task = asyncio.create_task(request_queue.acquire(client_id, on_queue_update))
+        current["acquire"] = acquire_task
+        await asyncio.wait({acquire_task})
+        refused = None
+        if acquire_task.cancelled():
+            refused = "cancelled"
+        elif acquire_task.exception() is None and stop_signal.is_set():
+            # Cancelled before the queue was entered.
+            request_queue.release()
+            refused = "cancelled"
+        elif isinstance(acquire_task.exception(), RateLimitedError):
+            exc = acquire_task.exception()
+            enqueue_log("backend_rate_limited", id=utterance_id, message=str(exc), retry_after_sec=round(exc.retry_after, 1))
+            refused = "rate_limited"
+        elif isinstance(acquire_task.exception(), QueueFullError):
+            enqueue_log("backend_busy", id=utterance_id, message="Please wait for the other requests to complete.")
+            refused = "busy"
+        elif acquire_task.exception() is not None:
+            raise acquire_task.exception()
+        if refused is not None:
+            if refused == "cancelled" and ws.client_state != WebSocketState.CONNECTED:
+                app.state.metrics.dropped_clients.inc(phase="queued")
+            current["stop"] = current["acquire"] = None
+            enqueue_log("utterance_complete", id=utterance_id, completed=False, cancelled=refused == "cancelled", reason=refused)
+            await flush_logs()
+            return
+
+        queue_ms = (time.perf_counter() - received) * 1000.0
+        service_start = time.monotonic()
+        completed = False
+        first_chunk_ms = None
+        audio_samples = 0
+        # A fresh encoder per utterance: Opus is flushed at the end of each one.
+        encoder = negotiate_encoder(ws.query_params, SAMPLE_RATE)
+        iterator = open_audio_stream(text, enqueue_log, stop_signal, **params)
+        try:
+            async for chunk in iterator:
+                generated_at = time.perf_counter()
+                if stop_signal.is_set():
+                    break
+                payload = await encode_audio(encoder, chunk)
+                await writer.send_audio(payload, int(chunk.size), generated_at)
+                audio_samples += int(chunk.size)
+                if first_chunk_ms is None:
+                    first_chunk_ms = (time.perf_counter() - received) * 1000.0
+                    enqueue_log("backend_first_chunk_sent", id=utterance_id)
+                await writer.flush_events()
+            else:
+                completed = not stop_signal.is_set()
+                if completed:
+                    await writer.send_audio(await encode_audio(encoder), 0)
+                    await writer.end_stream()
+        except WebSocketDisconnect:
+            print("Client disconnected (WebSocketDisconnect)")
+        except Exception as exc:
+            # One failed utterance should not end the session.
+            enqueue_log("backend_error", id=utterance_id, message=f"{type(exc).__name__}: {exc}")
+        finally:
+            stop_signal.set()
+            with contextlib.suppress(Exception):
+                await iterator.aclose()
+            current["stop"] = current["acquire"] = None
+            if not completed:
+                writer.discard_audio()
+            request_queue.release(time.monotonic() - service_start if completed else None)
+            if not completed and ws.client_state != WebSocketState.CONNECTED:
+                app.state.metrics.dropped_clients.inc(phase="streaming")
+        enqueue_log(
+            "utterance_complete",
+            id=utterance_id,
+            completed=completed,
+            cancelled=not completed and stop_signal.is_set(),
+            audio_sec=round(audio_samples / SAMPLE_RATE, 3),
+            queue_ms=round(queue_ms, 2),
+            first_chunk_ms=round(first_chunk_ms, 2) if first_chunk_ms is not None else None,
+            total_ms=round((time.perf_counter() - received) * 1000.0, 2),
+            **writer.stream_stats(),
+            **encoder.stats(),
+        )
+        await flush_logs()
+
+    print(f"Session opened by {client_id}")
+    if app.state.worker_pool is None:
+        # Load the session voice now rather than on the first turn; replicas cache voices themselves.
+        voice_key, _ = await asyncio.to_thread(service._get_voice_resources, defaults["voice_key"])
+    else:
+        voice_key = defaults["voice_key"] or service.default_voice_key
+    enqueue_log("session_ready", voice=voice_key, cfg_scale=defaults["cfg_scale"], inference_steps=defaults["inference_steps"])
+    await flush_logs()
+    writer.start()
+
+    reader_task = asyncio.create_task(receive_commands())
+    turns = 0
+    try:
+        while ws.client_state == WebSocketState.CONNECTED:
+            command = await pending.get()
+            if command is None:
+                break
+            turns += 1
+            await speak(command, turns)
+    finally:
+        reader_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, WebSocketDisconnect):
+            await reader_task
+        await writer.stop(flush=ws.client_state == WebSocketState.CONNECTED)
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.close()
+        print(f"Session closed after {turns} utterances")
 
 
 @app.get("/")
@@ -496,12 +1445,106 @@ def index():
     return FileResponse(BASE / "index.html")
 
 
+@app.post("/jobs")
+async def create_job(payload: Dict[str, Any] = Body(...)):
+    """
+    Start an offline synthesis job. Body: `{"items": [{"text": ..., "voice": ..., "cfg": ..., "steps": ..., "seed": ...}],
+    "format": "wav" | "flac"}`; `"texts": [...]` is a shorthand for items with only a text. Top-level `voice`, `cfg`,
+    `steps` and `seed` are defaults for all items. Returns the job id; poll `/jobs/{id}` or stream `/jobs/{id}/results`.
+    """
+    manager: BatchJobManager = app.state.batch_jobs
+    defaults = parse_stream_params(payload)
+    entries = payload.get("items")
+    if entries is None:
+        entries = [{"text": text} for text in payload.get("texts") or []]
+    if not isinstance(entries, list):
+        raise HTTPException(status_code=400, detail="items must be a list")
+    requests = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {"text": entry}
+        text = str(entry.get("text") or "") if isinstance(entry, dict) else ""
+        if not text.strip():
+            raise HTTPException(status_code=400, detail=f"Item {index} has no text")
+        requests.append((text, parse_stream_params(entry, defaults)))
+    try:
+        job = manager.submit(requests, audio_format=str(payload.get("format") or "wav").lower())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    print(f"[jobs] {job.id} submitted with {len(requests)} items")
+    return job.describe()
+
+
+def _get_job(job_id: str):
+    job = app.state.batch_jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return _get_job(job_id).describe(with_items=True)
+
+
+@app.get("/jobs/{job_id}/results")
+def stream_job_results(job_id: str):
+    """Newline-delimited JSON, one line per item as it finishes (sent with chunked transfer), then the job stats."""
+    job = _get_job(job_id)
+    return StreamingResponse(app.state.batch_jobs.results(job), media_type="application/x-ndjson")
+
+
+@app.get("/jobs/{job_id}/items/{index}")
+def get_job_item(job_id: str, index: int):
+    job = _get_job(job_id)
+    if not 0 <= index < len(job.items) or job.items[index].path is None:
+        raise HTTPException(status_code=404, detail=f"Item {index} of job {job_id} has no audio")
+    return FileResponse(job.items[index].path, media_type=f"audio/{job.audio_format}")
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    _get_job(job_id)
+    return app.state.batch_jobs.cancel(job_id).describe()
+
+
+@app.get("/health")
+def health():
+    """Liveness: the server process is up (the model may still be warming up)."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before (or if warmup failed)."""
+    readiness = {"ready": app.state.ready, **app.state.readiness}
+    return JSONResponse(readiness, status_code=200 if app.state.ready else 503)
+
+
+@app.get("/metrics")
+def get_metrics():
+    metrics: TTSMetrics = app.state.metrics
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/config")
 def get_config():
     service: StreamingTTSService = app.state.tts_service
+    metrics: TTSMetrics = app.state.metrics
     voices = sorted(service.voice_presets.keys())
     return {
         "voices": voices,
         "default_voice": service.default_voice_key,
+        "voice_cache": {
+            "loaded": sorted(service._voice_cache),
+            "hits": int(metrics.voice_cache.value(result="hit")),
+            "misses": int(metrics.voice_cache.value(result="miss")),
+        },
+        "cache": service.result_cache.stats() if service.result_cache is not None else None,
+        "queue": app.state.request_queue.stats(),
+        "preemption": app.state.preemption,
+        "backpressure": service.backpressure_totals,
+        "coalescing": app.state.coalescing.describe(),
+        "workers": app.state.worker_pool.stats() if app.state.worker_pool is not None else None,
     }
 
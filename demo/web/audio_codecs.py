@@ -0,0 +1,362 @@
+import struct
+import time
+from math import gcd
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import av
+import numpy as np
+
+CODECS = ("pcm16", "mulaw", "opus")
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler for rational rate changes (e.g. 24 kHz -> 16 kHz or 8 kHz).
+
+    A Kaiser-windowed sinc low-pass is split into `up` phases of `taps_per_phase` taps; every output
+    sample is one dot product of a phase with the most recent input samples, computed for a whole chunk
+    at once. The last `taps_per_phase - 1` input samples and the output position are carried over, so
+    chunk boundaries are seamless and the result does not depend on how the input is chunked.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, taps_per_phase: int = 32, kaiser_beta: float = 8.0) -> None:
+        divisor = gcd(src_rate, dst_rate)
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.up = dst_rate // divisor
+        self.down = src_rate // divisor
+        self.taps = taps_per_phase
+        num_taps = self.up * taps_per_phase
+        # Cutoff at the lower Nyquist frequency, as a fraction of the upsampled rate.
+        cutoff = 0.5 / max(self.up, self.down)
+        t = np.arange(num_taps) - (num_taps - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(num_taps, kaiser_beta)
+        h *= self.up / h.sum()
+        # phases[p, k] = h[p + k * up], reversed along k to line up with a window of past samples.
+        self._phases = np.ascontiguousarray(h.reshape(taps_per_phase, self.up).T[:, ::-1], dtype=np.float32)
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._num_inputs = 0
+        self._num_outputs = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self.up == self.down:
+            return samples
+        if samples.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        buffer = np.concatenate([self._history, samples])
+        total_inputs = self._num_inputs + samples.size
+        # Outputs whose newest input sample has arrived.
+        end = (total_inputs * self.up - 1) // self.down + 1
+        positions = np.arange(self._num_outputs, end, dtype=np.int64) * self.down
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)[positions // self.up - self._num_inputs]
+        output = np.einsum("nk,nk->n", windows, self._phases[positions % self.up])
+        self._history = buffer[buffer.size - (self.taps - 1):]
+        self._num_inputs = total_inputs
+        self._num_outputs = end
+        return output
+
+
+def _window_max(values: np.ndarray, width: int) -> np.ndarray:
+    """`out[j] = values[j:j + width].max()` for every full window, by doubling spans (log2(width) passes)."""
+    result = values.copy()
+    span = 1
+    while span * 2 <= width:
+        np.maximum(result[:-span], result[span:], out=result[:-span])
+        span *= 2
+    count = values.size - width + 1
+    return np.maximum(result[:count], result[width - span:width - span + count])
+
+
+class LookaheadLimiter:
+    """
+    Streaming peak limiter that keeps the gain smooth across chunks.
+
+    Output is delayed by `lookahead` samples, so the gain can ramp down linearly over that span before
+    a sample above `ceiling` goes out; afterwards it recovers linearly (from 0 to 1 in `release_sec`).
+    The gain reduction is the largest one needed within the look-ahead, averaged over the preceding
+    look-ahead span, which turns every step into a ramp that completes at the peak. Delay line, ramp
+    history and gain carry over between chunks, so unlike per-chunk peak normalization the gain never
+    jumps at a chunk boundary. Chunks below the ceiling at unity gain are only delayed, which costs one
+    copy. A stream starts with `lookahead` samples of silence in the delay line, so a peak on its very
+    first sample is still ramped down to; `flush` returns the delayed samples at the end of a stream.
+    """
+
+    def __init__(self, sample_rate: int, ceiling: float = 1.0, lookahead_ms: float = 5.0, release_sec: float = 0.2) -> None:
+        self.ceiling = ceiling
+        self.lookahead = max(1, int(sample_rate * lookahead_ms / 1000))
+        self.release_step = 1.0 / max(1.0, release_sec * sample_rate)
+        self.gain = 1.0
+        self._delay = np.zeros(self.lookahead, dtype=np.float32)
+        # Look-ahead reductions of the last `lookahead` output samples, for the ramp average.
+        self._ahead = np.zeros(self.lookahead, dtype=np.float32)
+        # No output yet: `_ahead` is seeded from the first look-ahead window of the stream.
+        self._fresh = True
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Limit a float32 chunk. Returns a new array, `lookahead` samples behind the input."""
+        buffer = np.concatenate([self._delay, np.asarray(samples, dtype=np.float32).reshape(-1)])
+        count = buffer.size - self.lookahead
+        if count <= 0:
+            self._delay = buffer
+            return buffer[:0]
+        self._delay = buffer[count:].copy()
+        output = buffer[:count]
+        peak = max(float(buffer.max()), -float(buffer.min()))
+        fresh, self._fresh = self._fresh, False
+        if peak <= self.ceiling:
+            # Nothing to reduce for the new outputs; keep the history of earlier ones if the chunk was short.
+            keep = max(0, self.lookahead - count)
+            self._ahead[:keep] = self._ahead[self.lookahead - keep:]
+            self._ahead[keep:] = 0.0
+            if self.gain >= 1.0:
+                return output
+            target = np.ones(count, dtype=np.float32)
+        else:
+            reduction = np.abs(buffer)
+            np.maximum(reduction, self.ceiling, out=reduction)
+            np.divide(self.ceiling, reduction, out=reduction)
+            np.subtract(1.0, reduction, out=reduction)
+            windows = _window_max(reduction, self.lookahead + 1)
+            if fresh:
+                self._ahead[:] = windows[0]
+            ahead = np.concatenate([self._ahead, windows])
+            self._ahead = ahead[ahead.size - self.lookahead:].copy()
+            sums = np.concatenate([[0.0], np.cumsum(ahead, dtype=np.float64)])
+            window = self.lookahead + 1
+            target = (1.0 - (sums[window:] - sums[:-window]) / window).astype(np.float32)
+        # gain[j] = min(target[j], gain[j - 1] + release_step), starting from the previous chunk's gain.
+        rise = np.arange(1, count + 1, dtype=np.float32) * np.float32(self.release_step)
+        gain = np.minimum.accumulate(target - rise) + rise
+        np.minimum(gain, self.gain + rise, out=gain)
+        np.minimum(gain, 1.0, out=gain)
+        self.gain = float(gain[-1])
+        output *= gain
+        return output
+
+    def flush(self) -> np.ndarray:
+        """The samples still in the delay line; the limiter is then ready for a new stream."""
+        output = self.process(np.zeros(self.lookahead, dtype=np.float32))
+        self._delay = np.zeros(self.lookahead, dtype=np.float32)
+        self._ahead[:] = 0.0
+        self._fresh = True
+        self.gain = 1.0
+        return output
+
+
+class PCM16Buffer:
+    """
+    Float32 to int16 conversion into reusable buffers, without per-chunk temporaries. The returned
+    array is only valid until the next `convert`.
+    """
+
+    def __init__(self) -> None:
+        self._scratch = np.zeros(0, dtype=np.float32)
+        self._pcm = np.zeros(0, dtype=np.int16)
+        # Views for the last chunk size: chunks of a stream mostly have the same size.
+        self._views = (self._scratch, self._pcm)
+
+    def convert(self, samples: np.ndarray) -> np.ndarray:
+        count = samples.size
+        if count != self._views[1].size:
+            if count > self._pcm.size:
+                self._scratch = np.empty(count, dtype=np.float32)
+                self._pcm = np.empty(count, dtype=np.int16)
+            self._views = (self._scratch[:count], self._pcm[:count])
+        scratch, pcm = self._views
+        np.multiply(samples.reshape(-1), 32767.0, out=scratch)
+        scratch.clip(-32767.0, 32767.0, out=scratch)
+        np.rint(scratch, out=scratch)
+        np.copyto(pcm, scratch, casting="unsafe")
+        return pcm
+
+
+def _mulaw_table() -> np.ndarray:
+    # G.711 mu-law (the CCITT reference coder on 14-bit input) for every 16-bit sample value,
+    # indexed by the sample reinterpreted as uint16.
+    pcm = np.arange(-32768, 32768, dtype=np.int32)
+    negative = pcm < 0
+    # One's complement for negative samples, as in the reference coder: -1 encodes like 0.
+    magnitude = np.minimum(np.where(negative, ~pcm, pcm) >> 2, 8159) + 0x21
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    encoded = np.where(segment >= 8, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    encoded ^= np.where(negative, 0x7F, 0xFF)
+    table = np.empty(65536, dtype=np.uint8)
+    table[np.arange(-32768, 32768, dtype=np.int32).astype(np.int16).view(np.uint16)] = encoded
+    return table
+
+
+_MULAW_TABLE: Optional[np.ndarray] = None
+
+
+def float_to_pcm16(samples: np.ndarray) -> np.ndarray:
+    return np.rint(np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+class AudioEncoder:
+    """
+    Per-connection encoder from float32 chunks at `source_rate` to the negotiated wire format.
+
+    Encoders are stateful (resampler history, Opus frames) and must see the chunks of one stream in
+    order. `offload` tells the server whether `encode` is worth running in a thread pool. Bytes and
+    encoder CPU time are counted per stream (`stats`). `encode` may return a memoryview of a buffer the
+    encoder reuses, so send it before encoding the next chunk.
+    """
+
+    codec = "pcm16"
+    offload = False
+
+    def __init__(self, source_rate: int, sample_rate: int) -> None:
+        self.source_rate = source_rate
+        self.sample_rate = sample_rate
+        self.resampler = Resampler(source_rate, sample_rate) if sample_rate != source_rate else None
+        self.offload = self.resampler is not None
+        self._pcm = PCM16Buffer()
+        self.input_samples = 0
+        self.bytes_out = 0
+        self.cpu_sec = 0.0
+
+    def _encode(self, samples: np.ndarray) -> Union[bytes, memoryview]:
+        return memoryview(self._pcm.convert(samples).view(np.uint8))
+
+    def _flush(self) -> bytes:
+        return b""
+
+    def encode(self, chunk: np.ndarray) -> Union[bytes, memoryview]:
+        start = time.thread_time()
+        self.input_samples += chunk.size
+        samples = self.resampler.process(chunk) if self.resampler is not None else chunk
+        payload = self._encode(samples)
+        self.cpu_sec += time.thread_time() - start
+        self.bytes_out += len(payload)
+        return payload
+
+    def flush(self) -> bytes:
+        """Bytes still held by the encoder at the end of the stream (only Opus buffers partial frames)."""
+        payload = self._flush()
+        self.bytes_out += len(payload)
+        return payload
+
+    def describe(self) -> Dict[str, Any]:
+        return {"codec": self.codec, "sample_rate": self.sample_rate, "channels": 1}
+
+    def stats(self) -> Dict[str, Any]:
+        audio_sec = self.input_samples / self.source_rate
+        return {
+            "codec": self.codec,
+            "sample_rate": self.sample_rate,
+            "bytes": self.bytes_out,
+            "kbps": round(self.bytes_out * 8 / audio_sec / 1000, 2) if audio_sec else 0.0,
+            "encode_cpu_ms": round(self.cpu_sec * 1000, 2),
+            "encode_cpu_ms_per_audio_sec": round(self.cpu_sec * 1000 / audio_sec, 3) if audio_sec else 0.0,
+        }
+
+
+class MulawEncoder(AudioEncoder):
+    """G.711 mu-law, one byte per sample, for telephony (8 kHz)."""
+
+    codec = "mulaw"
+
+    def __init__(self, source_rate: int, sample_rate: int = 8000) -> None:
+        super().__init__(source_rate, sample_rate)
+        global _MULAW_TABLE
+        if _MULAW_TABLE is None:
+            _MULAW_TABLE = _mulaw_table()
+        self._encoded = np.zeros(0, dtype=np.uint8)
+
+    def _encode(self, samples: np.ndarray) -> Union[bytes, memoryview]:
+        pcm = self._pcm.convert(samples)
+        if pcm.size > self._encoded.size:
+            self._encoded = np.empty(pcm.size, dtype=np.uint8)
+        encoded = self._encoded[:pcm.size]
+        np.take(_MULAW_TABLE, pcm.view(np.uint16), out=encoded)
+        return memoryview(encoded)
+
+
+class OpusEncoder(AudioEncoder):
+    """
+    Opus (libopus through PyAV) in 20 ms frames.
+
+    Each websocket message holds the packets completed by one chunk, each prefixed with its length as a
+    big-endian uint16, so clients can feed them to a decoder one by one (e.g. WebCodecs `AudioDecoder`).
+    """
+
+    codec = "opus"
+    frame_ms = 20
+
+    def __init__(self, source_rate: int, sample_rate: int = 24000, bitrate: int = 32000) -> None:
+        if sample_rate not in OPUS_SAMPLE_RATES:
+            raise ValueError(f"Opus supports sample rates {OPUS_SAMPLE_RATES}, got {sample_rate}")
+        super().__init__(source_rate, sample_rate)
+        self.bitrate = bitrate
+        self._context = av.CodecContext.create("libopus", "w")
+        self._context.sample_rate = sample_rate
+        self._context.layout = "mono"
+        self._context.format = "s16"
+        self._context.bit_rate = bitrate
+        self._context.options = {"application": "voip", "frame_duration": str(self.frame_ms)}
+        self._context.open()
+        self.frame_samples = sample_rate * self.frame_ms // 1000
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._pts = 0
+        self.offload = True
+
+    def _packets(self, frames: List[np.ndarray], final: bool = False) -> bytes:
+        out = bytearray()
+        for samples in frames:
+            frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="mono")
+            frame.sample_rate = self.sample_rate
+            frame.pts = self._pts
+            self._pts += samples.size
+            for packet in self._context.encode(frame):
+                out += struct.pack(">H", packet.size) + bytes(packet)
+        if final:
+            for packet in self._context.encode(None):
+                out += struct.pack(">H", packet.size) + bytes(packet)
+        return bytes(out)
+
+    def _encode(self, samples: np.ndarray) -> bytes:
+        pcm = np.concatenate([self._pending, float_to_pcm16(samples)])
+        num_frames = pcm.size // self.frame_samples
+        frames = [pcm[i * self.frame_samples:(i + 1) * self.frame_samples] for i in range(num_frames)]
+        self._pending = pcm[num_frames * self.frame_samples:]
+        return self._packets(frames)
+
+    def _flush(self) -> bytes:
+        frames = []
+        if self._pending.size:
+            # Pad the last partial frame with silence.
+            frames.append(np.concatenate([self._pending, np.zeros(self.frame_samples - self._pending.size, dtype=np.int16)]))
+            self._pending = np.zeros(0, dtype=np.int16)
+        return self._packets(frames, final=True)
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "bitrate": self.bitrate, "frame_ms": self.frame_ms, "framing": "u16be-length-prefixed"}
+
+
+def negotiate_encoder(params: Mapping[str, Any], source_rate: int) -> AudioEncoder:
+    """
+    Build the encoder requested by the `codec`, `sample_rate` and `bitrate` parameters of a connection.
+    Defaults: PCM16 at `source_rate`, mu-law at 8 kHz, Opus at 24 kHz / 32 kbps. Raises `ValueError`.
+    """
+    codec = (params.get("codec") or "pcm16").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+    rate = params.get("sample_rate")
+    try:
+        sample_rate = int(rate) if rate else None
+    except ValueError:
+        raise ValueError(f"Invalid sample_rate {rate!r}") from None
+    if sample_rate is not None and not 8000 <= sample_rate <= source_rate:
+        raise ValueError(f"sample_rate must be between 8000 and {source_rate}, got {sample_rate}")
+    if codec == "mulaw":
+        return MulawEncoder(source_rate, sample_rate or 8000)
+    if codec == "opus":
+        bitrate = params.get("bitrate")
+        try:
+            bitrate = int(bitrate) if bitrate else 32000
+        except ValueError:
+            raise ValueError(f"Invalid bitrate {bitrate!r}") from None
+        return OpusEncoder(source_rate, sample_rate or 24000, bitrate=min(max(bitrate, 6000), 128000))
+    return AudioEncoder(source_rate, sample_rate or source_rate)
@@ -0,0 +1,76 @@
+"""
+Submit an offline synthesis job to the demo server and report its aggregate throughput, standard library only.
+
+Sentences of `--txt_path` are repeated until there are `--num_items` texts (1,000 by default); results are
+read from the chunked NDJSON stream of `/jobs/{id}/results` as items finish.
+
+    python demo/web/batch_job_client.py --txt_path demo/text_examples/1p_vibevoice.txt --num_items 1000 --format flac
+"""
+import argparse
+import itertools
+import json
+import re
+import time
+import urllib.request
+from typing import List
+
+
+def load_sentences(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        text = " ".join(f.read().split())
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 4]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a batch synthesis job and report throughput")
+    parser.add_argument("--server", type=str, default="http://localhost:3000")
+    parser.add_argument("--txt_path", type=str, required=True, help="Text whose sentences become the job items")
+    parser.add_argument("--num_items", type=int, default=1000)
+    parser.add_argument("--voice", type=str, default=None)
+    parser.add_argument("--format", type=str, default="wav", choices=["wav", "flac"])
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sentences = load_sentences(args.txt_path)
+    if not sentences:
+        raise SystemExit(f"No sentences found in {args.txt_path}")
+    texts = list(itertools.islice(itertools.cycle(sentences), args.num_items))
+    payload = {"texts": texts, "format": args.format}
+    if args.voice:
+        payload["voice"] = args.voice
+    if args.seed is not None:
+        payload["seed"] = args.seed
+
+    request = urllib.request.Request(
+        f"{args.server}/jobs", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"},
+    )
+    submitted = time.monotonic()
+    with urllib.request.urlopen(request) as response:
+        job = json.load(response)
+    print(f"Job {job['job_id']}: {job['items']} items")
+
+    finished = failed = 0
+    with urllib.request.urlopen(f"{args.server}/jobs/{job['job_id']}/results") as response:
+        for line in response:
+            result = json.loads(line)
+            if "job" in result:
+                job = result["job"]
+                break
+            finished += 1
+            failed += result["status"] != "done"
+            if finished % 50 == 0 or finished == len(texts):
+                elapsed = time.monotonic() - submitted
+                print(f"  {finished}/{len(texts)} items after {elapsed:.0f}s ({failed} failed)")
+
+    print(
+        f"Job {job['job_id']} {job['status']}: {job['done']} done, {job['failed']} failed, "
+        f"{job['audio_sec']:.1f}s audio in {job['wall_sec']:.1f}s"
+    )
+    print(f"Throughput: {job['items_per_min']:.1f} items/min, {job['audio_sec_per_sec']:.2f}x real time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from transformers.utils import logging
+
+from vibevoice.processor.vibevoice_tokenizer_processor import VibeVoiceTokenizerProcessor
+
+from .request_queue import QueueFullError, RequestQueue
+
+logger = logging.get_logger(__name__)
+
+AUDIO_FORMATS = ("wav", "flac")
+
+# open_stream(text, log_callback, stop_event, **params) -> async iterator of float32 chunks.
+OpenStream = Callable[..., AsyncIterator[np.ndarray]]
+# make_preemption() -> a fresh `GenerationPreemption`, passed to open_stream as `preemption`.
+MakePreemption = Callable[[], Any]
+
+
+class JobItem:
+    __slots__ = ("index", "text", "params", "status", "path", "audio_sec", "elapsed_sec", "suspensions", "error")
+
+    def __init__(self, index: int, text: str, params: Dict[str, Any]) -> None:
+        self.index = index
+        self.text = text
+        self.params = params
+        self.status = "pending"
+        self.path: Optional[Path] = None
+        self.audio_sec = 0.0
+        self.elapsed_sec = 0.0
+        self.suspensions = 0
+        self.error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "status": self.status,
+            "voice": self.params.get("voice_key"),
+            "audio_sec": round(self.audio_sec, 3),
+            "elapsed_sec": round(self.elapsed_sec, 3),
+            "suspensions": self.suspensions,
+            "error": self.error,
+        }
+
+
+class BatchJob:
+    def __init__(self, job_id: str, items: List[JobItem], audio_format: str, output_dir: Path) -> None:
+        self.id = job_id
+        self.items = items
+        self.audio_format = audio_format
+        self.output_dir = output_dir
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Set by `cancel`. Each running item gets its own stop event: a stream sets the one it was given when
+        # it ends, so a shared one would read as cancelled for every later item.
+        self.stop_event = threading.Event()
+        self.item_stops: Dict[int, threading.Event] = {}
+        # Indices in completion order, for streaming results; `changed` wakes result streams.
+        self.finished_order: List[int] = []
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Progress and aggregate throughput: audio seconds produced per wall-clock second of the job.
+        `items_per_min` counts done items only, over a wall clock that includes the time spent on failed ones.
+        """
+        counts = {status: 0 for status in ("pending", "running", "done", "failed", "cancelled")}
+        for item in self.items:
+            counts[item.status] += 1
+        audio_sec = sum(item.audio_sec for item in self.items)
+        wall_sec = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at is not None else 0.0
+        return {
+            "items": len(self.items),
+            **counts,
+            "audio_sec": round(audio_sec, 2),
+            "wall_sec": round(wall_sec, 2),
+            "items_per_min": round(counts["done"] * 60.0 / wall_sec, 2) if wall_sec else 0.0,
+            "audio_sec_per_sec": round(audio_sec / wall_sec, 3) if wall_sec else 0.0,
+        }
+
+    def describe(self, with_items: bool = False) -> Dict[str, Any]:
+        info = {"job_id": self.id, "status": self.status, "format": self.audio_format, **self.stats()}
+        if with_items:
+            info["results"] = [item.summary() for item in self.items]
+        return info
+
+
+class BatchJobManager:
+    """
+    Offline synthesis jobs: many texts submitted at once, synthesized in the background, written to disk.
+
+    Items of a job are run in an order that groups compatible requests (same voice, cfg and steps), so
+    consecutive generations reuse the cached voice prompt and share sampling options. `generate` serves one
+    utterance per pass, so a job runs up to `concurrency` items at a time, each through the shared
+    `RequestQueue` under the job's own client id: interactive clients keep their round-robin turns and
+    at most `concurrency` items of a job wait in the queue. Items run in the queue's batch priority class:
+    with `make_preemption`, a running item is suspended between text windows while interactive requests
+    wait, and resumes afterwards. Finished items are written with `VibeVoiceTokenizerProcessor.save_audio`
+    as WAV or FLAC.
+    """
+
+    def __init__(
+        self,
+        open_stream: OpenStream,
+        request_queue: RequestQueue,
+        output_dir: str,
+        sample_rate: int,
+        concurrency: int = 1,
+        max_items: int = 10000,
+        max_jobs: int = 100,
+        make_preemption: Optional[MakePreemption] = None,
+    ) -> None:
+        self.open_stream = open_stream
+        self.request_queue = request_queue
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.concurrency = max(1, concurrency)
+        self.max_items = max_items
+        self.max_jobs = max_jobs
+        self.make_preemption = make_preemption
+        self.audio_processor = VibeVoiceTokenizerProcessor(sampling_rate=sample_rate, normalize_audio=False)
+        self.jobs: Dict[str, BatchJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any]]], audio_format: str = "wav") -> BatchJob:
+        """Start a job over `(text, stream params)` pairs. Raises `ValueError` for invalid jobs."""
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown format {audio_format!r}, expected one of {', '.join(AUDIO_FORMATS)}")
+        if not requests:
+            raise ValueError("A job needs at least one text")
+        if len(requests) > self.max_items:
+            raise ValueError(f"A job holds at most {self.max_items} texts, got {len(requests)}")
+        if sum(not job.done for job in self.jobs.values()) >= self.max_jobs:
+            raise ValueError(f"Too many unfinished jobs ({self.max_jobs}); wait for some to finish")
+        self._forget_finished()
+        job_id = uuid.uuid4().hex[:12]
+        items = [JobItem(index, text, params) for index, (text, params) in enumerate(requests)]
+        job = BatchJob(job_id, items, audio_format, self.output_dir / job_id)
+        job.output_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs[job_id] = job
+        self._tasks[job_id] = asyncio.create_task(self._run(job))
+        return job
+
+    def cancel(self, job_id: str) -> Optional[BatchJob]:
+        job = self.jobs.get(job_id)
+        if job is not None and not job.done:
+            job.stop_event.set()
+            for stop in job.item_stops.values():
+                stop.set()
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        return job
+
+    def _forget_finished(self) -> None:
+        # Keep the records of the most recent finished jobs only; their files stay on disk.
+        finished = sorted((job for job in self.jobs.values() if job.done), key=lambda job: job.created_at)
+        for job in finished[: max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job.id]
+
+    async def _run(self, job: BatchJob) -> None:
+        job.status = "running"
+        job.started_at = time.monotonic()
+
+        def group_key(item: JobItem) -> Tuple[str, str, str]:
+            params = item.params
+            return (str(params.get("voice_key")), str(params.get("cfg_scale")), str(params.get("inference_steps")))
+
+        order = iter(sorted(job.items, key=group_key))
+
+        async def run_items() -> None:
+            for item in order:
+                await self._run_item(job, item)
+
+        try:
+            await asyncio.gather(*(run_items() for _ in range(min(self.concurrency, len(job.items)))))
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            for item in job.items:
+                if item.status in ("pending", "running"):
+                    item.status = "cancelled"
+        finally:
+            job.finished_at = time.monotonic()
+            job.changed.set()
+            self._tasks.pop(job.id, None)
+            stats = job.stats()
+            logger.info(
+                f"Job {job.id} {job.status}: {stats['done']}/{stats['items']} items done, {stats['failed']} failed, "
+                f"{stats['audio_sec']:.1f}s audio in {stats['wall_sec']:.1f}s "
+                f"({stats['audio_sec_per_sec']:.2f}x real time, {stats['items_per_min']:.1f} done items/min)"
+            )
+
+    async def _acquire(self, job: BatchJob, preemption: Any) -> None:
+        while True:
+            try:
+                await self.request_queue.acquire(f"job:{job.id}", check_rate=False, priority="batch", preemption=preemption)
+                return
+            except QueueFullError:
+                # Interactive traffic filled the queue: back off instead of failing the item.
+                await asyncio.sleep(1.0)
+
+    async def _run_item(self, job: BatchJob, item: JobItem) -> None:
+        preemption = self.make_preemption() if self.make_preemption is not None else None
+        await self._acquire(job, preemption)
+        item.status = "running"
+        start = time.monotonic()
+        completed = False
+        chunks: List[np.ndarray] = []
+        params = item.params if preemption is None else {**item.params, "preemption": preemption}
+        stop = job.item_stops[item.index] = threading.Event()
+        iterator = self.open_stream(item.text, lambda *args, **kwargs: None, stop, **params)
+        try:
+            async for chunk in iterator:
+                chunks.append(chunk)
+            completed = not job.stop_event.is_set()
+            if not completed:
+                # Stopped mid-item: the audio is truncated, so nothing is written.
+                item.status = "cancelled"
+            else:
+                if not chunks:
+                    raise RuntimeError("No audio was generated")
+                path = job.output_dir / f"{item.index:05d}.{job.audio_format}"
+                await asyncio.to_thread(self.audio_processor.save_audio, np.concatenate(chunks), output_path=str(path))
+                item.path = path
+                item.audio_sec = sum(chunk.size for chunk in chunks) / self.sample_rate
+                item.status = "done"
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            item.status = "failed"
+            item.error = f"{type(exc).__name__}: {exc}"
+            logger.warning(f"Job {job.id} item {item.index} failed: {item.error}")
+        finally:
+            await iterator.aclose()
+            job.item_stops.pop(item.index, None)
+            item.elapsed_sec = time.monotonic() - start
+            service_sec = item.elapsed_sec
+            if preemption is not None:
+                item.suspensions = preemption.suspensions
+                # Time spent parked is not service time.
+                service_sec -= preemption.suspended_sec
+            self.request_queue.release(service_sec if completed else None, preemption)
+        job.finished_order.append(item.index)
+        job.changed.set()
+
+    async def results(self, job: BatchJob) -> AsyncIterator[bytes]:
+        """NDJSON lines: one per item as it finishes (completion order), then a final line with the job stats."""
+        sent = 0
+        while True:
+            job.changed.clear()
+            while sent < len(job.finished_order):
+                item = job.items[job.finished_order[sent]]
+                sent += 1
+                line = {**item.summary(), "url": f"/jobs/{job.id}/items/{item.index}" if item.path else None}
+                yield (json.dumps(line) + "\n").encode()
+            if job.done:
+                break
+            await job.changed.wait()
+        yield (json.dumps({"job": job.describe()}) + "\n").encode()
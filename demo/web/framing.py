@@ -0,0 +1,344 @@
+import asyncio
+import contextlib
+import datetime
+import json
+import struct
+import time
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+
+from starlette.websockets import WebSocket
+
+FRAMING_VERSION = 1
+FRAME_AUDIO = 1
+FRAME_EVENTS = 2
+# version, frame type, stream id, sequence number, sample offset, timestamp (seconds since the connection opened).
+FRAME_HEADER = struct.Struct("<BBHIId")
+
+
+def get_timestamp():
+    timestamp = datetime.datetime.utcnow().replace(
+        tzinfo=datetime.timezone.utc
+    ).astimezone(
+        datetime.timezone(datetime.timedelta(hours=8))
+    ).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return timestamp
+
+
+class CoalescingPolicy:
+    """
+    When a `FrameWriter` sends the audio it holds.
+
+    The first chunk of a stream goes out at once. Later chunks are held until `target_ms` of audio or
+    `max_bytes` are pending, or until holding them longer could let the client run dry: audio is held
+    at most the client's buffer minus `safety_ms` and the round-trip time. The server estimates that
+    buffer as the audio sent minus the time since the stream's first frame (the client cannot have
+    played more), lowered to what the client reports in `{"type": "feedback", "buffered_ms": ...,
+    "rtt_ms": ...}` messages. `target_ms` 0 sends every chunk as its own frame.
+    """
+
+    MAX_TARGET_MS = 2000.0
+
+    def __init__(self, target_ms: float = 0.0, max_bytes: int = 64 * 1024, safety_ms: float = 100.0) -> None:
+        self.target_ms = max(0.0, min(float(target_ms), self.MAX_TARGET_MS))
+        self.max_bytes = max_bytes
+        self.safety_ms = safety_ms
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_ms > 0
+
+    def for_params(self, params: Mapping[str, Any]) -> "CoalescingPolicy":
+        """The policy for a connection, whose `coalesce_ms` query parameter overrides the target."""
+        try:
+            target_ms = float(params["coalesce_ms"])
+        except (KeyError, TypeError, ValueError):
+            return self
+        return CoalescingPolicy(target_ms, self.max_bytes, self.safety_ms)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"target_ms": self.target_ms, "max_bytes": self.max_bytes, "safety_ms": self.safety_ms}
+
+
+class FrameWriter:
+    """
+    Sends the audio and log events of one websocket connection.
+
+    Clients that connect with `framing=binary` get binary frames only. Every frame starts with a 20-byte
+    little-endian `FRAME_HEADER`:
+
+        version (u8), type (u8: 1 audio, 2 events), stream id (u16), sequence number (u32),
+        sample offset (u32), timestamp (f64)
+
+    The sequence number counts all frames of the connection, so a gap means lost frames. Stream ids
+    number the utterances of the connection from 1. The sample offset is the position of the frame's
+    first sample in its stream at the negotiated sample rate (for Opus, of the first sample fed to the
+    encoder for this frame), and for event frames the audio sent so far. The timestamp is in seconds
+    since the connection opened on the server clock: when the model produced the (first) chunk for
+    audio frames, and when the batch was sent for event frames. The payload is the encoded audio, or a
+    UTF-8 JSON array of `{"event", "data", "t"}` events (`t` on the same clock). Events are coalesced
+    and sent at most every `event_interval_sec` (while `start`ed, also between audio frames), unless a
+    flush is forced. The first batch holds a `framing` event with the header layout and the server
+    wall-clock time (`epoch`) at which the connection clock started.
+
+    Without `framing=binary`, audio goes out as bare binary messages and every event as its own JSON
+    text message, as before. In both cases consecutive chunks of a stream may be sent as one message,
+    as the `CoalescingPolicy` decides; `on_frame(chunks, audio_sec, hold_secs)` is called per audio
+    message sent.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        framed: bool,
+        event_interval_sec: float = 0.25,
+        coalescing: Optional[CoalescingPolicy] = None,
+        on_frame: Optional[Callable[[int, float, List[float]], None]] = None,
+    ) -> None:
+        self.ws = ws
+        self.framed = framed
+        self.event_interval_sec = event_interval_sec
+        self.coalescing = coalescing or CoalescingPolicy()
+        self.on_frame = on_frame
+        self.started = time.perf_counter()
+        self.stream_id = 0
+        self.sequence = 0
+        self.source_rate = 1
+        self.sample_rate = 1
+        self._source_offset = 0
+        self._events: "Queue[Dict[str, Any]]" = Queue()
+        self._last_events_sent = 0.0
+        # Held audio is written behind room for the header, so a frame is sent without another copy.
+        self._frame = bytearray(FRAME_HEADER.size + 8192)
+        self._held_bytes = 0
+        self._held_samples = 0
+        self._held_generated = 0.0
+        self._held_arrivals: List[float] = []
+        self._deadline: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._overdue: Optional["asyncio.Future[None]"] = None
+        self._client_buffer: Optional[tuple] = None
+        self._client_rtt_sec = 0.0
+        self._send_lock = asyncio.Lock()
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self._reset_stream_stats()
+        if framed:
+            self.log("framing", version=FRAMING_VERSION, header=FRAME_HEADER.format, epoch=time.time() - self.elapsed())
+
+    @classmethod
+    def for_connection(
+        cls,
+        ws: WebSocket,
+        coalescing: Optional[CoalescingPolicy] = None,
+        on_frame: Optional[Callable[[int, float, List[float]], None]] = None,
+    ) -> "FrameWriter":
+        return cls(
+            ws,
+            framed=(ws.query_params.get("framing") or "").lower() == "binary",
+            coalescing=(coalescing or CoalescingPolicy()).for_params(ws.query_params),
+            on_frame=on_frame,
+        )
+
+    def elapsed(self, at: Optional[float] = None) -> float:
+        return (time.perf_counter() if at is None else at) - self.started
+
+    def set_rates(self, source_rate: int, sample_rate: int) -> None:
+        """Rate of the samples passed to `send_audio` and the negotiated rate the offsets are counted in."""
+        self.source_rate = source_rate
+        self.sample_rate = sample_rate
+
+    def _reset_stream_stats(self) -> None:
+        self.frame_times: List[float] = []
+        self._chunks = 0
+        self._hold_total = 0.0
+        self._hold_max = 0.0
+
+    def begin_stream(self) -> int:
+        self.discard_audio()
+        self.stream_id = self.stream_id % 0xFFFF + 1
+        self._source_offset = 0
+        self._reset_stream_stats()
+        return self.stream_id
+
+    def stream_stats(self) -> Dict[str, Any]:
+        """Audio messages and chunks of the current stream, and how long chunks were held to coalesce them."""
+        return {
+            "audio_frames": len(self.frame_times),
+            "audio_chunks": self._chunks,
+            "mean_hold_ms": round(self._hold_total * 1000 / self._chunks, 2) if self._chunks else 0.0,
+            "max_hold_ms": round(self._hold_max * 1000, 2),
+        }
+
+    def feedback(self, buffered_ms: Any = None, rtt_ms: Any = None) -> None:
+        """Client report of the audio it has buffered and of its round-trip time, for the coalescing policy."""
+        with contextlib.suppress(TypeError, ValueError):
+            self._client_rtt_sec = max(0.0, float(rtt_ms) / 1000)
+        with contextlib.suppress(TypeError, ValueError):
+            self._client_buffer = (max(0.0, float(buffered_ms) / 1000), time.perf_counter())
+
+    def start(self) -> None:
+        """Flush coalesced events every `event_interval_sec` until `stop`, so they are not held back by slow chunks."""
+        if self.framed and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self, flush: bool = True) -> None:
+        """
+        Stop the periodic flush and send the events still queued (unless `flush` is False). Audio still
+        held is dropped: a stream that completed has sent it with `end_stream`.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        self.discard_audio()
+        if flush:
+            await self.flush_events(force=True)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.event_interval_sec)
+            await self.flush_events()
+
+    def log(self, event: str, **data: Any) -> None:
+        """Queue an event; safe to call from any thread."""
+        self._events.put({"event": event, "data": data, "t": round(self.elapsed(), 4)})
+
+    def _header(self, frame_type: int, timestamp: float, into: Optional[bytearray] = None) -> None:
+        # Samples out of the resampler so far: it emits output n once input n * source_rate / sample_rate arrived.
+        offset = -(-self._source_offset * self.sample_rate // self.source_rate)
+        FRAME_HEADER.pack_into(
+            self._frame if into is None else into, 0,
+            FRAMING_VERSION, frame_type, self.stream_id, self.sequence, offset & 0xFFFFFFFF, timestamp,
+        )
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+
+    def _hold_budget(self, now: float) -> float:
+        """Seconds the audio held now may wait before the client could run out of audio."""
+        if not self.frame_times:
+            return 0.0
+        ahead = self._source_offset / self.source_rate - (now - self.frame_times[0])
+        if self._client_buffer is not None:
+            buffered, reported_at = self._client_buffer
+            ahead = min(ahead, buffered - (now - reported_at))
+        return ahead - self.coalescing.safety_ms / 1000 - self._client_rtt_sec
+
+    async def send_audio(
+        self, payload: Union[bytes, memoryview], source_samples: int, generated_at: Optional[float] = None,
+    ) -> None:
+        """
+        Send (or hold, to coalesce) encoded audio for `source_samples` samples at the source rate, produced
+        at `generated_at` (`time.perf_counter`). The payload is copied, so the caller may reuse its buffer.
+        """
+        if not payload and not source_samples:
+            return
+        now = time.perf_counter()
+        async with self._send_lock:
+            if not self._held_bytes and not self._held_samples:
+                self._held_generated = now if generated_at is None else generated_at
+            end = FRAME_HEADER.size + self._held_bytes + len(payload)
+            if end > len(self._frame):
+                # A new buffer rather than a resize: a view of the old one may still be in use by the socket.
+                frame = bytearray(max(end, 2 * len(self._frame)))
+                frame[:end - len(payload)] = memoryview(self._frame)[:end - len(payload)]
+                self._frame = frame
+            self._frame[end - len(payload):end] = payload
+            self._held_bytes += len(payload)
+            self._held_samples += source_samples
+            if source_samples:
+                self._held_arrivals.append(now)
+            policy = self.coalescing
+            if self._deadline is None:
+                self._deadline = now + max(0.0, min(self._hold_budget(now), policy.target_ms / 1000))
+            if (
+                not policy.enabled
+                or not self.frame_times
+                or self._held_samples * 1000 >= policy.target_ms * self.source_rate
+                or self._held_bytes >= policy.max_bytes
+                or now >= self._deadline
+            ):
+                await self._send_held()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self._deadline - now, self._deadline_reached)
+
+    def _deadline_reached(self) -> None:
+        self._timer = None
+        self._overdue = asyncio.ensure_future(self._send_overdue())
+
+    async def _send_overdue(self) -> None:
+        async with self._send_lock:
+            held = self._held_bytes or self._held_samples
+            if held and self._deadline is not None and time.perf_counter() >= self._deadline:
+                # A failed send shows up on the stream's next send_audio.
+                with contextlib.suppress(Exception):
+                    await self._send_held()
+
+    async def end_stream(self) -> None:
+        """Send the audio still held for the current stream."""
+        async with self._send_lock:
+            if self._held_bytes or self._held_samples:
+                await self._send_held()
+
+    def discard_audio(self) -> None:
+        """Drop the audio held for the current stream (e.g. when it was cancelled)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._held_bytes = self._held_samples = 0
+        self._held_arrivals = []
+        self._deadline = None
+
+    async def _send_held(self) -> None:
+        # Called with the send lock held.
+        now = time.perf_counter()
+        size, samples, arrivals = self._held_bytes, self._held_samples, self._held_arrivals
+        self.discard_audio()
+        if size:
+            if self.framed:
+                self._header(FRAME_AUDIO, self.elapsed(self._held_generated))
+                await self.ws.send_bytes(memoryview(self._frame)[:FRAME_HEADER.size + size])
+            else:
+                await self.ws.send_bytes(memoryview(self._frame)[FRAME_HEADER.size:FRAME_HEADER.size + size])
+            self.frame_times.append(now)
+        self._source_offset += samples
+        holds = [now - arrival for arrival in arrivals]
+        self._chunks += len(holds)
+        self._hold_total += sum(holds)
+        self._hold_max = max([self._hold_max] + holds)
+        if size and self.on_frame is not None:
+            self.on_frame(len(holds), samples / self.source_rate, holds)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except Empty:
+                return events
+
+    async def flush_events(self, force: bool = False) -> None:
+        """Send queued events: all at once when framed (if the interval has passed or `force`), else one by one."""
+        if self._events.empty():
+            return
+        now = time.perf_counter()
+        if self.framed and not force and now - self._last_events_sent < self.event_interval_sec:
+            return
+        self._last_events_sent = now
+        async with self._send_lock:
+            events = self._drain()
+            try:
+                if self.framed:
+                    body = json.dumps(events, separators=(",", ":")).encode("utf-8")
+                    frame = bytearray(FRAME_HEADER.size + len(body))
+                    self._header(FRAME_EVENTS, self.elapsed(now), into=frame)
+                    frame[FRAME_HEADER.size:] = body
+                    await self.ws.send_bytes(frame)
+                else:
+                    for entry in events:
+                        message = {"type": "log", "event": entry["event"], "data": entry["data"], "timestamp": get_timestamp()}
+                        await self.ws.send_text(json.dumps(message))
+            except Exception:
+                pass
+
+    def discard_events(self) -> None:
+        self._drain()
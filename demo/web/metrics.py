@@ -0,0 +1,304 @@
+import bisect
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond per-token stages up to long queue waits.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+# Audio per websocket message: one 3200-sample chunk is 0.133 s at 24 kHz.
+FRAME_AUDIO_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.6, 0.8, 1.2, 2.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally per label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def drain(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        # The text format wants the `_total` sample name in the header too.
+        lines = [f"# HELP {self.name}_total {self.documentation}", f"# TYPE {self.name}_total counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. streams in progress). Gauges are not shipped between processes."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram as Prometheus expects it. `observe` is a bisect and two additions
+    under a lock, cheap enough to call per generated token.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count per bucket (last one is +Inf), sum].
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, count: int = 1, **labels: Any) -> None:
+        """Record `count` observations of `value` (e.g. one per token of an evenly timed batch)."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += count
+            entry[1] += value * count
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels: Any) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def drain(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, list]) -> None:
+        with self._lock:
+            for key, (counts, total) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                for index, count in enumerate(counts):
+                    entry[0][index] += count
+                entry[1] += total
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format (version 0.0.4).
+
+    No client library or push gateway is involved: metrics live in this process and are scraped from
+    `/metrics`. Worker processes keep their own registry and ship counter and histogram increments to
+    the server with `drain` / `merge`.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = (),
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def drain(self) -> Dict[str, Dict[LabelValues, Any]]:
+        """Counter and histogram increments since the last drain (picklable), resetting them here."""
+        drained = {}
+        for name, metric in self._metrics.items():
+            if isinstance(metric, (Counter, Histogram)):
+                values = metric.drain()
+                if values:
+                    drained[name] = values
+        return drained
+
+    def merge(self, drained: Dict[str, Dict[LabelValues, Any]]) -> None:
+        for name, values in drained.items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, (Counter, Histogram)):
+                metric.merge(values)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class TTSMetrics:
+    """The metrics of the streaming TTS server, created on one registry."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.queue_wait = r.histogram("tts_queue_wait_seconds", "Time a request waited for a model slot.")
+        self.voice_load = r.histogram("tts_voice_load_seconds", "Time to load a voice prompt that was not cached.")
+        self.voice_cache = r.counter("tts_voice_cache_lookups", "Voice prompt lookups by result (hit or miss).", ("result",))
+        self.voice_cache_hit_ratio = r.gauge("tts_voice_cache_hit_ratio", "Share of voice prompt lookups served from memory.")
+        self.first_chunk = r.histogram(
+            "tts_first_chunk_seconds", "Time from the start of a generation request to its first audio chunk.",
+        )
+        self.token_time = r.histogram(
+            "tts_token_stage_seconds",
+            "Per-token time of a generation stage (lm, tts_lm, diffusion, decode); host wall-clock.",
+            labelnames=("stage",),
+        )
+        self.rtf = r.histogram(
+            "tts_real_time_factor", "Generation time divided by audio duration of completed generations.", RTF_BUCKETS,
+        )
+        self.streams = r.counter("tts_streams", "Finished audio streams by outcome.", ("outcome",))
+        self.active_streams = r.gauge("tts_active_streams", "Audio streams currently being sent to clients.")
+        self.dropped_clients = r.counter(
+            "tts_dropped_clients", "Clients that disconnected before their audio was complete, by phase.", ("phase",),
+        )
+        self.warmup_first_chunk = r.histogram(
+            "tts_warmup_first_chunk_seconds",
+            "First-chunk latency of the first warmup generation of a model replica (cold) and of its final repeat (warm).",
+            labelnames=("run",),
+        )
+        self.ready = r.gauge("tts_ready", "1 once the model is loaded and warmed up, else 0.")
+        self.audio_frames = r.counter("tts_audio_frames", "Websocket messages carrying audio (one send each).")
+        self.audio_chunks = r.counter("tts_audio_chunks", "Generated audio chunks sent; coalescing puts several in one message.")
+        self.frame_audio = r.histogram(
+            "tts_audio_frame_seconds", "Audio duration per websocket audio message.", FRAME_AUDIO_BUCKETS,
+        )
+        self.coalesce_hold = r.histogram(
+            "tts_coalesce_hold_seconds", "Time a chunk was held back to share a message with later ones (added latency).",
+        )
+        self.preempted = r.histogram(
+            "tts_preempted_seconds", "Time a batch generation was suspended for interactive requests, per suspension.",
+        )
+
+    def observe_stage(self, stage: str, seconds: float, tokens: int = 1) -> None:
+        """`stage_callback` of `generate`: spreads the time of a stage evenly over the tokens it processed."""
+        if tokens > 0:
+            self.token_time.observe(seconds / tokens, count=tokens, stage=stage)
+
+    def observe_audio_frame(self, chunks: int, audio_sec: float, hold_secs: List[float]) -> None:
+        """`on_frame` of `FrameWriter`: one audio message with `chunks` chunks, each held for its `hold_secs`."""
+        self.audio_frames.inc()
+        self.audio_chunks.inc(chunks)
+        self.frame_audio.observe(audio_sec)
+        for hold in hold_secs:
+            self.coalesce_hold.observe(hold)
+
+    def record_warmup(self, results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            if result["run"] in ("cold", "warm") and result["first_chunk_sec"] is not None:
+                self.warmup_first_chunk.observe(result["first_chunk_sec"], run=result["run"])
+
+    def render(self) -> str:
+        hits, misses = self.voice_cache.value(result="hit"), self.voice_cache.value(result="miss")
+        if hits + misses:
+            self.voice_cache_hit_ratio.set(hits / (hits + misses))
+        return self.registry.render()
@@ -0,0 +1,109 @@
+"""
+Load test of the admission policy in front of the model, runnable with the standard library only.
+
+Requests arrive as a Poisson process from a pool of clients; each holds the model for a service time drawn
+around `--service_sec` and gives up (disconnects) if it waited longer than `--patience_sec`. Goodput is the
+rate of requests that started within `--slo_sec`. The `reject` policy reproduces the old behaviour of closing
+with "Service busy" whenever the model is in use; `queue` uses a plain bounded `RequestQueue` and `admit`
+additionally refuses requests whose estimated wait exceeds the SLO. Time is scaled down by
+`--time_scale` so a sweep finishes in seconds.
+
+    python demo/web/queue_load_test.py --rates 0.1,0.2,0.3,0.5 --max_depth 8
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from request_queue import QueueFullError, RateLimitedError, RequestQueue
+
+
+async def run_policy(args, policy: str, rate: float, seed: int) -> Dict[str, float]:
+    # Separate streams so every policy sees the same arrivals.
+    arrival_rng = random.Random(seed)
+    service_rng = random.Random(seed + 1)
+    scale = args.time_scale
+    queue = RequestQueue(
+        concurrency=args.concurrency,
+        max_depth=0 if policy == "reject" else args.max_depth,
+        rate_per_min=args.rate_per_min,
+        burst=args.burst,
+        max_wait_sec=args.slo_sec * scale if policy == "admit" else None,
+        initial_service_sec=args.service_sec * scale,
+    )
+    counts = {"arrived": 0, "served_in_slo": 0, "served_late": 0, "refused": 0, "abandoned": 0}
+    waits: List[float] = []
+
+    async def request(client_id: str) -> None:
+        counts["arrived"] += 1
+        enqueued = time.monotonic()
+        try:
+            await asyncio.wait_for(queue.acquire(client_id), timeout=args.patience_sec * scale)
+        except (QueueFullError, RateLimitedError):
+            counts["refused"] += 1
+            return
+        except asyncio.TimeoutError:
+            counts["abandoned"] += 1
+            return
+        wait = (time.monotonic() - enqueued) / scale
+        waits.append(wait)
+        start = time.monotonic()
+        try:
+            await asyncio.sleep(max(0.1, service_rng.gauss(args.service_sec, args.service_sec * 0.3)) * scale)
+        finally:
+            queue.release(time.monotonic() - start)
+        counts["served_in_slo" if wait <= args.slo_sec else "served_late"] += 1
+
+    tasks = []
+    elapsed = 0.0
+    while elapsed < args.duration_sec:
+        gap = arrival_rng.expovariate(rate)
+        elapsed += gap
+        await asyncio.sleep(gap * scale)
+        tasks.append(asyncio.create_task(request(f"client-{arrival_rng.randrange(args.num_clients)}")))
+    await asyncio.gather(*tasks)
+
+    waits.sort()
+    return {
+        **counts,
+        "goodput_per_min": counts["served_in_slo"] / args.duration_sec * 60,
+        "p50_wait_sec": waits[len(waits) // 2] if waits else float("nan"),
+        "p95_wait_sec": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else float("nan"),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated load test of the TTS request queue")
+    parser.add_argument("--rates", type=str, default="0.05,0.1,0.2,0.3,0.5", help="Arrival rates in requests/s (simulated time)")
+    parser.add_argument("--duration_sec", type=float, default=600.0, help="Simulated duration per rate")
+    parser.add_argument("--service_sec", type=float, default=4.0, help="Mean model time per request")
+    parser.add_argument("--slo_sec", type=float, default=10.0, help="Requests starting within this wait count as goodput")
+    parser.add_argument("--patience_sec", type=float, default=30.0, help="Clients disconnect after waiting this long")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--max_depth", type=int, default=8)
+    parser.add_argument("--rate_per_min", type=float, default=30.0)
+    parser.add_argument("--burst", type=float, default=10.0)
+    parser.add_argument("--num_clients", type=int, default=20)
+    parser.add_argument("--time_scale", type=float, default=0.01, help="Wall seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    header = f"{'policy':<8}{'rate/s':>8}{'arrived':>9}{'goodput/min':>13}{'late':>6}{'refused':>9}{'abandoned':>11}{'p50 wait':>10}{'p95 wait':>10}"
+    print(header)
+    print("=" * len(header))
+    for rate in rates:
+        for policy in ("reject", "queue", "admit"):
+            r = asyncio.run(run_policy(args, policy, rate, args.seed))
+            print(
+                f"{policy:<8}{rate:>8.2f}{r['arrived']:>9}{r['goodput_per_min']:>13.2f}{r['served_late']:>6}"
+                f"{r['refused']:>9}{r['abandoned']:>11}{r['p50_wait_sec']:>10.1f}{r['p95_wait_sec']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
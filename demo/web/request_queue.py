@@ -0,0 +1,359 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Priority classes, highest first. Waiting interactive requests are always admitted before batch work.
+PRIORITIES = ("interactive", "batch")
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds `max_depth` waiting requests."""
+
+
+class RateLimitedError(Exception):
+    """Raised when a client exceeds its request rate; `retry_after` is in seconds."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` tokens."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """Take one token. Returns 0.0 on success, otherwise the seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("client_id", "priority", "preemption", "resuming", "enqueued_at", "event", "granted")
+
+    def __init__(self, client_id: str, priority: str = "interactive", preemption: Any = None, resuming: bool = False) -> None:
+        self.client_id = client_id
+        self.priority = priority
+        self.preemption = preemption
+        # A suspended request waiting to get its slot back; nobody awaits `event`, `_dispatch` resumes it.
+        self.resuming = resuming
+        self.enqueued_at = time.monotonic()
+        self.event = asyncio.Event()
+        self.granted = False
+
+
+class RequestQueue:
+    """
+    Bounded, fair admission queue in front of the model.
+
+    At most `concurrency` requests run at a time and at most `max_depth` wait; with `max_wait_sec` set,
+    requests whose estimated wait exceeds it are refused up front instead of queueing only to time out. Waiting requests are
+    served round-robin across clients (FIFO within a client), so one client submitting many requests
+    cannot starve the others. Each client is additionally limited to `rate_per_min` admissions with a
+    `burst` allowance. The expected wait is estimated from an exponential moving average of observed
+    service times. `on_admit`, if given, is called with the seconds each admitted request waited.
+
+    Requests have a priority class (`PRIORITIES`): waiting interactive requests are admitted before any
+    batch work. Batch requests acquired with a `preemption` handle (a `GenerationPreemption`) can also be
+    suspended: while interactive requests wait and no slot is free, running batch requests are asked to
+    park at their next text-window boundary and hand over their slot. A suspended request waits ahead of
+    new batch work and resumes (without recomputation) once no interactive request is waiting.
+    `on_resume`, if given, is called with the seconds each suspended request was parked.
+
+    Usage:
+        async with queue.slot(client_id, on_update=send_position):
+            ...  # run the request
+    Cancelling the task while it waits (e.g. on client disconnect) removes it from the queue.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        max_depth: int = 16,
+        rate_per_min: Optional[float] = 30.0,
+        burst: float = 10.0,
+        max_wait_sec: Optional[float] = None,
+        initial_service_sec: float = 10.0,
+        on_admit: Optional[Callable[[float], None]] = None,
+        on_resume: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+        self.max_wait_sec = max_wait_sec
+        self.avg_service_sec = initial_service_sec
+        self.on_admit = on_admit
+        self.on_resume = on_resume
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.cancelled = 0
+        self.preempted = 0
+        self.resumed = 0
+        # Round-robin client queues per priority class.
+        self._classes: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {priority: OrderedDict() for priority in PRIORITIES}
+        self._waiting = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Preemption handles of running batch requests (-> client id), of those asked to suspend, and of suspended ones.
+        self._preemptible: Dict[Any, str] = {}
+        self._suspending: Dict[Any, None] = {}
+        self._suspended: Dict[Any, _Waiter] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _check_rate(self, client_id: str) -> None:
+        if not self.rate_per_min:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(self.rate_per_min / 60.0, self.burst)
+        retry_after = bucket.try_acquire()
+        if retry_after > 0:
+            self.rate_limited += 1
+            raise RateLimitedError(retry_after)
+        if len(self._buckets) > 4096:
+            # Drop buckets that have refilled completely; they carry no state.
+            now = time.monotonic()
+            for key in [k for k, b in self._buckets.items() if b.tokens + (now - b.updated) * b.rate >= b.burst]:
+                del self._buckets[key]
+
+    def _count(self, priority: str) -> int:
+        return sum(len(queue) for queue in self._classes[priority].values())
+
+    def position(self, waiter: _Waiter) -> int:
+        """Number of requests that will be admitted before `waiter`: higher classes first, round-robin within its own."""
+        clients = self._classes[waiter.priority]
+        queue = clients[waiter.client_id]
+        index = queue.index(waiter)
+        ahead = index
+        before = True
+        for client_id, other in clients.items():
+            if client_id == waiter.client_id:
+                before = False
+                continue
+            ahead += min(len(other), index + (1 if before else 0))
+        for priority in PRIORITIES[:PRIORITIES.index(waiter.priority)]:
+            ahead += self._count(priority)
+        return ahead
+
+    def estimate_wait(self, position: int) -> float:
+        return (position // self.concurrency + 1) * self.avg_service_sec
+
+    def _notify(self) -> None:
+        for clients in self._classes.values():
+            for queue in clients.values():
+                for waiter in queue:
+                    waiter.event.set()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        clients = self._classes[waiter.priority]
+        queue = clients.get(waiter.client_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._waiting -= 1
+        if not queue:
+            del clients[waiter.client_id]
+
+    def _dispatch(self) -> None:
+        while self.active < self.concurrency:
+            clients = next((clients for clients in self._classes.values() if clients), None)
+            if clients is None:
+                break
+            client_id, queue = next(iter(clients.items()))
+            waiter = queue.popleft()
+            self._waiting -= 1
+            del clients[client_id]
+            if queue:
+                # Rotate the client to the back so the next admission goes to someone else.
+                clients[client_id] = queue
+            waiter.granted = True
+            waiter.event.set()
+            self.active += 1
+            if waiter.preemption is not None:
+                self._preemptible[waiter.preemption] = client_id
+            if waiter.resuming:
+                del self._suspended[waiter.preemption]
+                self.resumed += 1
+                if self.on_resume is not None:
+                    self.on_resume(time.monotonic() - waiter.enqueued_at)
+                waiter.preemption.resume()
+        self._notify()
+        self._rebalance()
+
+    def _rebalance(self) -> None:
+        """Ask running batch requests to suspend while interactive requests wait; call off suspensions no longer needed."""
+        waiting = self._count("interactive")
+        while len(self._suspending) > waiting:
+            # Not parked yet: it keeps its slot. A late `_on_suspended` is ignored.
+            preemption = next(reversed(self._suspending))
+            del self._suspending[preemption]
+            preemption.resume()
+        if self._loop is None:
+            return
+        for preemption in reversed(list(self._preemptible)):
+            if len(self._suspending) >= waiting:
+                break
+            if preemption in self._suspending:
+                continue
+            # The most recently admitted first: it has the least state to park.
+            self._suspending[preemption] = None
+            preemption.request_suspend(lambda preemption=preemption: self._loop.call_soon_threadsafe(self._on_suspended, preemption))
+
+    def _on_suspended(self, preemption: Any) -> None:
+        # Runs on the event loop once a batch request has parked its state: its slot goes to the waiting requests.
+        if preemption not in self._suspending:
+            return
+        del self._suspending[preemption]
+        client_id = self._preemptible.pop(preemption)
+        waiter = _Waiter(client_id, "batch", preemption, resuming=True)
+        clients = self._classes["batch"]
+        # Suspended work resumes ahead of batch work that has not started yet.
+        clients.setdefault(client_id, deque()).appendleft(waiter)
+        clients.move_to_end(client_id, last=False)
+        self._waiting += 1
+        self._suspended[preemption] = waiter
+        self.preempted += 1
+        self.active -= 1
+        self._dispatch()
+
+    def _release(self, service_sec: Optional[float] = None) -> None:
+        self.active -= 1
+        if service_sec is not None:
+            self.avg_service_sec = 0.8 * self.avg_service_sec + 0.2 * service_sec
+        self._dispatch()
+
+    async def acquire(
+        self,
+        client_id: str,
+        on_update: Optional[Callable[[int, float], Awaitable[None]]] = None,
+        check_rate: bool = True,
+        priority: str = "interactive",
+        preemption: Any = None,
+    ) -> None:
+        """
+        Wait for a slot. Raises `RateLimitedError` or `QueueFullError` instead of waiting when refused.
+        `check_rate=False` skips the per-client rate limit (for server-side work such as batch jobs).
+        `priority` is one of `PRIORITIES`; batch requests given a `preemption` handle may be suspended
+        while they run and must pass the same handle to `release`.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {', '.join(PRIORITIES)}")
+        if preemption is not None and priority == "interactive":
+            raise ValueError("Only batch requests can be preempted")
+        self._loop = asyncio.get_running_loop()
+        if check_rate:
+            self._check_rate(client_id)
+        if self.active < self.concurrency and not self._waiting:
+            self.active += 1
+            self.admitted += 1
+            if preemption is not None:
+                self._preemptible[preemption] = client_id
+            if self.on_admit is not None:
+                self.on_admit(0.0)
+            return
+        if self._waiting >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"Request queue is full ({self.max_depth} waiting)")
+
+        waiter = _Waiter(client_id, priority, preemption)
+        self._classes[priority].setdefault(client_id, deque()).append(waiter)
+        self._waiting += 1
+        if self.max_wait_sec is not None:
+            estimated_wait = self.estimate_wait(self.position(waiter))
+            if estimated_wait > self.max_wait_sec:
+                self._remove(waiter)
+                self.rejected += 1
+                raise QueueFullError(f"Estimated wait {estimated_wait:.1f}s exceeds {self.max_wait_sec:.1f}s")
+        self._rebalance()
+        try:
+            last_position = None
+            while not waiter.granted:
+                waiter.event.clear()
+                position = self.position(waiter)
+                if on_update is not None and position != last_position:
+                    last_position = position
+                    await on_update(position, self.estimate_wait(position))
+                if not waiter.granted:
+                    await waiter.event.wait()
+        except BaseException:
+            if waiter.granted:
+                # Admitted right as we were cancelled: hand the slot on.
+                self.release(preemption=preemption)
+            else:
+                self._remove(waiter)
+                self._notify()
+                self._rebalance()
+                self.cancelled += 1
+            raise
+        self.admitted += 1
+        if self.on_admit is not None:
+            self.on_admit(time.monotonic() - waiter.enqueued_at)
+
+    def release(self, service_sec: Optional[float] = None, preemption: Any = None) -> None:
+        if preemption is not None:
+            self._preemptible.pop(preemption, None)
+            self._suspending.pop(preemption, None)
+            waiter = self._suspended.pop(preemption, None)
+            if waiter is not None:
+                # Stopped while suspended: it holds no slot, only its place in the queue.
+                self._remove(waiter)
+                self._notify()
+                return
+        self._release(service_sec)
+
+    def slot(self, client_id: str, on_update: Optional[Callable[[int, float], Awaitable[None]]] = None) -> "_Slot":
+        return _Slot(self, client_id, on_update)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "waiting": self._waiting,
+            "concurrency": self.concurrency,
+            "max_depth": self.max_depth,
+            "max_wait_sec": self.max_wait_sec,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "cancelled": self.cancelled,
+            "waiting_by_priority": {priority: self._count(priority) for priority in PRIORITIES},
+            "preempted": self.preempted,
+            "resumed": self.resumed,
+            "suspended": len(self._suspended),
+            "avg_service_sec": self.avg_service_sec,
+        }
+
+
+class _Slot:
+    def __init__(self, queue: RequestQueue, client_id: str, on_update) -> None:
+        self.queue = queue
+        self.client_id = client_id
+        self.on_update = on_update
+        self.start = 0.0
+
+    async def __aenter__(self) -> "_Slot":
+        await self.queue.acquire(self.client_id, self.on_update)
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # Only completed requests feed the service-time estimate.
+        self.queue.release(time.monotonic() - self.start if exc_type is None else None)
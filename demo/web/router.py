@@ -0,0 +1,372 @@
+"""
+Voice-affinity router in front of several instances of the websocket demo server.
+
+Every instance keeps the voice prompts it has served in memory, so sending all requests for a voice to
+the same instance keeps its voice cache warm. Voices are placed on a consistent-hash ring of the ready
+instances; a request goes to the first of the voice's `replicas` preferred instances that is not
+saturated (`spill_depth` requests already waiting beyond its model slots), otherwise to the least-loaded
+ready instance. Adding or losing an instance only moves the voices next to it on the ring.
+
+Instances are polled on `/ready` and `/config` (queue and voice cache stats). Websocket endpoints are
+relayed message by message with the client address in `X-Forwarded-For`, which uvicorn on the instance
+uses as the client address for rate limiting when the router runs on a trusted host (127.0.0.1 by
+default, see uvicorn's `--forwarded-allow-ips`). `GET /router` reports routing decisions and the voice
+cache hit ratio of all instances.
+
+    python demo/vibevoice_realtime_demo.py --port 3001 &
+    python demo/vibevoice_realtime_demo.py --port 3002 &
+    python demo/web/router.py --backends http://localhost:3001,http://localhost:3002 --port 3000
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import JSONResponse, Response
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+
+# Close codes a server may send; others (e.g. 1006, abnormal closure) are reported to clients as 1011.
+_SENDABLE_CLOSE_CODES = set(range(1000, 1004)) | set(range(1007, 1015)) | set(range(3000, 5000))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def _get_json(url: str, timeout: float) -> Tuple[int, Any]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as exc:
+        try:
+            return exc.code, json.load(exc)
+        except ValueError:
+            return exc.code, None
+
+
+class Backend:
+    """One server instance: its health as last polled and the streams the router has open to it."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.ws_url = "ws" + self.url[len("http"):] if self.url.startswith("http") else self.url
+        self.healthy = False
+        self.ready = False
+        self.last_error: Optional[str] = None
+        self.last_check = 0.0
+        self.queue: Dict[str, Any] = {}
+        self.voice_cache: Dict[str, Any] = {}
+        self.in_flight = 0
+        self.routed = 0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.ready
+
+    @property
+    def busy(self) -> int:
+        # The queue stats lag by one poll; the router's own count does not see other clients (e.g. jobs).
+        return max(self.in_flight, int(self.queue.get("active", 0)) + int(self.queue.get("waiting", 0)))
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(self.queue.get("concurrency", 1)))
+
+    @property
+    def load(self) -> float:
+        return self.busy / self.concurrency
+
+    def saturated(self, spill_depth: int) -> bool:
+        return self.busy >= self.concurrency + spill_depth
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "routed": self.routed,
+            "load": round(self.load, 2),
+            "queue": self.queue,
+            "voice_cache": self.voice_cache,
+            "last_error": self.last_error,
+        }
+
+
+class VoiceRouter:
+    """
+    Consistent hashing of voices over instances, with spill-over to the least-loaded instance.
+
+    Each instance owns `virtual_nodes` points on the ring so voices spread evenly; the preferred
+    instances of a voice are the first `replicas` distinct ready instances clockwise from its hash.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        replicas: int = 2,
+        spill_depth: int = 1,
+        virtual_nodes: int = 64,
+        check_interval_sec: float = 2.0,
+        check_timeout_sec: float = 2.0,
+    ) -> None:
+        if not urls:
+            raise ValueError("The router needs at least one backend")
+        self.backends = [Backend(url) for url in urls]
+        self.replicas = max(1, replicas)
+        self.spill_depth = max(0, spill_depth)
+        self.check_interval_sec = check_interval_sec
+        self.check_timeout_sec = check_timeout_sec
+        ring = sorted((_hash(f"{backend.url}#{i}"), index) for index, backend in enumerate(self.backends) for i in range(virtual_nodes))
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_backends = [self.backends[index] for _, index in ring]
+        self.decisions = {"affinity": 0, "spill": 0, "unavailable": 0}
+
+    def preferred(self, voice: str) -> List[Backend]:
+        preferred: List[Backend] = []
+        start = bisect.bisect(self._ring_hashes, _hash(voice))
+        for offset in range(len(self._ring_backends)):
+            backend = self._ring_backends[(start + offset) % len(self._ring_backends)]
+            if backend.available and backend not in preferred:
+                preferred.append(backend)
+                if len(preferred) == self.replicas:
+                    break
+        return preferred
+
+    def choose(self, voice: str, exclude: Tuple[Backend, ...] = ()) -> Tuple[Optional[Backend], str]:
+        """The instance for a request with `voice` and why it was picked ("affinity", "spill" or "unavailable")."""
+        for backend in self.preferred(voice):
+            if backend not in exclude and not backend.saturated(self.spill_depth):
+                return backend, "affinity"
+        candidates = [backend for backend in self.backends if backend.available and backend not in exclude]
+        if not candidates:
+            return None, "unavailable"
+        return min(candidates, key=lambda backend: (backend.load, backend.in_flight)), "spill"
+
+    async def check(self, backend: Backend) -> None:
+        try:
+            ready_status, _ = await asyncio.to_thread(_get_json, f"{backend.url}/ready", self.check_timeout_sec)
+            config_status, config = await asyncio.to_thread(_get_json, f"{backend.url}/config", self.check_timeout_sec)
+        except (OSError, ValueError) as exc:
+            if backend.healthy:
+                print(f"[router] {backend.url} is down: {exc}")
+            backend.healthy = backend.ready = False
+            backend.last_error = str(exc)
+        else:
+            ready = ready_status == 200 and config_status == 200
+            if ready != backend.available:
+                print(f"[router] {backend.url} is {'ready' if ready else 'not ready'}")
+            backend.healthy = True
+            backend.ready = ready
+            backend.last_error = None
+            if isinstance(config, dict):
+                backend.queue = config.get("queue") or {}
+                backend.voice_cache = config.get("voice_cache") or {}
+        backend.last_check = time.time()
+
+    def mark_failed(self, backend: Backend, error: str) -> None:
+        # Taken out of rotation until the next successful poll.
+        backend.healthy = False
+        backend.last_error = error
+
+    async def run_checks(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(backend) for backend in self.backends))
+            await asyncio.sleep(self.check_interval_sec)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(int(backend.voice_cache.get("hits", 0)) for backend in self.backends)
+        misses = sum(int(backend.voice_cache.get("misses", 0)) for backend in self.backends)
+        return {
+            "replicas": self.replicas,
+            "spill_depth": self.spill_depth,
+            "decisions": self.decisions,
+            "voice_cache_hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "backends": [backend.describe() for backend in self.backends],
+        }
+
+
+app = FastAPI()
+
+
+@app.on_event("startup")
+async def _startup() -> None:
+    urls = [url.strip() for url in os.environ.get("TTS_ROUTER_BACKENDS", "").split(",") if url.strip()]
+    router = VoiceRouter(
+        urls,
+        replicas=int(os.environ.get("TTS_ROUTER_REPLICAS", "2")),
+        spill_depth=int(os.environ.get("TTS_ROUTER_SPILL_DEPTH", "1")),
+        check_interval_sec=float(os.environ.get("TTS_ROUTER_CHECK_SEC", "2")),
+    )
+    await asyncio.gather(*(router.check(backend) for backend in router.backends))
+    app.state.router = router
+    app.state.check_task = asyncio.create_task(router.run_checks())
+    print(f"[router] Routing to {len(urls)} instances ({sum(b.available for b in router.backends)} ready)")
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    task = getattr(app.state, "check_task", None)
+    if task is not None:
+        task.cancel()
+
+
+async def _relay(ws: WebSocket, upstream) -> None:
+    async def client_to_upstream() -> None:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                await upstream.send(message["text"])
+            elif message.get("bytes") is not None:
+                await upstream.send(message["bytes"])
+
+    async def upstream_to_client() -> None:
+        async for message in upstream:
+            if isinstance(message, str):
+                await ws.send_text(message)
+            else:
+                await ws.send_bytes(message)
+
+    tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if tasks[1] in done:
+        # The instance ended the stream: pass its close code on.
+        code = upstream.close_code if upstream.close_code in _SENDABLE_CLOSE_CODES else 1011
+        try:
+            await ws.close(code=code, reason=upstream.close_reason or "")
+        except RuntimeError:
+            pass
+
+
+async def _proxy(ws: WebSocket, path: str) -> None:
+    router: VoiceRouter = app.state.router
+    voice = ws.query_params.get("voice") or ""
+    query = f"?{ws.url.query}" if ws.url.query else ""
+    headers = {"X-Forwarded-For": ws.client.host if ws.client else "unknown"}
+    tried: Tuple[Backend, ...] = ()
+    while True:
+        backend, decision = router.choose(voice, exclude=tried)
+        if backend is None:
+            router.decisions["unavailable"] += 1
+            await ws.accept()
+            await ws.close(code=1013, reason="No server instance is available")
+            return
+        # Count the stream before connecting, so concurrent arrivals see it when they choose.
+        backend.in_flight += 1
+        try:
+            upstream = await connect(f"{backend.ws_url}{path}{query}", additional_headers=headers, max_size=None)
+        except (OSError, InvalidHandshake, InvalidURI, asyncio.TimeoutError) as exc:
+            # Try the next instance; the client has not been accepted yet.
+            backend.in_flight -= 1
+            router.mark_failed(backend, f"{type(exc).__name__}: {exc}")
+            tried += (backend,)
+            continue
+        break
+
+    router.decisions[decision] += 1
+    backend.routed += 1
+    try:
+        await ws.accept()
+        await _relay(ws, upstream)
+    except ConnectionClosed:
+        pass
+    finally:
+        backend.in_flight -= 1
+        await upstream.close()
+
+
+@app.websocket("/stream")
+async def proxy_stream(ws: WebSocket) -> None:
+    await _proxy(ws, "/stream")
+
+
+@app.websocket("/stream_text")
+async def proxy_stream_text(ws: WebSocket) -> None:
+    await _proxy(ws, "/stream_text")
+
+
+@app.websocket("/session")
+async def proxy_session(ws: WebSocket) -> None:
+    # Routed by the `voice` of the connection; voices switched within a session stay on that instance.
+    await _proxy(ws, "/session")
+
+
+async def _forward_get(path: str) -> Response:
+    router: VoiceRouter = app.state.router
+    backend, _ = router.choose("")
+    if backend is None:
+        return JSONResponse({"detail": "No server instance is available"}, status_code=503)
+
+    def fetch() -> Tuple[int, bytes, str]:
+        try:
+            with urllib.request.urlopen(f"{backend.url}{path}", timeout=router.check_timeout_sec) as response:
+                return response.status, response.read(), response.headers.get("Content-Type", "")
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read(), exc.headers.get("Content-Type", "")
+
+    status, body, content_type = await asyncio.to_thread(fetch)
+    return Response(body, status_code=status, media_type=content_type or None)
+
+
+@app.get("/")
+async def index():
+    return await _forward_get("/")
+
+
+@app.get("/config")
+async def get_config():
+    """Voices and defaults of one ready instance (all instances are expected to serve the same voices)."""
+    return await _forward_get("/config")
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    router: VoiceRouter = app.state.router
+    available = sum(backend.available for backend in router.backends)
+    return JSONResponse({"ready": available > 0, "instances": available}, status_code=200 if available else 503)
+
+
+@app.get("/router")
+def get_router():
+    return app.state.router.stats()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Route websocket streams to demo server instances by voice")
+    p.add_argument("--backends", type=str, required=True, help="Comma-separated instance URLs, e.g. http://localhost:3001,http://localhost:3002")
+    p.add_argument("--port", type=int, default=3000)
+    p.add_argument("--replicas", type=int, default=2, help="Preferred instances per voice")
+    p.add_argument("--spill_depth", type=int, default=1, help="Requests beyond its model slots an instance may queue before requests spill over")
+    p.add_argument("--check_sec", type=float, default=2, help="Seconds between health checks")
+    args = p.parse_args()
+
+    os.environ["TTS_ROUTER_BACKENDS"] = args.backends
+    os.environ["TTS_ROUTER_REPLICAS"] = str(args.replicas)
+    os.environ["TTS_ROUTER_SPILL_DEPTH"] = str(args.spill_depth)
+    os.environ["TTS_ROUTER_CHECK_SEC"] = str(args.check_sec)
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
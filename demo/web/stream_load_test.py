@@ -0,0 +1,376 @@
+"""
+Load test of the `/stream` websocket endpoint on localhost, with latency and playback percentiles.
+
+`--concurrency` clients each open `/stream` connections back to back for `--duration_sec` (closed loop), or
+with `--arrival_rate` requests arrive as a Poisson process instead (open loop). Texts are drawn from the
+sentences of `--txt_path` as a mix of short (one sentence), medium (two to four) and long (five to ten)
+requests, and voices from the server's `/config` with Zipf-skewed popularity, so a few voices get most of the
+traffic.
+
+Every request records the time to its first audio byte, the gaps between audio messages, its real-time
+factor (wall time from connecting to the last byte over the audio duration) and the underruns of a player
+that starts once `--prebuffer_ms` of audio has arrived, plays in real time and resumes as soon as more audio
+arrives after running dry. Percentiles are printed and written to `--output_json`, one row per request to
+`--output_csv`.
+
+`--launch MODEL_PATH` starts the demo server on `--port` with that model (the released checkpoint or a tiny
+random-weight one) and the per-client rate limit off, waits for `/ready`, runs the load and stops the server,
+so a run needs nothing but localhost. A server started by hand needs `--rate_limit_per_min 0`, since all
+clients share one address.
+
+    python demo/web/stream_load_test.py --launch microsoft/VibeVoice-Realtime-0.5B --concurrency 4 --duration_sec 120 --output_json load.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import random
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+DEMO = Path(__file__).resolve().parent.parent
+SAMPLE_RATE = 24_000
+# Sentences per request of each length class.
+LENGTHS = {"short": (1, 1), "medium": (2, 4), "long": (5, 10)}
+# Log events that end a request without audio.
+REFUSALS = {"backend_busy": "busy", "backend_rate_limited": "rate_limited", "backend_error": "error"}
+
+
+def load_sentences(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        text = " ".join(f.read().split())
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 4]
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles; None for an empty sample."""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(rank(0.50), 4),
+        "p90": round(rank(0.90), 4),
+        "p95": round(rank(0.95), 4),
+        "p99": round(rank(0.99), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def playback(arrivals: List[Tuple[float, float]], prebuffer_sec: float) -> Tuple[Optional[float], int, float]:
+    """
+    Replay `(seconds since the request, audio seconds)` arrivals against a real-time player.
+    Returns (playback start, number of underruns, total stall seconds).
+    """
+    buffered = 0.0
+    start = None
+    run_out = 0.0
+    underruns = 0
+    stall = 0.0
+    for index, (arrived, audio_sec) in enumerate(arrivals):
+        if start is None:
+            buffered += audio_sec
+            if buffered >= prebuffer_sec or index == len(arrivals) - 1:
+                start = arrived
+                run_out = arrived + buffered
+            continue
+        if arrived > run_out:
+            underruns += 1
+            stall += arrived - run_out
+            run_out = arrived
+        run_out += audio_sec
+    return start, underruns, stall
+
+
+class Workload:
+    """Draws request texts and voices with a fixed seed, so runs are comparable."""
+
+    def __init__(self, sentences: List[str], voices: List[str], length_mix: List[float], voice_skew: float, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.sentences = sentences
+        self.length_mix = length_mix
+        self.voices = list(voices)
+        self.rng.shuffle(self.voices)
+        # Zipf popularity: the voice of rank r is drawn with weight 1 / r^skew.
+        self.voice_weights = [1.0 / (rank ** voice_skew) for rank in range(1, len(self.voices) + 1)]
+
+    def next(self) -> Dict[str, Any]:
+        length = self.rng.choices(list(LENGTHS), weights=self.length_mix)[0]
+        low, high = LENGTHS[length]
+        count = min(self.rng.randint(low, high), len(self.sentences))
+        first = self.rng.randrange(len(self.sentences) - count + 1)
+        voice = self.rng.choices(self.voices, weights=self.voice_weights)[0] if self.voices else None
+        return {"length": length, "text": " ".join(self.sentences[first:first + count]), "voice": voice}
+
+
+async def run_request(ws_url: str, request: Dict[str, Any], args) -> Dict[str, Any]:
+    query = {"text": request["text"]}
+    if request["voice"]:
+        query["voice"] = request["voice"]
+    if args.steps:
+        query["steps"] = args.steps
+    if args.cfg:
+        query["cfg"] = args.cfg
+    if args.seed is not None:
+        query["seed"] = args.seed
+    result = {
+        "client": request["client"],
+        "length": request["length"],
+        "voice": request["voice"],
+        "text_chars": len(request["text"]),
+        "status": "incomplete",
+        "queued": False,
+    }
+    sample_rate = SAMPLE_RATE
+    arrivals: List[Tuple[float, float]] = []
+    start = time.perf_counter()
+    try:
+        async with connect(f"{ws_url}/stream?{urllib.parse.urlencode(query)}", max_size=None, open_timeout=args.timeout_sec) as ws:
+            async for message in ws:
+                now = time.perf_counter() - start
+                if isinstance(message, bytes):
+                    arrivals.append((now, len(message) / 2 / sample_rate))
+                    continue
+                entry = json.loads(message)
+                event = entry.get("event")
+                if event == "audio_format":
+                    sample_rate = int(entry.get("data", {}).get("sample_rate", sample_rate))
+                elif event == "backend_queued":
+                    result["queued"] = True
+                elif event == "backend_stream_complete":
+                    result["status"] = "ok"
+                elif event in REFUSALS:
+                    result["status"] = REFUSALS[event]
+    except (OSError, InvalidHandshake, ConnectionClosed, asyncio.TimeoutError) as exc:
+        result["status"] = "error"
+        result["error"] = f"{type(exc).__name__}: {exc}"
+
+    gaps = [b[0] - a[0] for a, b in zip(arrivals, arrivals[1:])]
+    audio_sec = sum(audio for _, audio in arrivals)
+    play_start, underruns, stall = playback(arrivals, args.prebuffer_ms / 1000.0)
+    result.update(
+        ttfb_ms=round(arrivals[0][0] * 1000, 2) if arrivals else None,
+        playback_start_ms=round(play_start * 1000, 2) if play_start is not None else None,
+        audio_sec=round(audio_sec, 3),
+        wall_sec=round(arrivals[-1][0], 3) if arrivals else round(time.perf_counter() - start, 3),
+        rtf=round(arrivals[-1][0] / audio_sec, 4) if audio_sec else None,
+        messages=len(arrivals),
+        max_gap_ms=round(max(gaps) * 1000, 2) if gaps else None,
+        underruns=underruns,
+        stall_ms=round(stall * 1000, 2),
+    )
+    result["gaps_ms"] = [round(gap * 1000, 2) for gap in gaps]
+    return result
+
+
+async def run_load(ws_url: str, workload: Workload, args) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    deadline = time.monotonic() + args.duration_sec
+    started = 0
+
+    def next_request(client: str) -> Optional[Dict[str, Any]]:
+        nonlocal started
+        if time.monotonic() >= deadline or (args.max_requests and started >= args.max_requests):
+            return None
+        started += 1
+        return {**workload.next(), "client": client}
+
+    async def closed_loop_client(client: str) -> None:
+        while True:
+            request = next_request(client)
+            if request is None:
+                return
+            results.append(await run_request(ws_url, request, args))
+
+    if args.arrival_rate:
+        arrivals = random.Random(args.seed_workload + 1)
+        tasks = []
+        while True:
+            request = next_request(f"client-{started}")
+            if request is None:
+                break
+            tasks.append(asyncio.create_task(run_request(ws_url, request, args)))
+            await asyncio.sleep(arrivals.expovariate(args.arrival_rate))
+        results.extend(await asyncio.gather(*tasks))
+    else:
+        await asyncio.gather(*(closed_loop_client(f"client-{i}") for i in range(args.concurrency)))
+    return results
+
+
+def summarize(results: List[Dict[str, Any]], elapsed_sec: float) -> Dict[str, Any]:
+    ok = [r for r in results if r["status"] == "ok"]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    audio_sec = sum(r["audio_sec"] for r in ok)
+    summary = {
+        "requests": len(results),
+        "status": statuses,
+        "queued": sum(r["queued"] for r in results),
+        "elapsed_sec": round(elapsed_sec, 2),
+        "requests_per_min": round(len(ok) * 60.0 / elapsed_sec, 2) if elapsed_sec else 0.0,
+        "audio_sec_per_sec": round(audio_sec / elapsed_sec, 3) if elapsed_sec else 0.0,
+        "ttfb_ms": percentiles([r["ttfb_ms"] for r in ok]),
+        "gap_ms": percentiles([gap for r in ok for gap in r["gaps_ms"]]),
+        "max_gap_ms": percentiles([r["max_gap_ms"] for r in ok if r["max_gap_ms"] is not None]),
+        "rtf": percentiles([r["rtf"] for r in ok if r["rtf"] is not None]),
+        "underruns": percentiles([r["underruns"] for r in ok]),
+        "stall_ms": percentiles([r["stall_ms"] for r in ok]),
+        "requests_with_underrun": sum(r["underruns"] > 0 for r in ok),
+    }
+    summary["by_length"] = {
+        length: {"requests": len(group), "ttfb_ms": percentiles([r["ttfb_ms"] for r in group]), "rtf": percentiles([r["rtf"] for r in group if r["rtf"] is not None])}
+        for length in LENGTHS
+        for group in [[r for r in ok if r["length"] == length]]
+        if group
+    }
+    return summary
+
+
+def get_json(url: str, timeout: float = 5.0) -> Tuple[int, Any]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as exc:
+        return exc.code, None
+    except (OSError, ValueError):
+        return 0, None
+
+
+def launch_server(args) -> subprocess.Popen:
+    command = [
+        sys.executable, str(DEMO / "vibevoice_realtime_demo.py"),
+        "--model_path", args.launch,
+        "--device", args.device,
+        "--port", str(args.port),
+        "--rate_limit_per_min", "0",
+        "--queue_max_depth", str(max(16, 2 * args.concurrency)),
+        "--queue_max_wait_sec", "0",
+    ]
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    print(f"Starting {' '.join(command)}")
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(server: str, process: Optional[subprocess.Popen], timeout_sec: float) -> None:
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} before it was ready")
+        status, _ = get_json(f"{server}/ready")
+        if status == 200:
+            return
+        time.sleep(1.0)
+    raise SystemExit(f"Server at {server} was not ready after {timeout_sec:.0f}s")
+
+
+def write_csv(path: str, results: List[Dict[str, Any]]) -> None:
+    columns = [
+        "client", "length", "voice", "text_chars", "status", "queued", "ttfb_ms", "playback_start_ms",
+        "audio_sec", "wall_sec", "rtf", "messages", "max_gap_ms", "underruns", "stall_ms",
+    ]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the /stream websocket endpoint and report latency percentiles")
+    parser.add_argument("--server", type=str, default=None, help="Server to load (default: http://localhost:PORT)")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--launch", type=str, default=None, metavar="MODEL_PATH", help="Start a local server with this model for the run")
+    parser.add_argument("--device", type=str, default="cpu", help="Device of the launched server")
+    parser.add_argument("--server_log", type=str, default=None, help="File for the launched server's output")
+    parser.add_argument("--ready_timeout_sec", type=float, default=600.0)
+    parser.add_argument("--txt_path", type=str, default=str(DEMO / "text_examples" / "1p_vibevoice.txt"))
+    parser.add_argument("--length_mix", type=str, default="0.5,0.35,0.15", help="Weights of short, medium and long requests")
+    parser.add_argument("--voices", type=str, default=None, help="Comma-separated voices (default: all voices of the server)")
+    parser.add_argument("--voice_skew", type=float, default=1.0, help="Zipf exponent of voice popularity (0: uniform)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients streaming back to back (closed loop)")
+    parser.add_argument("--arrival_rate", type=float, default=None, help="Requests/s arriving as a Poisson process instead (open loop)")
+    parser.add_argument("--duration_sec", type=float, default=60.0, help="Time during which new requests start")
+    parser.add_argument("--max_requests", type=int, default=None, help="Stop starting requests after this many")
+    parser.add_argument("--prebuffer_ms", type=float, default=300.0, help="Audio the simulated player buffers before it starts")
+    parser.add_argument("--timeout_sec", type=float, default=30.0, help="Connection timeout per request")
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--cfg", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None, help="Generation seed sent with every request")
+    parser.add_argument("--seed_workload", type=int, default=0, help="Seed of the text, voice and arrival draws")
+    parser.add_argument("--output_json", type=str, default=None, help="Summary and per-request results")
+    parser.add_argument("--output_csv", type=str, default=None, help="One row per request")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = (args.server or f"http://localhost:{args.port}").rstrip("/")
+    ws_url = "ws" + server[len("http"):]
+    length_mix = [float(w) for w in args.length_mix.split(",")]
+    if len(length_mix) != len(LENGTHS):
+        raise SystemExit(f"--length_mix needs {len(LENGTHS)} weights (short, medium, long)")
+    sentences = load_sentences(args.txt_path)
+    if not sentences:
+        raise SystemExit(f"No sentences found in {args.txt_path}")
+
+    process = launch_server(args) if args.launch else None
+    try:
+        wait_ready(server, process, args.ready_timeout_sec)
+        if args.voices:
+            voices = [v.strip() for v in args.voices.split(",") if v.strip()]
+        else:
+            _, config = get_json(f"{server}/config")
+            voices = (config or {}).get("voices", [])
+        workload = Workload(sentences, voices, length_mix, args.voice_skew, args.seed_workload)
+        mode = f"{args.arrival_rate} requests/s" if args.arrival_rate else f"{args.concurrency} clients"
+        print(f"Loading {server} with {mode} for {args.duration_sec:.0f}s ({len(voices)} voices)")
+        start = time.monotonic()
+        results = asyncio.run(run_load(ws_url, workload, args))
+        summary = summarize(results, time.monotonic() - start)
+        _, config = get_json(f"{server}/config")
+        server_queue = (config or {}).get("queue")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print(f"{summary['requests']} requests {summary['status']}, {summary['queued']} queued, "
+          f"{summary['requests_per_min']:.1f} completed/min, {summary['audio_sec_per_sec']:.2f}x real time overall")
+    print(f"{'metric':<14}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name in ("ttfb_ms", "gap_ms", "max_gap_ms", "rtf", "underruns", "stall_ms"):
+        stats = summary[name]
+        cells = "".join(f"{stats[q]:>10.3f}" if stats[q] is not None else f"{'-':>10}" for q in ("p50", "p90", "p95", "p99", "max"))
+        print(f"{name:<14}{cells}")
+    print(f"{summary['requests_with_underrun']} of {summary['status'].get('ok', 0)} completed requests had an underrun")
+
+    if args.output_json:
+        report = {"config": vars(args), "summary": summary, "server_queue": server_queue, "requests": results}
+        with open(args.output_json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output_json}")
+    if args.output_csv:
+        write_csv(args.output_csv, results)
+        print(f"Saved per-request results to {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Text normalization used for cache keys: NFKC, unified quotes, collapsed whitespace (case is kept)."""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("’", "'").replace("‘", "'").replace("“", '"').replace("”", '"')
+    return " ".join(text.split())
+
+
+def hash_file(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SynthesisCache:
+    """
+    Content-addressed on-disk cache of synthesized utterances.
+
+    Entries are 16-bit mono WAV files named by the SHA-256 of the synthesis key. The cache is bounded by
+    `max_bytes`; the least recently used entries (by access order, seeded from file mtimes on startup)
+    are evicted first. Only deterministic (seeded) generations should be stored.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30, sample_rate: int = 24_000) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        existing = sorted(self.cache_dir.glob("*.wav"), key=lambda p: p.stat().st_mtime)
+        for path in existing:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+        for path in self.cache_dir.glob("*.tmp"):
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(
+        text: str,
+        voice_hash: str,
+        cfg_scale: float,
+        inference_steps: int,
+        seed: int,
+        model_revision: str,
+        **extra: Any,
+    ) -> str:
+        fields: Dict[str, Any] = {
+            "text": normalize_text(text),
+            "voice": voice_hash,
+            "cfg_scale": round(float(cfg_scale), 6),
+            "steps": int(inference_steps),
+            "seed": int(seed),
+            "model": model_revision,
+        }
+        fields.update(extra)
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached audio as float32 in [-1, 1], or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with wave.open(str(path), "rb") as wav:
+                frames = wav.readframes(wav.getnframes())
+            os.utime(path)
+        except (OSError, wave.Error, EOFError):
+            # Removed or corrupted behind our back: treat as a miss.
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32767.0
+
+    def put(self, key: str, audio: np.ndarray) -> None:
+        pcm = np.rint(np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2")
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with wave.open(str(tmp_path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm.tobytes())
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,453 @@
+import asyncio
+import itertools
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+import traceback
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import torch.multiprocessing as mp
+
+
+def _worker_main(
+    worker_id: int,
+    conn: multiprocessing.connection.Connection,
+    model_path: str,
+    device: str,
+    num_threads: int,
+    cpu_ids: Optional[List[int]],
+    service_kwargs: Dict[str, Any],
+    shared_model,
+    warmup_kwargs: Optional[Dict[str, Any]],
+) -> None:
+    """Entry point of a replica process: owns one `StreamingTTSService` and serves one stream at a time."""
+    if device.startswith("cuda:"):
+        # Must happen before CUDA is initialized in this process.
+        os.environ["CUDA_VISIBLE_DEVICES"] = device.split(":", 1)[1]
+        device = "cuda"
+    if cpu_ids and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_ids)
+
+    import torch
+
+    torch.set_num_threads(num_threads)
+    from vibevoice.modular.streamer import TextInputStreamer
+    from .app import StreamingTTSService
+    from .metrics import TTSMetrics
+
+    # Observations are shipped to the server's registry after every stream ("metrics" messages).
+    metrics = TTSMetrics()
+    service = StreamingTTSService(model_path=model_path, device=device, metrics=metrics, **service_kwargs)
+    service.load(model=shared_model)
+    # Replicas (restarts included) only report ready once warm.
+    warmup_results = service.warmup(**warmup_kwargs) if warmup_kwargs is not None else []
+
+    send_lock = threading.Lock()
+    jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+    stop_events: Dict[int, threading.Event] = {}
+    # Streams whose text arrives in "text" messages while they run.
+    text_streamers: Dict[int, Any] = {}
+    text_lengths: Dict[int, int] = {}
+    # Samples sent but not yet taken by the client; bounded like the in-process streamer buffer.
+    unacked_samples: Dict[int, int] = {}
+    credit = threading.Condition()
+    max_unacked = int(service.max_buffered_sec * service.sample_rate) if service.max_buffered_sec else None
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    def reader() -> None:
+        # Runs next to generation so pings and cancels are answered while a stream is in progress.
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                jobs.put(None)
+                return
+            kind = message[0]
+            if kind == "stream":
+                stop_events[message[1]] = threading.Event()
+                if message[3].pop("text_stream", False):
+                    text_streamers[message[1]] = TextInputStreamer(service.processor.tokenizer)
+                jobs.put(message)
+            elif kind in ("text", "text_end"):
+                streamer = text_streamers.get(message[1])
+                if streamer is not None and not streamer.finished:
+                    if kind == "text":
+                        streamer.put(message[2])
+                        text_lengths[message[1]] = text_lengths.get(message[1], 0) + len(message[2].strip())
+                    else:
+                        if not text_lengths.get(message[1]) and message[1] in stop_events:
+                            # Nothing to say: stop instead of generating from an empty text.
+                            stop_events[message[1]].set()
+                        streamer.end()
+            elif kind == "cancel":
+                event = stop_events.get(message[1])
+                if event is not None:
+                    event.set()
+                with credit:
+                    credit.notify_all()
+            elif kind == "ack":
+                with credit:
+                    if message[1] in unacked_samples:
+                        unacked_samples[message[1]] -= message[2]
+                    credit.notify_all()
+            elif kind == "ping":
+                send(("pong", message[1], len(stop_events)))
+            elif kind == "shutdown":
+                jobs.put(None)
+                return
+
+    threading.Thread(target=reader, daemon=True).start()
+    send(("ready", worker_id, os.getpid(), warmup_results))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        _, request_id, text, kwargs = job
+        stop_event = stop_events[request_id]
+
+        def log_callback(event: str, **data: Any) -> None:
+            send(("log", request_id, event, data))
+
+        unacked_samples[request_id] = 0
+        try:
+            if not stop_event.is_set():
+                stream = service.stream(
+                    text, log_callback=log_callback, stop_event=stop_event,
+                    text_streamer=text_streamers.get(request_id), **kwargs,
+                )
+                try:
+                    for chunk in stream:
+                        send(("chunk", request_id, chunk))
+                        # Stop pulling from the streamer while the client is behind, so generation pauses.
+                        with credit:
+                            unacked_samples[request_id] += chunk.size
+                            while (
+                                max_unacked is not None
+                                and unacked_samples[request_id] >= max_unacked
+                                and not stop_event.is_set()
+                            ):
+                                credit.wait(0.1)
+                        if stop_event.is_set():
+                            break
+                finally:
+                    stream.close()
+            send(("metrics", metrics.registry.drain()))
+            send(("done", request_id))
+        except Exception as exc:
+            traceback.print_exc()
+            send(("metrics", metrics.registry.drain()))
+            send(("error", request_id, f"{type(exc).__name__}: {exc}"))
+        finally:
+            stop_events.pop(request_id, None)
+            text_streamers.pop(request_id, None)
+            text_lengths.pop(request_id, None)
+            with credit:
+                unacked_samples.pop(request_id, None)
+
+
+class _WorkerHandle:
+    def __init__(self, index: int, device: str, cpu_ids: Optional[List[int]]) -> None:
+        self.index = index
+        self.device = device
+        self.cpu_ids = cpu_ids
+        self.process = None
+        self.conn: Optional[multiprocessing.connection.Connection] = None
+        self.send_lock = threading.Lock()
+        self.ready = False
+        # Whether the current replica has reported ready (`ready` is also cleared when it is killed).
+        self.reported_ready = False
+        # Resolved when the slot's first replica reports ready (or fails to start); survives respawns.
+        self.started: Optional["asyncio.Future[None]"] = None
+        self.requests: Set[int] = set()
+        self.last_pong = 0.0
+        self.restarts = 0
+        # Consecutive replicas of this slot that exited before reporting ready.
+        self.startup_failures = 0
+        self.exit_code: Optional[int] = None
+        self.served = 0
+
+
+class WorkerPool:
+    """
+    N model replicas in spawned worker processes, each streaming PCM back over a pipe.
+
+    Requests go to the ready worker with the fewest in-flight streams. A reader thread per worker
+    forwards messages into per-request asyncio queues; consumed chunks are acknowledged so a worker
+    never runs more than `max_buffered_sec` ahead of its client. A health loop pings every worker and kills
+    ones that stop answering; workers that exit are restarted and their in-flight streams fail. A replica
+    that exits before reporting ready is restarted after an exponential backoff (`restart_backoff_sec`,
+    doubling up to `max_restart_backoff_sec`); after `max_startup_failures` such exits in a row its slot
+    is given up, and `start` raises with the exit code if that happens before the slot was ever ready.
+
+    On CPU the parent can pass a model whose parameters were moved to shared memory
+    (`model.share_memory()`), so replicas reuse one copy of the weights instead of loading their own.
+    Replicas record their own metrics and the pool merges them into `metrics` after each stream. With
+    `warmup_kwargs` (see `StreamingTTSService.warmup`) every replica warms up before it reports ready.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        num_workers: int,
+        devices: Sequence[str] = ("cpu",),
+        threads_per_worker: Optional[int] = None,
+        pin_cpus: bool = True,
+        service_kwargs: Optional[Dict[str, Any]] = None,
+        shared_model=None,
+        health_interval: float = 5.0,
+        health_timeout: float = 30.0,
+        metrics=None,
+        warmup_kwargs: Optional[Dict[str, Any]] = None,
+        max_startup_failures: int = 3,
+        restart_backoff_sec: float = 1.0,
+        max_restart_backoff_sec: float = 60.0,
+    ) -> None:
+        if num_workers < 1:
+            raise ValueError(f"num_workers must be >= 1, got {num_workers}")
+        self.model_path = model_path
+        self.service_kwargs = service_kwargs or {}
+        self.shared_model = shared_model
+        self.metrics = metrics
+        self.warmup_kwargs = warmup_kwargs
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_startup_failures = max_startup_failures
+        self.restart_backoff_sec = restart_backoff_sec
+        self.max_restart_backoff_sec = max_restart_backoff_sec
+        cpu_count = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // num_workers)
+        self.workers = []
+        for index in range(num_workers):
+            cpu_ids = None
+            if pin_cpus and devices[index % len(devices)] == "cpu":
+                first = (index * self.threads_per_worker) % cpu_count
+                cpu_ids = [(first + i) % cpu_count for i in range(self.threads_per_worker)]
+            self.workers.append(_WorkerHandle(index, devices[index % len(devices)], cpu_ids))
+        self._ctx = mp.get_context("spawn")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests: Dict[int, asyncio.Queue] = {}
+        self._request_ids = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for handle in self.workers:
+            handle.started = self._loop.create_future()
+            self._spawn(handle)
+        # Per-slot futures rather than per-process events: a replica that dies during startup is respawned.
+        await asyncio.gather(*(handle.started for handle in self.workers))
+        self._health_task = asyncio.create_task(self._health_loop())
+        print(f"[pool] {len(self.workers)} workers ready ({self.threads_per_worker} threads each)")
+
+    def _spawn(self, handle: _WorkerHandle) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        handle.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                handle.index, child_conn, self.model_path, handle.device, self.threads_per_worker,
+                handle.cpu_ids, self.service_kwargs, self.shared_model, self.warmup_kwargs,
+            ),
+            daemon=True,
+        )
+        handle.conn = parent_conn
+        handle.ready = False
+        handle.reported_ready = False
+        handle.last_pong = time.monotonic()
+        handle.process.start()
+        child_conn.close()
+        threading.Thread(target=self._reader, args=(handle, parent_conn, handle.process), daemon=True).start()
+
+    def _reader(self, handle: _WorkerHandle, conn: multiprocessing.connection.Connection, process) -> None:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                # The pipe closes just before the process is reaped; wait here for its exit code.
+                process.join(5)
+                self._loop.call_soon_threadsafe(self._on_worker_exit, handle, conn)
+                return
+            self._loop.call_soon_threadsafe(self._on_message, handle, message)
+
+    def _on_message(self, handle: _WorkerHandle, message: tuple) -> None:
+        kind = message[0]
+        if kind == "ready":
+            handle.ready = handle.reported_ready = True
+            handle.startup_failures = 0
+            handle.last_pong = time.monotonic()
+            if not handle.started.done():
+                handle.started.set_result(None)
+            if self.metrics is not None:
+                self.metrics.record_warmup(message[3])
+            print(f"[pool] worker {handle.index} ready (pid {message[2]}, device {handle.device})")
+        elif kind == "pong":
+            handle.last_pong = time.monotonic()
+        elif kind == "metrics":
+            if self.metrics is not None:
+                self.metrics.registry.merge(message[1])
+        else:
+            request_queue = self._requests.get(message[1])
+            if request_queue is not None:
+                request_queue.put_nowait(message)
+
+    def _on_worker_exit(self, handle: _WorkerHandle, conn) -> None:
+        if conn is not handle.conn:
+            return
+        handle.exit_code = handle.process.exitcode
+        handle.ready = False
+        for request_id in list(handle.requests):
+            request_queue = self._requests.get(request_id)
+            if request_queue is not None:
+                request_queue.put_nowait(("error", request_id, f"worker {handle.index} exited"))
+        if self._closing:
+            return
+        delay = 0.0
+        if not handle.reported_ready:
+            # Died during startup: a bad model path or OOM would fail again at once.
+            handle.startup_failures += 1
+            if handle.startup_failures >= self.max_startup_failures:
+                message = (
+                    f"worker {handle.index} exited with code {handle.exit_code} during startup "
+                    f"{handle.startup_failures} times in a row"
+                )
+                print(f"[pool] {message}, giving up")
+                if not handle.started.done():
+                    handle.started.set_exception(RuntimeError(message))
+                return
+            delay = min(self.restart_backoff_sec * 2 ** (handle.startup_failures - 1), self.max_restart_backoff_sec)
+        handle.restarts += 1
+        print(f"[pool] worker {handle.index} exited (code {handle.exit_code}), restarting in {delay:.1f}s")
+        self._loop.call_later(delay, self._respawn, handle)
+
+    def _respawn(self, handle: _WorkerHandle) -> None:
+        if not self._closing:
+            self._spawn(handle)
+
+    async def _health_loop(self) -> None:
+        ping_ids = itertools.count()
+        while not self._closing:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            for handle in self.workers:
+                if not handle.ready:
+                    continue
+                if now - handle.last_pong > self.health_timeout:
+                    print(f"[pool] worker {handle.index} unresponsive for {now - handle.last_pong:.0f}s, killing it")
+                    handle.ready = False
+                    handle.process.kill()
+                    continue
+                try:
+                    self._send(handle, ("ping", next(ping_ids)))
+                except OSError:
+                    pass
+
+    def _send(self, handle: _WorkerHandle, message: tuple) -> None:
+        with handle.send_lock:
+            handle.conn.send(message)
+
+    def _pick(self) -> _WorkerHandle:
+        ready = [handle for handle in self.workers if handle.ready]
+        if not ready:
+            raise RuntimeError("No healthy TTS worker available")
+        return min(ready, key=lambda handle: (len(handle.requests), handle.served))
+
+    async def stream(
+        self,
+        text: str,
+        log_callback: Optional[Callable[..., None]] = None,
+        text_stream: Optional[AsyncIterator[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[np.ndarray]:
+        """
+        Stream float32 chunks of `text` from the least-loaded worker; `kwargs` go to `StreamingTTSService.stream`.
+        With `text_stream`, its pieces are forwarded to the worker while it generates and `text` is ignored.
+        """
+        handle = self._pick()
+        request_id = next(self._request_ids)
+        request_queue: asyncio.Queue = asyncio.Queue()
+        self._requests[request_id] = request_queue
+        handle.requests.add(request_id)
+        handle.served += 1
+        finished = False
+        forward_task = None
+        try:
+            self._send(handle, ("stream", request_id, text, {**kwargs, "text_stream": text_stream is not None}))
+            if text_stream is not None:
+                forward_task = asyncio.create_task(self._forward_text(handle, request_id, text_stream))
+            while True:
+                message = await request_queue.get()
+                kind = message[0]
+                if kind == "chunk":
+                    yield message[2]
+                    # The consumer asked for the next chunk: return the credit to the worker.
+                    if handle.ready:
+                        self._send(handle, ("ack", request_id, message[2].size))
+                elif kind == "log":
+                    if log_callback is not None:
+                        log_callback(message[2], **message[3])
+                elif kind == "done":
+                    finished = True
+                    return
+                elif kind == "error":
+                    finished = True
+                    raise RuntimeError(message[2])
+        finally:
+            if forward_task is not None:
+                forward_task.cancel()
+            if not finished and handle.ready:
+                try:
+                    self._send(handle, ("cancel", request_id))
+                except OSError:
+                    pass
+            handle.requests.discard(request_id)
+            self._requests.pop(request_id, None)
+
+    async def _forward_text(self, handle: _WorkerHandle, request_id: int, text_stream: AsyncIterator[str]) -> None:
+        try:
+            async for piece in text_stream:
+                self._send(handle, ("text", request_id, piece))
+        except OSError:
+            pass
+        finally:
+            if handle.ready:
+                try:
+                    self._send(handle, ("text_end", request_id))
+                except OSError:
+                    pass
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for handle in self.workers:
+            try:
+                self._send(handle, ("shutdown",))
+            except OSError:
+                pass
+        for handle in self.workers:
+            await asyncio.to_thread(handle.process.join, 10)
+            if handle.process.is_alive():
+                handle.process.kill()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "worker": handle.index,
+                "device": handle.device,
+                "ready": handle.ready,
+                "inflight": len(handle.requests),
+                "served": handle.served,
+                "restarts": handle.restarts,
+                "startup_failures": handle.startup_failures,
+                "exit_code": handle.exit_code,
+                "pid": handle.process.pid if handle.process is not None else None,
+            }
+            for handle in self.workers
+        ]
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import time
+import traceback
+from typing import Dict, List
+
+import torch
+
+from vibevoice.modular.modeling_vibevoice_streaming_inference import (
+    VibeVoiceStreamingForConditionalGenerationInference,
+    TTSWindowPolicy,
+    AdaptiveTTSWindowPolicy,
+    clone_prefilled_outputs,
+)
+from vibevoice.modular.streamer import AudioStreamer
+from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+
+from realtime_model_inference_from_file import VoiceMapper
+
+SAMPLE_RATE = 24000
+
+# Fixed text set so TTFA / RTF numbers are comparable between runs and policies.
+DEFAULT_TEXTS = [
+    "Hello there, how can I help you today?",
+    "The quick brown fox jumps over the lazy dog while the sun slowly sets behind the hills.",
+    "VibeVoice is a novel framework designed for generating expressive, long-form, multi-speaker "
+    "conversational audio, such as podcasts, from text. It addresses significant challenges in "
+    "traditional Text-to-Speech systems, particularly in scalability, speaker consistency, and "
+    "natural turn-taking.",
+]
+
+POLICIES = {
+    "fixed_5_6": lambda: TTSWindowPolicy(5, 6),
+    "fixed_3_4": lambda: TTSWindowPolicy(3, 4),
+    "fixed_10_12": lambda: TTSWindowPolicy(10, 12),
+    "adaptive": lambda: AdaptiveTTSWindowPolicy(),
+    "adaptive_first1": lambda: AdaptiveTTSWindowPolicy(first_text_window_size=1),
+}
+
+
+class FirstChunkTimer(AudioStreamer):
+    """AudioStreamer that records when the first audio chunk leaves `generate`."""
+
+    def __init__(self):
+        super().__init__(batch_size=1)
+        self.start_time = time.perf_counter()
+        self.first_chunk_time = None
+
+    def put(self, audio_chunks: torch.Tensor, sample_indices: torch.Tensor):
+        super().put(audio_chunks, sample_indices)
+        if self.first_chunk_time is None:
+            # `put` copies the chunk to host memory, so this timestamp includes the device work.
+            self.first_chunk_time = time.perf_counter()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure TTFA and RTF of VibeVoice window policies")
+    parser.add_argument("--model_path", type=str, default="microsoft/VibeVoice-Realtime-0.5B")
+    parser.add_argument("--speaker_name", type=str, default="Wayne")
+    parser.add_argument(
+        "--device",
+        type=str,
+        default=("cuda" if torch.cuda.is_available() else ("mps" if torch.backends.mps.is_available() else "cpu")),
+        help="Device for inference: cuda | mps | cpu",
+    )
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument(
+        "--policies",
+        type=str,
+        default=",".join(POLICIES),
+        help=f"Comma separated policies to measure, from: {', '.join(POLICIES)}",
+    )
+    parser.add_argument("--txt_paths", type=str, nargs="*", default=None, help="Optional txt files replacing the built-in text set")
+    parser.add_argument("--repeats", type=int, default=2, help="Runs per (policy, text); the first run of all is a discarded warmup")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path to write the raw measurements")
+    return parser.parse_args()
+
+
+def load_model(model_path: str, device: str):
+    if device == "mps":
+        load_dtype, attn_impl, device_map = torch.float32, "sdpa", None
+    elif device == "cuda":
+        load_dtype, attn_impl, device_map = torch.bfloat16, "flash_attention_2", "cuda"
+    else:
+        load_dtype, attn_impl, device_map = torch.float32, "sdpa", "cpu"
+    try:
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            model_path, torch_dtype=load_dtype, device_map=device_map, attn_implementation=attn_impl,
+        )
+    except Exception:
+        if attn_impl != "flash_attention_2":
+            raise
+        print(traceback.format_exc())
+        print("Error loading the model with flash_attention_2, falling back to SDPA.")
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            model_path, torch_dtype=load_dtype, device_map=device_map, attn_implementation="sdpa",
+        )
+    if device == "mps":
+        model.to("mps")
+    model.eval()
+    model.set_ddpm_inference_steps(num_steps=5)
+    return model
+
+
+def run_once(model, processor, text, prefilled_outputs, policy, cfg_scale, device) -> Dict[str, float]:
+    inputs = processor.process_input_with_cached_prompt(
+        text=text,
+        cached_prompt=prefilled_outputs,
+        padding=True,
+        return_tensors="pt",
+        return_attention_mask=True,
+    )
+    for k, v in inputs.items():
+        if torch.is_tensor(v):
+            inputs[k] = v.to(device)
+
+    timer = FirstChunkTimer()
+    outputs = model.generate(
+        **inputs,
+        max_new_tokens=None,
+        cfg_scale=cfg_scale,
+        tokenizer=processor.tokenizer,
+        generation_config={"do_sample": False},
+        audio_streamer=timer,
+        window_policy=policy,
+        show_progress_bar=False,
+        all_prefilled_outputs=clone_prefilled_outputs(prefilled_outputs),
+    )
+    total_time = time.perf_counter() - timer.start_time
+    audio = outputs.speech_outputs[0]
+    audio_sec = audio.shape[-1] / SAMPLE_RATE if audio is not None else 0.0
+    ttfa = (timer.first_chunk_time - timer.start_time) if timer.first_chunk_time else float("nan")
+    return {
+        "ttfa_sec": ttfa,
+        "total_sec": total_time,
+        "audio_sec": audio_sec,
+        "rtf": total_time / audio_sec if audio_sec > 0 else float("inf"),
+    }
+
+
+def main():
+    args = parse_args()
+    if args.device == "mps" and not torch.backends.mps.is_available():
+        print("Warning: MPS not available. Falling back to CPU.")
+        args.device = "cpu"
+
+    texts: List[str] = DEFAULT_TEXTS
+    if args.txt_paths:
+        texts = []
+        for path in args.txt_paths:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(f.read().strip().replace("’", "'").replace('“', '"').replace('”', '"'))
+
+    policy_names = [name.strip() for name in args.policies.split(",") if name.strip()]
+    unknown = [name for name in policy_names if name not in POLICIES]
+    if unknown:
+        raise ValueError(f"Unknown policies: {unknown}. Available: {list(POLICIES)}")
+
+    processor = VibeVoiceStreamingProcessor.from_pretrained(args.model_path)
+    model = load_model(args.model_path, args.device)
+    voice_path = VoiceMapper(args.model_path).get_voice_path(args.speaker_name)
+    prefilled_outputs = torch.load(voice_path, map_location=args.device, weights_only=False)
+
+    # Warmup so the first measured policy does not pay for kernel selection and allocator growth.
+    run_once(model, processor, texts[0], prefilled_outputs, TTSWindowPolicy(), args.cfg_scale, args.device)
+
+    results = []
+    for name in policy_names:
+        for text_index, text in enumerate(texts):
+            for repeat in range(args.repeats):
+                metrics = run_once(model, processor, text, prefilled_outputs, POLICIES[name](), args.cfg_scale, args.device)
+                metrics.update({"policy": name, "text_index": text_index, "repeat": repeat})
+                results.append(metrics)
+                print(
+                    f"[{name}] text {text_index} run {repeat}: TTFA {metrics['ttfa_sec'] * 1000:.0f} ms, "
+                    f"RTF {metrics['rtf']:.3f}, audio {metrics['audio_sec']:.2f} s"
+                )
+
+    print("\n" + "=" * 60)
+    print(f"{'policy':<18}{'mean TTFA (ms)':>16}{'max TTFA (ms)':>16}{'mean RTF':>10}")
+    print("=" * 60)
+    for name in policy_names:
+        rows = [r for r in results if r["policy"] == name]
+        ttfas = [r["ttfa_sec"] * 1000 for r in rows]
+        rtfs = [r["rtf"] for r in rows]
+        print(f"{name:<18}{sum(ttfas) / len(ttfas):>16.0f}{max(ttfas):>16.0f}{sum(rtfs) / len(rtfs):>10.3f}")
+    print("=" * 60)
+
+    if args.output_json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_json)), exist_ok=True)
+        with open(args.output_json, "w") as f:
+            json.dump({"device": args.device, "texts": texts, "results": results}, f, indent=2)
+        print(f"Saved measurements to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from web.audio_codecs import AudioEncoder, LookaheadLimiter, MulawEncoder, Resampler, _mulaw_table, negotiate_encoder
+
+SOURCE_RATE = 24000
+
+
+def signal(seconds: float = 0.5, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SOURCE_RATE * seconds)) / SOURCE_RATE
+    tone = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+    return (tone + 0.1 * rng.standard_normal(t.size)).astype(np.float32)
+
+
+def random_chunks(samples: np.ndarray, seed: int = 0, max_size: int = 4000):
+    rng = np.random.default_rng(seed)
+    start = 0
+    while start < samples.size:
+        size = int(rng.integers(1, max_size))
+        yield samples[start:start + size]
+        start += size
+
+
+@pytest.mark.parametrize("dst_rate", [16000, 8000, 22050])
+def test_resampler_output_does_not_depend_on_chunking(dst_rate):
+    samples = signal()
+    one_shot = Resampler(SOURCE_RATE, dst_rate).process(samples)
+    resampler = Resampler(SOURCE_RATE, dst_rate)
+    chunked = np.concatenate([resampler.process(chunk) for chunk in random_chunks(samples)])
+    assert one_shot.size == chunked.size == -(-samples.size * dst_rate // SOURCE_RATE)
+    np.testing.assert_allclose(chunked, one_shot, atol=1e-6)
+
+
+def test_resampler_accepts_empty_chunks():
+    samples = signal()
+    one_shot = Resampler(SOURCE_RATE, 16000).process(samples)
+    rng = np.random.default_rng(2)
+    resampler = Resampler(SOURCE_RATE, 16000)
+    assert resampler.process(samples[:0]).size == 0
+    chunks, start = [], 0
+    while start < samples.size:
+        size = int(rng.choice([0, 1, 2, 3, 50, 2000]))
+        chunks.append(resampler.process(samples[start:start + size]))
+        start += size
+    assert any(chunk.size == 0 for chunk in chunks)
+    np.testing.assert_allclose(np.concatenate(chunks), one_shot, atol=1e-6)
+
+
+def test_resampler_passes_tones_and_removes_aliases():
+    t = np.arange(SOURCE_RATE) / SOURCE_RATE
+    delay = 32 // 2  # taps_per_phase / 2 output samples of group delay, skipped with the filter's warm-up
+
+    def level(frequency: float) -> float:
+        output = Resampler(SOURCE_RATE, 8000).process(np.sin(2 * np.pi * frequency * t).astype(np.float32))
+        return float(np.sqrt(np.mean(output[2 * delay:-2 * delay] ** 2)) * np.sqrt(2))
+
+    assert level(440.0) == pytest.approx(1.0, abs=0.01)
+    # Above the 4 kHz Nyquist frequency of the output.
+    assert level(6000.0) < 0.01
+
+
+def test_resampler_same_rate_is_a_pass_through():
+    samples = signal()
+    np.testing.assert_array_equal(Resampler(SOURCE_RATE, SOURCE_RATE).process(samples), samples)
+
+
+def g711_ulaw_compress(sample: int) -> int:
+    """`ulaw_compress` of the ITU-T G.191 reference implementation, for one 16-bit sample."""
+    absno = ((~sample if sample < 0 else sample) >> 2) + 33
+    absno = min(absno, 0x1FFF)
+    segno, i = 1, absno >> 6
+    while i:
+        segno += 1
+        i >>= 1
+    code = ((0x08 - segno) << 4) | (0x0F - ((absno >> segno) & 0x0F))
+    return code | 0x80 if sample >= 0 else code
+
+
+def test_mulaw_table_matches_g711_reference():
+    pcm = np.arange(-32768, 32768, dtype=np.int32)
+    expected = np.array([g711_ulaw_compress(int(sample)) for sample in pcm], dtype=np.uint8)
+    np.testing.assert_array_equal(_mulaw_table()[pcm.astype(np.int16).view(np.uint16)], expected)
+
+    encoder = MulawEncoder(8000, 8000)
+    samples = np.array([0, -1, 32767, -32768], dtype=np.float32) / 32767.0
+    assert list(bytes(encoder.encode(samples))) == [0xFF, 0x7F, 0x80, 0x00]
+
+
+@pytest.mark.parametrize("sample_rate", [8000, 16000])
+def test_mulaw_encoder_output_does_not_depend_on_chunking(sample_rate):
+    samples = signal()
+    one_shot = bytes(MulawEncoder(SOURCE_RATE, sample_rate).encode(samples))
+    encoder = MulawEncoder(SOURCE_RATE, sample_rate)
+    chunked = b"".join(bytes(encoder.encode(chunk)) for chunk in random_chunks(samples, seed=1))
+    assert len(one_shot) == len(chunked) == -(-samples.size * sample_rate // SOURCE_RATE)
+    assert chunked == one_shot
+    assert encoder.stats()["bytes"] == len(chunked)
+
+
+def test_pcm16_encoder_round_trips():
+    encoder = AudioEncoder(SOURCE_RATE, SOURCE_RATE)
+    samples = np.clip(signal(), -1.0, 1.0)
+    decoded = np.frombuffer(bytes(encoder.encode(samples)), np.int16) / 32767.0
+    np.testing.assert_allclose(decoded, samples, atol=1 / 32767)
+
+
+def test_negotiate_encoder():
+    assert isinstance(negotiate_encoder({}, SOURCE_RATE), AudioEncoder)
+    mulaw = negotiate_encoder({"codec": "mulaw"}, SOURCE_RATE)
+    assert isinstance(mulaw, MulawEncoder) and mulaw.sample_rate == 8000
+    for params in ({"codec": "mp3"}, {"sample_rate": "48000"}, {"sample_rate": "fast"}, {"codec": "opus", "sample_rate": "22050"}):
+        with pytest.raises(ValueError):
+            negotiate_encoder(params, SOURCE_RATE)
+
+
+def limit(limiter: LookaheadLimiter, chunks) -> np.ndarray:
+    return np.concatenate([limiter.process(chunk) for chunk in chunks] + [limiter.flush()])
+
+
+@pytest.mark.parametrize("position", ["start", "boundary", "after_flush"])
+def test_limiter_keeps_peaks_under_the_ceiling(position):
+    ceiling = 0.9
+    limiter = LookaheadLimiter(SOURCE_RATE, ceiling=ceiling)
+    samples = 0.5 * signal(0.1)
+    if position == "start":
+        samples[0] = -3.0
+        chunks = [samples[:500], samples[500:]]
+    elif position == "boundary":
+        samples[998:1003] = 2.0
+        chunks = [samples[:1000], samples[1000:]]
+    else:
+        limit(limiter, [samples])
+        samples[0] = 2.0
+        chunks = [samples[:7], samples[7:]]
+    output = limit(limiter, chunks)
+    # Everything comes out, `lookahead` samples late.
+    assert output.size == samples.size + limiter.lookahead
+    assert np.abs(output).max() <= ceiling
+    peak = int(np.argmax(np.abs(samples)))
+    assert output[peak + limiter.lookahead] == pytest.approx(np.sign(samples[peak]) * ceiling, rel=1e-3)
+
+
+def test_limiter_passes_quiet_audio_through_delayed():
+    limiter = LookaheadLimiter(SOURCE_RATE)
+    samples = 0.5 * signal(0.1)
+    output = limit(limiter, random_chunks(samples, max_size=500))
+    np.testing.assert_array_equal(output[limiter.lookahead:], samples)
+    assert not output[:limiter.lookahead].any()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import numpy as np
+import soundfile as sf
+
+from web.batch_jobs import BatchJobManager
+from web.request_queue import RequestQueue
+
+SAMPLE_RATE = 24000
+
+
+async def fake_stream(text, log_callback, stop_event, **params):
+    """One 0.1 s chunk per word; "fail" raises. Like `astream`, sets `stop_event` when it ends."""
+    try:
+        for word in text.split():
+            if word == "fail":
+                raise RuntimeError("model error")
+            yield np.full(SAMPLE_RATE // 10, 0.1, dtype=np.float32)
+            await asyncio.sleep(0)
+    finally:
+        stop_event.set()
+
+
+def make_manager(tmp_path, **kwargs) -> BatchJobManager:
+    queue = RequestQueue(concurrency=1, rate_per_min=None)
+    return BatchJobManager(fake_stream, queue, str(tmp_path), SAMPLE_RATE, **kwargs)
+
+
+async def wait_done(job) -> None:
+    while not job.done:
+        await asyncio.sleep(0.01)
+
+
+def test_job_writes_every_item_and_reports_throughput(tmp_path):
+    async def run():
+        manager = make_manager(tmp_path, concurrency=2)
+        job = manager.submit([("one two", {"voice_key": "b"}), ("three", {"voice_key": "a"}), ("fail", {"voice_key": "a"})])
+        lines = [json.loads(line) async for line in manager.results(job)]
+        return job, lines, manager
+
+    job, lines, manager = asyncio.run(run())
+    assert job.status == "completed"
+    assert [item.status for item in job.items] == ["done", "done", "failed"]
+    assert job.items[2].error == "RuntimeError: model error"
+    audio, rate = sf.read(job.items[0].path)
+    assert rate == SAMPLE_RATE and audio.size == 2 * SAMPLE_RATE // 10
+    assert job.items[0].audio_sec == 0.2
+
+    stats = lines[-1]["job"]
+    assert (stats["done"], stats["failed"], stats["audio_sec"]) == (2, 1, 0.3)
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2]
+    assert [line["url"] is None for line in sorted(lines[:-1], key=lambda line: line["index"])] == [False, False, True]
+    assert manager.request_queue.stats()["active"] == 0
+
+
+def test_items_after_the_first_are_not_seen_as_stopped(tmp_path):
+    async def run():
+        manager = make_manager(tmp_path)
+        job = manager.submit([("one", {}), ("two words", {}), ("three more words", {})])
+        await wait_done(job)
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "completed"
+    assert [item.status for item in job.items] == ["done", "done", "done"]
+    assert [sf.read(item.path)[0].size for item in job.items] == [n * SAMPLE_RATE // 10 for n in (1, 2, 3)]
+    assert not job.stop_event.is_set() and job.item_stops == {}
+
+
+def test_item_stopped_mid_stream_is_cancelled_and_not_saved(tmp_path):
+    async def run():
+        manager = make_manager(tmp_path)
+        job = None
+
+        async def stop_job_mid_stream(text, log_callback, stop_event, **params):
+            async for chunk in fake_stream(text, log_callback, stop_event, **params):
+                yield chunk
+                job.stop_event.set()
+
+        manager.open_stream = stop_job_mid_stream
+        job = manager.submit([("one two", {})])
+        await wait_done(job)
+        return job
+
+    job = asyncio.run(run())
+    item = job.items[0]
+    assert item.status == "cancelled"
+    assert item.path is None and item.audio_sec == 0.0
+    assert list(job.output_dir.iterdir()) == []
+
+
+def test_cancel_marks_unfinished_items(tmp_path):
+    async def run():
+        manager = make_manager(tmp_path)
+        job = manager.submit([(" ".join(["word"] * 1000), {}), ("two", {})])
+        await asyncio.sleep(0.01)
+        running_stops = list(job.item_stops.values())
+        manager.cancel(job.id)
+        # The running item's stream is told to stop as well as its task being cancelled.
+        assert len(running_stops) == 1 and running_stops[0].is_set()
+        await wait_done(job)
+        return job, manager
+
+    job, manager = asyncio.run(run())
+    assert job.status == "cancelled"
+    assert [item.status for item in job.items] == ["cancelled", "cancelled"]
+    assert manager.request_queue.stats()["active"] == 0
@@ -0,0 +1,185 @@
+import asyncio
+import json
+
+import pytest
+
+from web.framing import FRAME_AUDIO, FRAME_EVENTS, FRAME_HEADER, FRAMING_VERSION, CoalescingPolicy, FrameWriter
+
+SOURCE_RATE = 24000
+
+
+class FakeWebSocket:
+    def __init__(self, query_params=None) -> None:
+        self.query_params = query_params or {}
+        self.messages = []
+
+    async def send_bytes(self, data) -> None:
+        # The writer reuses its frame buffer, so keep a copy as the socket would.
+        self.messages.append(bytes(data))
+
+    async def send_text(self, data: str) -> None:
+        self.messages.append(data)
+
+
+def parse(frame: bytes):
+    version, frame_type, stream_id, sequence, offset, timestamp = FRAME_HEADER.unpack_from(frame)
+    assert version == FRAMING_VERSION
+    return frame_type, stream_id, sequence, offset, timestamp, frame[FRAME_HEADER.size:]
+
+
+def test_header_layout():
+    assert FRAME_HEADER.size == 20
+    header = FRAME_HEADER.pack(FRAMING_VERSION, FRAME_AUDIO, 2, 7, 3200, 1.5)
+    assert header[:2] == bytes([FRAMING_VERSION, FRAME_AUDIO])
+    assert int.from_bytes(header[2:4], "little") == 2
+    assert int.from_bytes(header[4:8], "little") == 7
+    assert int.from_bytes(header[8:12], "little") == 3200
+
+
+def test_framed_round_trip():
+    async def run():
+        ws = FakeWebSocket({"framing": "binary"})
+        writer = FrameWriter.for_connection(ws)
+        writer.set_rates(SOURCE_RATE, 8000)
+        writer.log("stream_started", text="hi")
+        await writer.flush_events(force=True)
+        payloads = [bytes([i]) * (400 + i) for i in range(3)]
+        for stream in range(2):
+            assert writer.begin_stream() == stream + 1
+            for payload in payloads:
+                await writer.send_audio(payload, 1200)
+            await writer.end_stream()
+        writer.log("done")
+        await writer.stop()
+        return writer, payloads, ws.messages
+
+    writer, payloads, messages = asyncio.run(run())
+    frames = [parse(message) for message in messages]
+    assert [frame[2] for frame in frames] == list(range(len(frames)))
+    assert [frame[0] for frame in frames] == [FRAME_EVENTS] + [FRAME_AUDIO] * 6 + [FRAME_EVENTS]
+
+    events = json.loads(frames[0][5])
+    assert [event["event"] for event in events] == ["framing", "stream_started"]
+    assert events[0]["data"]["header"] == FRAME_HEADER.format
+    assert events[1]["data"] == {"text": "hi"}
+    assert json.loads(frames[-1][5])[0]["event"] == "done"
+
+    audio = frames[1:-1]
+    assert [frame[1] for frame in audio] == [1, 1, 1, 2, 2, 2]
+    # Offsets count samples at the negotiated rate: 1200 source samples are 400 at 8 kHz.
+    assert [frame[3] for frame in audio] == [0, 400, 800] * 2
+    assert [frame[5] for frame in audio] == payloads * 2
+    timestamps = [frame[4] for frame in frames]
+    assert timestamps == sorted(timestamps) and timestamps[0] >= 0.0
+    assert writer.stream_stats()["audio_frames"] == 3
+
+
+def test_unframed_messages():
+    async def run():
+        ws = FakeWebSocket()
+        writer = FrameWriter.for_connection(ws)
+        writer.set_rates(SOURCE_RATE, SOURCE_RATE)
+        writer.begin_stream()
+        await writer.send_audio(b"\x01\x02", 1)
+        writer.log("first", n=1)
+        writer.log("second")
+        await writer.flush_events()
+        return ws.messages
+
+    audio, first, second = asyncio.run(run())
+    assert audio == b"\x01\x02"
+    assert json.loads(first)["type"] == "log"
+    assert (json.loads(first)["event"], json.loads(first)["data"]) == ("first", {"n": 1})
+    assert json.loads(second)["event"] == "second"
+
+
+def test_policy_for_params():
+    policy = CoalescingPolicy(target_ms=0, max_bytes=1000)
+    assert not policy.enabled
+    assert policy.for_params({}) is policy
+    assert policy.for_params({"coalesce_ms": "fast"}) is policy
+    override = policy.for_params({"coalesce_ms": "250"})
+    assert override.enabled and override.target_ms == 250.0 and override.max_bytes == 1000
+    assert policy.for_params({"coalesce_ms": "99999"}).target_ms == CoalescingPolicy.MAX_TARGET_MS
+    assert not policy.for_params({"coalesce_ms": "-5"}).enabled
+
+
+def coalescing_writer(target_ms: float, **kwargs):
+    ws = FakeWebSocket()
+    frames = []
+    writer = FrameWriter(
+        ws, framed=False, coalescing=CoalescingPolicy(target_ms, **kwargs),
+        on_frame=lambda chunks, audio_sec, holds: frames.append((chunks, round(audio_sec, 3))),
+    )
+    writer.set_rates(SOURCE_RATE, SOURCE_RATE)
+    writer.begin_stream()
+    return writer, ws.messages, frames
+
+
+# 100 ms chunks, after a first chunk of one second that gives the client a lead.
+CHUNK = SOURCE_RATE // 10
+
+
+def test_coalescing_holds_chunks_until_target():
+    async def run():
+        writer, messages, frames = coalescing_writer(300)
+        await writer.send_audio(b"a" * 10, SOURCE_RATE)
+        # The first chunk of a stream is never held.
+        assert len(messages) == 1
+        for _ in range(3):
+            await writer.send_audio(b"b", CHUNK)
+        assert len(messages) == 2
+        await writer.send_audio(b"c", CHUNK)
+        await writer.end_stream()
+        return messages, frames, writer.stream_stats()
+
+    messages, frames, stats = asyncio.run(run())
+    assert messages == [b"a" * 10, b"bbb", b"c"]
+    assert frames == [(1, 1.0), (3, 0.3), (1, 0.1)]
+    assert stats["audio_frames"] == 3 and stats["audio_chunks"] == 5
+
+
+def test_coalescing_disabled_or_over_max_bytes_sends_at_once():
+    async def run():
+        writer, messages, _ = coalescing_writer(0)
+        for _ in range(3):
+            await writer.send_audio(b"x", CHUNK)
+        bounded, bounded_messages, _ = coalescing_writer(2000, max_bytes=4)
+        await bounded.send_audio(b"a", SOURCE_RATE)
+        await bounded.send_audio(b"bb", CHUNK)
+        await bounded.send_audio(b"cc", CHUNK)
+        return messages, bounded_messages
+
+    messages, bounded_messages = asyncio.run(run())
+    assert messages == [b"x"] * 3
+    assert bounded_messages == [b"a", b"bbcc"]
+
+
+@pytest.mark.parametrize("buffered_ms, sent_at_once", [(50, True), (160, False)])
+def test_coalescing_respects_the_client_buffer(buffered_ms, sent_at_once):
+    async def run():
+        writer, messages, _ = coalescing_writer(1000, safety_ms=100)
+        await writer.send_audio(b"a", SOURCE_RATE)
+        writer.feedback(buffered_ms=buffered_ms, rtt_ms=0)
+        await writer.send_audio(b"b", CHUNK)
+        at_once = len(messages) == 2
+        # Otherwise the deadline (buffer - safety, 60 ms) sends it without another chunk.
+        await asyncio.sleep(0.2)
+        return at_once, messages
+
+    at_once, messages = asyncio.run(run())
+    assert at_once == sent_at_once
+    assert messages == [b"a", b"b"]
+
+
+def test_discarded_audio_is_not_sent():
+    async def run():
+        writer, messages, _ = coalescing_writer(1000)
+        await writer.send_audio(b"a", SOURCE_RATE)
+        await writer.send_audio(b"b", CHUNK)
+        writer.discard_audio()
+        await writer.end_stream()
+        await asyncio.sleep(0.05)
+        return messages
+
+    assert asyncio.run(run()) == [b"a"]
@@ -0,0 +1,98 @@
+import pickle
+
+import pytest
+
+from web.metrics import MetricsRegistry, TTSMetrics
+
+
+def test_render_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests by outcome.", ("outcome",))
+    active = registry.gauge("active", "Active streams.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.5, 0.1, 1.0))
+    requests.inc(outcome="ok")
+    requests.inc(2, outcome='bad "quote"\n')
+    active.inc()
+    active.inc()
+    active.dec()
+    latency.observe(0.1)
+    latency.observe(0.75, count=2)
+    latency.observe(5.0)
+
+    assert registry.render() == "\n".join([
+        "# HELP requests_total Requests by outcome.",
+        "# TYPE requests_total counter",
+        'requests_total{outcome="bad \\"quote\\"\\n"} 2',
+        'requests_total{outcome="ok"} 1',
+        "# HELP active Active streams.",
+        "# TYPE active gauge",
+        "active 1",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        # Buckets are sorted and cumulative; a value on a bound counts in that bucket (`le`).
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="0.5"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 6.6",
+        "latency_seconds_count 4",
+    ]) + "\n"
+
+
+def test_labels_must_match():
+    registry = MetricsRegistry()
+    counter = registry.counter("streams", "Streams.", ("outcome",))
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(outcome="ok", extra="x")
+    with pytest.raises(ValueError):
+        registry.gauge("streams", "Registered twice.")
+
+
+def test_drain_and_merge_ship_increments_between_registries():
+    worker, server = TTSMetrics(), TTSMetrics()
+    server.streams.inc(outcome="completed")
+    server.queue_wait.observe(0.2)
+
+    worker.streams.inc(outcome="completed")
+    worker.streams.inc(outcome="error")
+    worker.observe_stage("diffusion", 0.03, tokens=3)
+    worker.active_streams.set(5)
+    drained = pickle.loads(pickle.dumps(worker.registry.drain()))
+    # Gauges stay behind; drained counters and histograms start again from zero.
+    assert set(drained) == {"tts_streams", "tts_token_stage_seconds"}
+    assert worker.streams.value(outcome="completed") == 0
+    assert worker.token_time.count(stage="diffusion") == 0
+    assert worker.registry.drain() == {}
+
+    server.registry.merge(drained)
+    server.registry.merge(drained)
+    assert server.streams.value(outcome="completed") == 3
+    assert server.streams.value(outcome="error") == 2
+    assert server.token_time.count(stage="diffusion") == 6
+    assert server.token_time.sum(stage="diffusion") == pytest.approx(0.06)
+    assert server.queue_wait.count() == 1
+    assert server.active_streams.value() == 0
+
+
+def test_tts_metrics_render():
+    metrics = TTSMetrics()
+    metrics.voice_cache.inc(3, result="hit")
+    metrics.voice_cache.inc(result="miss")
+    metrics.observe_stage("lm", 0.0, tokens=0)
+    metrics.observe_audio_frame(chunks=2, audio_sec=0.266, hold_secs=[0.01, 0.0])
+    metrics.record_warmup([
+        {"run": "cold", "first_chunk_sec": 1.5},
+        {"run": "warm", "first_chunk_sec": None},
+        {"run": "repeat", "first_chunk_sec": 0.2},
+    ])
+
+    text = metrics.render()
+    assert "tts_voice_cache_hit_ratio 0.75\n" in text
+    assert "tts_token_stage_seconds_count" not in text
+    assert "tts_audio_frames_total 1\n" in text
+    assert "tts_audio_chunks_total 2\n" in text
+    assert "tts_coalesce_hold_seconds_count 2\n" in text
+    assert 'tts_warmup_first_chunk_seconds_count{run="cold"} 1\n' in text
+    assert 'run="warm"' not in text and 'run="repeat"' not in text
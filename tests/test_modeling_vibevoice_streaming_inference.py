@@ -0,0 +1,201 @@
+import pytest
+import torch
+
+from vibevoice.modular.modeling_vibevoice_streaming_inference import (
+    TTS_SPEECH_WINDOW_SIZE,
+    TTS_TEXT_WINDOW_SIZE,
+    AdaptiveTTSWindowPolicy,
+    TTSWindowPolicy,
+    TTSWindowState,
+    _LazyEOSChecks,
+    _evict_kv_window,
+    clone_prefilled_outputs,
+)
+from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+from vibevoice.processor.vibevoice_tokenizer_processor import VibeVoiceTokenizerProcessor
+from vibevoice.scripts.tiny_model import build_tiny_model, build_tiny_tokenizer, make_voice_preset, tiny_streaming_config
+
+
+def window_state(window_index=1, text_window_size=0, generated_audio_samples=0, elapsed_sec=0.0):
+    return TTSWindowState(
+        window_index=window_index,
+        text_window_size=text_window_size,
+        prefilled_text_tokens=0,
+        remaining_text_tokens=100,
+        generated_speech_tokens=0,
+        generated_audio_samples=generated_audio_samples,
+        elapsed_sec=elapsed_sec,
+    )
+
+
+def test_fixed_policy_defaults_to_trained_windows():
+    policy = TTSWindowPolicy()
+    for index in range(3):
+        state = window_state(window_index=index, text_window_size=TTS_TEXT_WINDOW_SIZE)
+        assert policy.text_window_size(state) == TTS_TEXT_WINDOW_SIZE
+        assert policy.speech_window_size(state) == TTS_SPEECH_WINDOW_SIZE
+
+
+@pytest.mark.parametrize("sizes", [(0, 6), (5, 0), (-1, 6)])
+def test_fixed_policy_rejects_non_positive_sizes(sizes):
+    with pytest.raises(ValueError):
+        TTSWindowPolicy(*sizes)
+
+
+def test_adaptive_policy_starts_small_then_grows_with_lead():
+    policy = AdaptiveTTSWindowPolicy(first_text_window_size=2, text_window_size=5, max_text_window_size=10, target_lead_sec=2.0)
+    assert policy.text_window_size(window_state(window_index=0)) == 2
+    # Behind real time: default window.
+    assert policy.text_window_size(window_state(generated_audio_samples=24000, elapsed_sec=3.0)) == 5
+    # 60% of the target lead: 60% of the way to the largest window.
+    assert policy.text_window_size(window_state(generated_audio_samples=52800, elapsed_sec=1.0)) == 8
+    # Beyond the target lead: capped.
+    assert policy.text_window_size(window_state(generated_audio_samples=240000, elapsed_sec=1.0)) == 10
+
+
+def test_adaptive_policy_keeps_speech_text_ratio():
+    policy = AdaptiveTTSWindowPolicy()
+    ratio = TTS_SPEECH_WINDOW_SIZE / TTS_TEXT_WINDOW_SIZE
+    for text_window in (1, 2, 5, 10):
+        assert policy.speech_window_size(window_state(text_window_size=text_window)) == max(1, round(text_window * ratio))
+    # Text exhausted: default speech window until EOS.
+    assert policy.speech_window_size(window_state(text_window_size=0)) == TTS_SPEECH_WINDOW_SIZE
+
+
+def test_adaptive_policy_rejects_inconsistent_sizes():
+    with pytest.raises(ValueError):
+        AdaptiveTTSWindowPolicy(first_text_window_size=0)
+    with pytest.raises(ValueError):
+        AdaptiveTTSWindowPolicy(text_window_size=8, max_text_window_size=6)
+
+
+def test_lazy_eos_checks_release_items_in_order_until_eos():
+    checks = _LazyEOSChecks(check_interval=8)
+    # Nothing outstanding: items go out right away.
+    assert checks.hold("chunk0") is False
+    checks.add_flag(torch.tensor(False))
+    assert checks.hold("chunk1") is True
+    checks.add_flag(torch.tensor(False))
+    assert checks.hold("chunk2") is True
+    checks.add_flag(torch.tensor(True))
+    assert checks.hold("chunk3") is True
+    checks.add_flag(torch.tensor(False))
+
+    released, eos, dropped = checks.poll()
+    # chunk1 and chunk2 were produced before the EOS flag; chunk3 came after it.
+    assert released == ["chunk1", "chunk2"]
+    assert eos is True
+    assert dropped == 1
+    assert not checks.flags and not checks.held
+
+
+def test_lazy_eos_checks_without_eos():
+    checks = _LazyEOSChecks()
+    assert checks.check_interval == 1
+    checks.add_flag(torch.tensor(False))
+    checks.hold("chunk")
+    assert checks.poll() == (["chunk"], False, 0)
+    assert checks.poll(block=True) == ([], False, 0)
+
+
+@torch.no_grad()
+def test_kv_eviction_matches_fresh_prefill_of_kept_tokens():
+    # With a single layer, cached keys and values depend only on each token and its position, so
+    # evicting and re-rotating must give the cache a fresh prefill of the kept tokens would build.
+    model = build_tiny_model(tiny_streaming_config(lm_layers=1), seed=0)
+    assert model.model.language_model.config.num_hidden_layers == 1
+    sink, window, total = 8, 16, 40
+    generator = torch.Generator().manual_seed(0)
+    input_ids = torch.randint(0, 256, (1, total), generator=generator)
+    next_id = torch.randint(0, 256, (1, 1), generator=generator)
+
+    outputs = model.forward_lm(input_ids=input_ids, use_cache=True, return_dict=True)
+    model_kwargs = {
+        "past_key_values": outputs.past_key_values,
+        "attention_mask": torch.ones(1, total, dtype=torch.long),
+        "cache_position": torch.tensor([total]),
+    }
+    kept_ids = _evict_kv_window(model_kwargs, input_ids, sink, sink, window, model.model.language_model.rotary_emb)
+
+    kept = window - window // 4
+    num_evict = total - sink - kept
+    assert torch.equal(kept_ids, torch.cat([input_ids[:, :sink], input_ids[:, sink + num_evict:]], dim=-1))
+    assert model_kwargs["past_key_values"].get_seq_length() == sink + kept
+    assert model_kwargs["attention_mask"].shape[1] == sink + kept
+    assert model_kwargs["cache_position"].tolist() == [sink + kept]
+
+    step = model.forward_lm(
+        input_ids=next_id,
+        past_key_values=model_kwargs["past_key_values"],
+        attention_mask=torch.cat([model_kwargs["attention_mask"], torch.ones(1, 1, dtype=torch.long)], dim=-1),
+        cache_position=model_kwargs["cache_position"],
+        use_cache=True,
+        return_dict=True,
+    )
+    fresh = model.forward_lm(input_ids=torch.cat([kept_ids, next_id], dim=-1), use_cache=False, return_dict=True)
+    torch.testing.assert_close(step.last_hidden_state[:, -1], fresh.last_hidden_state[:, -1], atol=1e-4, rtol=0)
+
+
+def test_kv_eviction_is_a_no_op_within_the_window():
+    model = build_tiny_model(tiny_streaming_config(), seed=0)
+    input_ids = torch.randint(0, 256, (1, 20))
+    with torch.no_grad():
+        outputs = model.forward_lm(input_ids=input_ids, use_cache=True, return_dict=True)
+    model_kwargs = {
+        "past_key_values": outputs.past_key_values,
+        "attention_mask": torch.ones(1, 20, dtype=torch.long),
+        "cache_position": torch.tensor([20]),
+    }
+    assert _evict_kv_window(model_kwargs, input_ids, 8, 8, 12, model.model.language_model.rotary_emb) is input_ids
+    assert model_kwargs["past_key_values"].get_seq_length() == 20
+
+
+@torch.no_grad()
+def test_sample_speech_tokens_seeded_and_unseeded_noise():
+    model = build_tiny_model(tiny_streaming_config(), seed=0)
+    model.set_ddpm_inference_steps(num_steps=3)
+    hidden_size = model.config.decoder_config.hidden_size
+    condition, neg_condition = torch.randn(1, hidden_size), torch.randn(1, hidden_size)
+
+    def sample(generator):
+        return model.sample_speech_tokens(
+            condition, neg_condition, cfg_scale=1.5, generator=generator, noise_scheduler=model.make_noise_scheduler(),
+        )
+
+    first = sample(torch.Generator().manual_seed(3))
+    torch.testing.assert_close(first, sample(torch.Generator().manual_seed(3)), atol=0, rtol=0)
+    assert not torch.equal(first, sample(torch.Generator().manual_seed(4)))
+    unseeded = sample(None)
+    assert unseeded.shape == first.shape and unseeded.dtype == condition.dtype
+
+
+@torch.no_grad()
+def test_generate_leaves_a_cloned_preset_intact():
+    model = build_tiny_model(tiny_streaming_config(), seed=0)
+    model.set_ddpm_inference_steps(num_steps=2)
+    processor = VibeVoiceStreamingProcessor(
+        tokenizer=build_tiny_tokenizer(), audio_processor=VibeVoiceTokenizerProcessor(), speech_tok_compress_ratio=3200,
+    )
+    preset = make_voice_preset(model, processor.tokenizer, prompt_tokens=8, speech_frames=4)
+    snapshot = {
+        name: [tensor.clone() for tensor in output.past_key_values.key_cache + output.past_key_values.value_cache]
+        for name, output in preset.items()
+    }
+    inputs = processor.process_input_with_cached_prompt(
+        text="Hello there.", cached_prompt=preset, padding=True, return_tensors="pt", return_attention_mask=True,
+    )
+    cloned = clone_prefilled_outputs(preset)
+    model.generate(
+        **inputs,
+        max_new_tokens=6,
+        cfg_scale=1.5,
+        tokenizer=processor.tokenizer,
+        generation_config={"do_sample": False},
+        show_progress_bar=False,
+        all_prefilled_outputs=cloned,
+    )
+    for name, output in preset.items():
+        cache = output.past_key_values
+        assert cloned[name].past_key_values is not cache
+        for before, after in zip(snapshot[name], cache.key_cache + cache.value_cache):
+            assert torch.equal(before, after)
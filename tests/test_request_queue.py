@@ -0,0 +1,273 @@
+import asyncio
+
+import pytest
+
+from web.request_queue import QueueFullError, RateLimitedError, RequestQueue, TokenBucket
+
+
+async def wait_until(condition, max_ticks: int = 100) -> None:
+    for _ in range(max_ticks):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+async def enqueue(queue: RequestQueue, requests, admitted, **kwargs):
+    """Start one waiting `acquire` per (client_id, name), in order; admitted names are appended to `admitted`."""
+    async def acquire(client_id, name):
+        await queue.acquire(client_id, **kwargs)
+        admitted.append(name)
+
+    tasks = []
+    for client_id, name in requests:
+        tasks.append(asyncio.create_task(acquire(client_id, name)))
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=1.0, burst=2.0)
+    now = bucket.updated
+    assert bucket.try_acquire(now) == 0.0
+    assert bucket.try_acquire(now) == 0.0
+    assert bucket.try_acquire(now) == pytest.approx(1.0)
+    assert bucket.try_acquire(now + 0.5) == pytest.approx(0.5)
+    assert bucket.try_acquire(now + 1.0) == 0.0
+    # Idle time never adds more than `burst` tokens.
+    assert bucket.try_acquire(now + 100.0) == 0.0
+    assert bucket.tokens == pytest.approx(1.0)
+
+
+def test_round_robin_across_clients_fifo_within_client():
+    async def run():
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        await queue.acquire("holder")
+        admitted = []
+        requests = [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2"), ("c", "c1")]
+        tasks = await enqueue(queue, requests, admitted)
+        assert queue.waiting == 6
+        for count in range(1, len(requests) + 1):
+            queue.release()
+            await wait_until(lambda: len(admitted) == count)
+        queue.release()
+        await asyncio.gather(*tasks)
+        return admitted, queue.stats()
+
+    admitted, stats = asyncio.run(run())
+    assert admitted == ["a1", "b1", "c1", "a2", "b2", "a3"]
+    assert (stats["active"], stats["waiting"], stats["admitted"]) == (0, 0, 7)
+
+
+def test_position_counts_round_robin_turns():
+    async def run():
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        await queue.acquire("holder")
+        tasks = await enqueue(queue, [("a", "a1"), ("a", "a2"), ("b", "b1")], [])
+        clients = queue._classes["interactive"]
+        positions = {
+            "a1": queue.position(clients["a"][0]),
+            "a2": queue.position(clients["a"][1]),
+            "b1": queue.position(clients["b"][0]),
+        }
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return positions
+
+    # b1 goes before a2: one admission per client per round.
+    assert asyncio.run(run()) == {"a1": 0, "a2": 2, "b1": 1}
+
+
+def test_rate_limit_per_client():
+    async def run():
+        queue = RequestQueue(concurrency=4, rate_per_min=60.0, burst=1.0)
+        await queue.acquire("a")
+        with pytest.raises(RateLimitedError) as error:
+            await queue.acquire("a")
+        assert 0.0 < error.value.retry_after <= 1.0
+        await queue.acquire("b")
+        await queue.acquire("a", check_rate=False)
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["active"], stats["rate_limited"]) == (3, 1)
+
+
+def test_refuses_beyond_max_depth_and_max_wait():
+    async def run():
+        queue = RequestQueue(concurrency=1, max_depth=1, rate_per_min=None)
+        await queue.acquire("holder")
+        tasks = await enqueue(queue, [("a", "a1")], [])
+        with pytest.raises(QueueFullError):
+            await queue.acquire("b")
+
+        slow = RequestQueue(concurrency=1, rate_per_min=None, max_wait_sec=5.0, initial_service_sec=10.0)
+        await slow.acquire("holder")
+        with pytest.raises(QueueFullError):
+            await slow.acquire("a")
+        assert slow.waiting == 0
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return queue.stats(), slow.stats()
+
+    stats, slow_stats = asyncio.run(run())
+    assert (stats["rejected"], slow_stats["rejected"]) == (1, 1)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        await queue.acquire("holder")
+        admitted = []
+        tasks = await enqueue(queue, [("a", "a1"), ("b", "b1")], admitted)
+        tasks[0].cancel()
+        await asyncio.gather(tasks[0], return_exceptions=True)
+        assert queue.waiting == 1
+        queue.release()
+        await tasks[1]
+        queue.release()
+        return admitted, queue.stats()
+
+    admitted, stats = asyncio.run(run())
+    assert admitted == ["b1"]
+    assert (stats["active"], stats["waiting"], stats["cancelled"]) == (0, 0, 1)
+
+
+def test_service_time_estimate_follows_releases():
+    queue = RequestQueue(concurrency=2, rate_per_min=None, initial_service_sec=10.0)
+    asyncio.run(queue.acquire("a"))
+    queue.release(service_sec=5.0)
+    assert queue.avg_service_sec == pytest.approx(9.0)
+    # Positions 0 and 1 share the first round of two slots.
+    assert queue.estimate_wait(1) == pytest.approx(9.0)
+    assert queue.estimate_wait(2) == pytest.approx(18.0)
+
+
+class FakePreemption:
+    """Preemption handle whose generation parks only when the test calls `park`."""
+
+    def __init__(self) -> None:
+        self.callback = None
+        self.resumes = 0
+
+    def request_suspend(self, callback) -> None:
+        self.callback = callback
+
+    def resume(self) -> None:
+        self.resumes += 1
+
+    async def park(self) -> None:
+        # The generation thread reaches a window boundary and reports the suspension.
+        self.callback()
+        await asyncio.sleep(0)
+
+
+def test_priority_arguments_are_checked():
+    async def run():
+        queue = RequestQueue(rate_per_min=None)
+        with pytest.raises(ValueError):
+            await queue.acquire("a", priority="urgent")
+        with pytest.raises(ValueError):
+            await queue.acquire("a", preemption=FakePreemption())
+
+    asyncio.run(run())
+
+
+def test_interactive_requests_are_admitted_before_batch_work():
+    async def run():
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        await queue.acquire("holder")
+        admitted = []
+        tasks = await enqueue(queue, [("job", "b1")], admitted, check_rate=False, priority="batch")
+        tasks += await enqueue(queue, [("a", "i1")], admitted)
+        assert queue.position(queue._classes["batch"]["job"][0]) == 1
+        for count in (1, 2):
+            queue.release()
+            await wait_until(lambda: len(admitted) == count)
+        queue.release()
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert asyncio.run(run()) == ["i1", "b1"]
+
+
+def test_interactive_request_suspends_running_batch_work():
+    async def run():
+        resumed = []
+        queue = RequestQueue(concurrency=2, rate_per_min=None, on_resume=resumed.append)
+        first, latest = FakePreemption(), FakePreemption()
+        await queue.acquire("job", check_rate=False, priority="batch", preemption=first)
+        await queue.acquire("job", check_rate=False, priority="batch", preemption=latest)
+        admitted = []
+        tasks = await enqueue(queue, [("other-job", "b2")], admitted, check_rate=False, priority="batch")
+        assert latest.callback is None
+        tasks += await enqueue(queue, [("a", "i1")], admitted)
+        # Only the most recently admitted batch request is asked to suspend; the interactive one waits until it parks.
+        assert latest.callback is not None and first.callback is None
+        assert admitted == []
+
+        await latest.park()
+        await wait_until(lambda: admitted == ["i1"])
+        suspended = queue.stats()
+        # The slot goes back to the suspended request, ahead of batch work that has not started.
+        queue.release()
+        await asyncio.sleep(0)
+        assert (latest.resumes, len(resumed), admitted) == (1, 1, ["i1"])
+        queue.release(preemption=first)
+        await wait_until(lambda: admitted == ["i1", "b2"])
+        queue.release(preemption=latest)
+        queue.release()
+        await asyncio.gather(*tasks)
+        return suspended, queue.stats()
+
+    suspended, stats = asyncio.run(run())
+    assert (suspended["active"], suspended["suspended"], suspended["waiting_by_priority"]["batch"]) == (2, 1, 2)
+    assert (stats["preempted"], stats["resumed"], stats["active"], stats["waiting"]) == (1, 1, 0, 0)
+
+
+def test_cancelled_interactive_request_calls_off_the_suspension():
+    async def run():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        preemption = FakePreemption()
+        await queue.acquire("job", check_rate=False, priority="batch", preemption=preemption)
+        tasks = await enqueue(queue, [("a", "i1")], [])
+        assert preemption.callback is not None
+        tasks[0].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert preemption.resumes == 1
+        # The generation parked before it saw the resume: it keeps its slot.
+        await preemption.park()
+        stats = queue.stats()
+        queue.release(preemption=preemption)
+        return errors, stats, queue.stats()
+
+    errors, stats, released = asyncio.run(run())
+    assert errors == []
+    assert (stats["active"], stats["waiting"], stats["preempted"], stats["suspended"]) == (1, 0, 0, 0)
+    assert released["active"] == 0
+
+
+def test_release_while_suspended_frees_no_slot():
+    async def run():
+        queue = RequestQueue(concurrency=1, rate_per_min=None)
+        preemption = FakePreemption()
+        await queue.acquire("job", check_rate=False, priority="batch", preemption=preemption)
+        admitted = []
+        tasks = await enqueue(queue, [("a", "i1")], admitted)
+        await preemption.park()
+        await wait_until(lambda: admitted == ["i1"])
+        # The batch item is stopped while parked: it gives up its place in the queue, not a slot.
+        queue.release(preemption=preemption)
+        stats = queue.stats()
+        queue.release()
+        await asyncio.gather(*tasks)
+        return preemption, stats, queue.stats()
+
+    preemption, stats, released = asyncio.run(run())
+    assert preemption.resumes == 0
+    assert (stats["active"], stats["waiting"], stats["suspended"]) == (1, 0, 0)
+    assert (released["active"], released["resumed"]) == (0, 0)
@@ -0,0 +1,209 @@
+import asyncio
+import random
+import re
+import threading
+
+import pytest
+import torch
+
+from vibevoice.modular.modular_vibevoice_text_tokenizer import VibeVoiceTextTokenizerFast
+from vibevoice.modular.streamer import AsyncAudioStreamer, AudioStreamer, TextInputStreamer
+
+
+def chunk(value: float, samples: int = 4) -> torch.Tensor:
+    return torch.full((1, samples), value)
+
+
+def put(streamer: AudioStreamer, idx: int, value: float):
+    streamer.put(chunk(value), torch.tensor([idx]))
+
+
+def values(batch: dict) -> dict:
+    return {idx: tensor[0].item() for idx, tensor in batch.items()}
+
+
+def test_batch_iterator_serves_samples_in_ready_order():
+    streamer = AudioStreamer(batch_size=2, timeout=1.0)
+    iterator = iter(streamer)
+    put(streamer, 1, 1.0)
+    put(streamer, 1, 2.0)
+    put(streamer, 0, 3.0)
+
+    batch = next(iterator)
+    # One chunk per sample, first-ready sample first; sample 1's second chunk waits for the next step.
+    assert list(batch) == [1, 0]
+    assert values(batch) == {1: 1.0, 0: 3.0}
+    assert values(next(iterator)) == {1: 2.0}
+
+    streamer.end()
+    assert list(iterator) == []
+    assert streamer.buffered_samples == [0, 0]
+
+
+def test_batch_iterator_tags_values_queued_before_iteration():
+    streamer = AudioStreamer(batch_size=3, timeout=1.0)
+    put(streamer, 2, 1.0)
+    put(streamer, 0, 2.0)
+    streamer.end(torch.tensor([1]))
+
+    iterator = iter(streamer)
+    assert values(next(iterator)) == {0: 2.0, 2: 1.0}
+    assert iterator.active_samples == {0, 2}
+    streamer.end()
+    assert list(iterator) == []
+
+
+def test_batch_iterator_keeps_serving_after_a_sample_ends():
+    streamer = AudioStreamer(batch_size=2, timeout=1.0)
+    iterator = iter(streamer)
+    put(streamer, 0, 1.0)
+    streamer.end(torch.tensor([0]))
+    put(streamer, 1, 2.0)
+    put(streamer, 1, 3.0)
+    streamer.end(torch.tensor([1]))
+
+    assert [values(batch) for batch in iterator] == [{0: 1.0, 1: 2.0}, {1: 3.0}]
+
+
+def test_batch_iterator_wakes_on_a_producer_thread():
+    streamer = AudioStreamer(batch_size=2, timeout=5.0)
+    iterator = iter(streamer)
+
+    def produce():
+        for step in range(3):
+            put(streamer, step % 2, float(step))
+        streamer.end()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    received = [(idx, value) for batch in iterator for idx, value in values(batch).items()]
+    producer.join()
+    # Per-sample order is kept whatever the interleaving.
+    assert [value for idx, value in received if idx == 0] == [0.0, 2.0]
+    assert [value for idx, value in received if idx == 1] == [1.0]
+
+
+def test_async_batch_iterator_serves_samples_in_ready_order():
+    async def run():
+        streamer = AsyncAudioStreamer(batch_size=2, timeout=1.0)
+        iterator = streamer.__aiter__()
+        put(streamer, 1, 1.0)
+        put(streamer, 1, 2.0)
+        put(streamer, 0, 3.0)
+        # `put` hands the chunks to the loop with `call_soon_threadsafe`.
+        await asyncio.sleep(0)
+
+        batch = await iterator.__anext__()
+        assert list(batch) == [1, 0]
+        assert values(batch) == {1: 1.0, 0: 3.0}
+        assert values(await iterator.__anext__()) == {1: 2.0}
+
+        streamer.end()
+        assert [batch async for batch in iterator] == []
+        assert streamer.buffered_samples == [0, 0]
+
+    asyncio.run(run())
+
+
+def test_async_batch_iterator_tags_values_queued_before_iteration():
+    async def run():
+        streamer = AsyncAudioStreamer(batch_size=2, timeout=1.0)
+        put(streamer, 1, 1.0)
+        streamer.end(torch.tensor([0]))
+        await asyncio.sleep(0)
+
+        batches = []
+        iterator = streamer.__aiter__()
+        batches.append(values(await iterator.__anext__()))
+        streamer.end()
+        batches.extend([values(batch) async for batch in iterator])
+        assert batches == [{1: 1.0}]
+
+    asyncio.run(run())
+
+
+TEXTS = [
+    "Hello there, how can I help you today?",
+    "It's 3.14159 -- isn't it? Don't worry; we'll see... (maybe) \"quoted\" text!",
+    "  Leading and trailing spaces,   runs of  spaces\tand tabs.  ",
+    "Line one.\nLine two,\n\nline three: 42 items.",
+    "你好，世界。今天天气很好！VibeVoice 生成语音。",
+    "Café déjà vu — naïve coöperation, 100% sure; e-mail me at a@b.c.",
+]
+
+
+@pytest.fixture(scope="module")
+def tokenizer() -> VibeVoiceTextTokenizerFast:
+    """Byte-level BPE with the Qwen2 pre-tokenizer and merges learned from `TEXTS`, so tokens span several characters."""
+    from tokenizers import Regex, Tokenizer, decoders, models, normalizers, pre_tokenizers, trainers
+    from transformers.models.qwen2.tokenization_qwen2 import PRETOKENIZE_REGEX
+
+    backend = Tokenizer(models.BPE())
+    backend.normalizer = normalizers.NFC()
+    backend.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.Split(Regex(PRETOKENIZE_REGEX), behavior="isolated"),
+        pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+    ])
+    backend.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=600,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        special_tokens=["<|endoftext|>", "<|image_pad|>", "<|vision_start|>", "<|vision_end|>", "<|vision_pad|>"],
+    )
+    backend.train_from_iterator(TEXTS * 4, trainer=trainer)
+    return VibeVoiceTextTokenizerFast(tokenizer_object=backend)
+
+
+def stream_text(tokenizer, pieces) -> list:
+    streamer = TextInputStreamer(tokenizer)
+    for piece in pieces:
+        streamer.put(piece)
+    streamer.end()
+    token_ids, finished = streamer.token_ids()
+    assert finished
+    return token_ids
+
+
+def test_text_streamer_matches_tokenizing_the_full_text(tokenizer):
+    rng = random.Random(0)
+    for text in TEXTS:
+        expected = tokenizer.encode(text.strip() + "\n", add_special_tokens=False)
+        assert len(expected) < len(text.encode("utf-8"))
+        # Character by character, word by word, and random cuts.
+        assert stream_text(tokenizer, list(text)) == expected
+        assert stream_text(tokenizer, re.findall(r"\S+|\s+", text)) == expected
+        for _ in range(20):
+            cuts = sorted(rng.sample(range(len(text) + 1), rng.randint(1, 8)))
+            pieces = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+            assert stream_text(tokenizer, pieces) == expected, pieces
+
+
+@pytest.mark.parametrize(
+    "text, cut",
+    [
+        ("hello wor", 5),
+        ("hello  wor", 0),
+        ("one two ", 3),
+        ("ok, go", 3),
+        ("ok,", 0),
+        ("ok,!", 2),
+        ("你好，世界", 2),
+        ("a", 0),
+    ],
+)
+def test_stable_prefix_length(text, cut):
+    assert TextInputStreamer._stable_prefix_length(text) == cut
+
+
+def test_text_streamer_releases_complete_words_early(tokenizer):
+    streamer = TextInputStreamer(tokenizer)
+    streamer.put("  Hello wor")
+    token_ids, finished = streamer.token_ids()
+    assert not finished
+    assert token_ids == tokenizer.encode("Hello", add_special_tokens=False)
+    assert streamer.wait_for_tokens(len(token_ids) + 1, stop_check_fn=lambda: True, poll_interval=0.01) == (token_ids, False)
+
+    streamer.end()
+    assert streamer.wait_for_tokens(10**6)[0] == tokenizer.encode("Hello wor\n", add_special_tokens=False)
+    with pytest.raises(RuntimeError):
+        streamer.put("more")
@@ -0,0 +1,57 @@
+import numpy as np
+
+from web.synthesis_cache import SynthesisCache, normalize_text
+
+KEY_ARGS = dict(voice_hash="abc", cfg_scale=1.5, inference_steps=5, seed=7, model_revision="rev")
+
+
+def tone(seconds: float, sample_rate: int = 24000) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_key_is_stable_under_text_normalization():
+    key = SynthesisCache.make_key("Don’t  stop\nnow.", **KEY_ARGS)
+    assert key == SynthesisCache.make_key("Don't stop now.", **KEY_ARGS)
+    assert normalize_text("“Hi”\tthere ") == '"Hi" there'
+    # Case and every synthesis option are part of the key.
+    assert key != SynthesisCache.make_key("don't stop now.", **KEY_ARGS)
+    for name, value in [("seed", 8), ("cfg_scale", 1.3), ("inference_steps", 10), ("voice_hash", "abd"), ("model_revision", "r2")]:
+        assert key != SynthesisCache.make_key("Don't stop now.", **{**KEY_ARGS, name: value})
+    assert key != SynthesisCache.make_key("Don't stop now.", **KEY_ARGS, sampler="sde")
+
+
+def test_round_trip_and_hit_counters(tmp_path):
+    cache = SynthesisCache(str(tmp_path))
+    audio = tone(0.5)
+    assert cache.get("k") is None
+    cache.put("k", audio)
+    np.testing.assert_allclose(cache.get("k"), audio, atol=1 / 32767)
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    audio = tone(0.25)
+    cache = SynthesisCache(str(tmp_path), max_bytes=10 ** 9)
+    cache.put("a", audio)
+    entry_bytes = cache.stats()["bytes"]
+    cache.max_bytes = 2 * entry_bytes
+    cache.put("b", audio)
+    assert cache.get("a") is not None  # "a" is now the most recently used
+    cache.put("c", audio)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert sorted(path.stem for path in tmp_path.glob("*.wav")) == ["a", "c"]
+    assert cache.stats()["bytes"] == 2 * entry_bytes
+
+
+def test_reloads_entries_and_bound_from_disk(tmp_path):
+    audio = tone(0.25)
+    cache = SynthesisCache(str(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, audio)
+    entry_bytes = cache.stats()["bytes"] // 3
+    reopened = SynthesisCache(str(tmp_path), max_bytes=2 * entry_bytes)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get("c") is not None
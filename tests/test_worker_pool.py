@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from web.worker_pool import WorkerPool
+
+
+def test_start_fails_after_repeated_startup_crashes(tmp_path, monkeypatch):
+    # Replicas inherit the environment: fail at once instead of retrying downloads.
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+
+    async def run():
+        # Replicas exit while loading the model; each respawn must not leave `start` waiting on a dead replica.
+        pool = WorkerPool(
+            str(tmp_path / "missing-model"), num_workers=1, threads_per_worker=1, pin_cpus=False,
+            max_startup_failures=2, restart_backoff_sec=0.01,
+        )
+        try:
+            with pytest.raises(RuntimeError, match=r"worker 0 exited with code 1 during startup 2 times in a row"):
+                await asyncio.wait_for(pool.start(), timeout=60)
+        finally:
+            await pool.close()
+        return pool.stats()[0]
+
+    stats = asyncio.run(run())
+    assert (stats["startup_failures"], stats["restarts"], stats["exit_code"]) == (2, 1, 1)
+    assert not stats["ready"]
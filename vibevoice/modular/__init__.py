@@ -1,14 +1,29 @@
 # vibevoice/modular/__init__.py
-from .modeling_vibevoice_streaming_inference import VibeVoiceStreamingForConditionalGenerationInference
+from .modeling_vibevoice_streaming_inference import (
+    VibeVoiceStreamingForConditionalGenerationInference,
+    TTSWindowPolicy,
+    AdaptiveTTSWindowPolicy,
+    TTSWindowState,
+    GenerationRequest,
+    GenerationPreemption,
+    clone_prefilled_outputs,
+)
 from .configuration_vibevoice_streaming import VibeVoiceStreamingConfig
 from .modeling_vibevoice_streaming import VibeVoiceStreamingModel, VibeVoiceStreamingPreTrainedModel
-from .streamer import AudioStreamer, AsyncAudioStreamer
+from .streamer import AudioStreamer, AsyncAudioStreamer, TextInputStreamer
 
 __all__ = [
     "VibeVoiceStreamingForConditionalGenerationInference",
+    "TTSWindowPolicy",
+    "AdaptiveTTSWindowPolicy",
+    "TTSWindowState",
+    "GenerationRequest",
+    "GenerationPreemption",
+    "clone_prefilled_outputs",
     "VibeVoiceStreamingConfig",
     "VibeVoiceStreamingModel",
     "VibeVoiceStreamingPreTrainedModel",
     "AudioStreamer",
     "AsyncAudioStreamer",
+    "TextInputStreamer",
 ]
\ No newline at end of file
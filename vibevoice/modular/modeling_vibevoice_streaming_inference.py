@@ -1,3 +1,9 @@
+import copy
+import os
+import tempfile
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple, Union, Callable
 from tqdm import tqdm
@@ -11,6 +17,7 @@ from transformers.modeling_outputs import BaseModelOutputWithPast, ModelOutput
 from transformers import modeling_utils
 from transformers.modeling_utils import PreTrainedModel
 from transformers.modeling_flash_attention_utils import FlashAttentionKwargs
+from transformers.models.qwen2.modeling_qwen2 import rotate_half
 from transformers.utils import logging
 
 from .modular_vibevoice_tokenizer import VibeVoiceTokenizerStreamingCache
@@ -19,7 +26,7 @@ from vibevoice.schedule.dpm_solver import DPMSolverMultistepScheduler
 from .configuration_vibevoice_streaming import VibeVoiceStreamingConfig
 from .modular_vibevoice_text_tokenizer import VibeVoiceTextTokenizer, VibeVoiceTextTokenizerFast
 from .modeling_vibevoice_streaming import VibeVoiceStreamingPreTrainedModel, VibeVoiceStreamingModel, BinaryClassifier
-from .streamer import AudioStreamer, AsyncAudioStreamer
+from .streamer import AudioStreamer, AsyncAudioStreamer, TextInputStreamer
 
 logger = logging.get_logger(__name__)
 
@@ -30,6 +37,315 @@ TTS_TEXT_WINDOW_SIZE = 5
 TTS_SPEECH_WINDOW_SIZE = 6
 
 
+@dataclass
+class TTSWindowState:
+    """
+    Progress snapshot handed to a `TTSWindowPolicy` whenever `generate` needs a window size.
+
+    Args:
+        window_index (`int`):
+            Index of the text window the size is requested for.
+        text_window_size (`int`):
+            Text tokens prefilled for `window_index` (0 while that size is still being decided, or
+            once the text is exhausted).
+        prefilled_text_tokens (`int`):
+            Text tokens already fed to the LM.
+        remaining_text_tokens (`int`):
+            Text tokens not yet assigned to a window.
+        generated_speech_tokens (`int`):
+            Speech latents sampled so far.
+        generated_audio_samples (`int`):
+            Decoded audio samples produced so far.
+        elapsed_sec (`float`):
+            Wall-clock seconds since `generate` started.
+    """
+    window_index: int
+    text_window_size: int
+    prefilled_text_tokens: int
+    remaining_text_tokens: int
+    generated_speech_tokens: int
+    generated_audio_samples: int
+    elapsed_sec: float
+
+
+class TTSWindowPolicy:
+    """
+    Decides how many text tokens are prefilled per window and how many speech latents are sampled after it.
+
+    The base policy returns fixed sizes, which reproduces the original `TTS_TEXT_WINDOW_SIZE` /
+    `TTS_SPEECH_WINDOW_SIZE` behaviour. Subclasses can override `text_window_size` and
+    `speech_window_size` to vary the windows during an utterance.
+    """
+
+    def __init__(self, text_window_size: int = TTS_TEXT_WINDOW_SIZE, speech_window_size: int = TTS_SPEECH_WINDOW_SIZE):
+        if text_window_size <= 0 or speech_window_size <= 0:
+            raise ValueError("Window sizes must be positive integers.")
+        self.text_window = text_window_size
+        self.speech_window = speech_window_size
+
+    def text_window_size(self, state: TTSWindowState) -> int:
+        """Number of text tokens to prefill for window `state.window_index`."""
+        return self.text_window
+
+    def speech_window_size(self, state: TTSWindowState) -> int:
+        """Number of speech latents to sample after text window `state.window_index`."""
+        return self.speech_window
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(text={self.text_window}, speech={self.speech_window})"
+
+
+class AdaptiveTTSWindowPolicy(TTSWindowPolicy):
+    """
+    Small first text window for a fast first chunk, larger windows once playback has a safe lead.
+
+    The text window grows linearly from `text_window_size` to `max_text_window_size` as the
+    generated audio gets ahead of wall-clock time (up to `target_lead_sec`). The speech window keeps
+    the trained speech/text ratio (`TTS_SPEECH_WINDOW_SIZE / TTS_TEXT_WINDOW_SIZE`) of the chosen text
+    window, so larger windows only trade latency for fewer, larger LM steps.
+
+    Args:
+        first_text_window_size (`int`, defaults to 2):
+            Text tokens in the first window, which bounds the time to first audio.
+        text_window_size (`int`, defaults to `TTS_TEXT_WINDOW_SIZE`):
+            Text window used while the stream is at or behind real time.
+        max_text_window_size (`int`, defaults to 10):
+            Text window used once the stream is `target_lead_sec` ahead of real time.
+        target_lead_sec (`float`, defaults to 2.0):
+            Real-time lead at which the largest windows are used.
+        sample_rate (`int`, defaults to 24000):
+            Sample rate of the decoded audio, used to convert samples into seconds.
+    """
+
+    def __init__(
+        self,
+        first_text_window_size: int = 2,
+        text_window_size: int = TTS_TEXT_WINDOW_SIZE,
+        max_text_window_size: int = 10,
+        target_lead_sec: float = 2.0,
+        sample_rate: int = 24000,
+    ):
+        super().__init__(text_window_size=text_window_size)
+        if first_text_window_size <= 0 or max_text_window_size < text_window_size:
+            raise ValueError("Expected 0 < first_text_window_size and text_window_size <= max_text_window_size.")
+        self.first_text_window_size = first_text_window_size
+        self.max_text_window_size = max_text_window_size
+        self.target_lead_sec = target_lead_sec
+        self.sample_rate = sample_rate
+        self.speech_text_ratio = TTS_SPEECH_WINDOW_SIZE / TTS_TEXT_WINDOW_SIZE
+
+    def _lead_sec(self, state: TTSWindowState) -> float:
+        return state.generated_audio_samples / self.sample_rate - state.elapsed_sec
+
+    def text_window_size(self, state: TTSWindowState) -> int:
+        if state.window_index == 0:
+            return self.first_text_window_size
+        if self.target_lead_sec <= 0:
+            return self.max_text_window_size
+        fraction = min(max(self._lead_sec(state) / self.target_lead_sec, 0.0), 1.0)
+        return self.text_window + round(fraction * (self.max_text_window_size - self.text_window))
+
+    def speech_window_size(self, state: TTSWindowState) -> int:
+        # Once the text is exhausted, keep the default speech window until EOS.
+        if state.text_window_size == 0:
+            return self.speech_window
+        return max(1, round(state.text_window_size * self.speech_text_ratio))
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(first={self.first_text_window_size}, text={self.text_window}, "
+            f"max_text={self.max_text_window_size}, target_lead_sec={self.target_lead_sec})"
+        )
+
+
+@dataclass
+class GenerationRequest:
+    """
+    Sampling options of one `generate` call.
+
+    `generate` builds its own noise scheduler from these options instead of configuring the one on the
+    model, so concurrent calls with different settings can share a model. Unset fields fall back to the
+    model defaults.
+
+    Args:
+        inference_steps (`int`, *optional*):
+            Diffusion steps per speech latent (defaults to the model's `ddpm_inference_steps`).
+        cfg_scale (`float`, defaults to 1.0):
+            Classifier-free guidance scale for speech diffusion.
+        sampler (`Dict[str, Any]`, *optional*):
+            Overrides of the model's noise scheduler config, e.g.
+            `{"algorithm_type": "sde-dpmsolver++", "beta_schedule": "squaredcos_cap_v2"}`.
+        tts_text_window_size (`int`, *optional*):
+            Text tokens per window (defaults to `TTS_TEXT_WINDOW_SIZE`).
+        tts_speech_window_size (`int`, *optional*):
+            Speech latents per window (defaults to `TTS_SPEECH_WINDOW_SIZE`).
+        window_policy (`TTSWindowPolicy`, *optional*):
+            Policy deciding window sizes during the utterance. Overrides the two fixed sizes above.
+        seed (`int`, *optional*):
+            Seed of every noise draw of the diffusion head. Unseeded if None.
+    """
+    inference_steps: Optional[int] = None
+    cfg_scale: float = 1.0
+    sampler: Optional[Dict[str, Any]] = None
+    tts_text_window_size: Optional[int] = None
+    tts_speech_window_size: Optional[int] = None
+    window_policy: Optional[TTSWindowPolicy] = None
+    seed: Optional[int] = None
+
+
+class GenerationPreemption:
+    """
+    Lets a scheduler suspend a running `generate` call at its next text-window boundary and resume it later.
+
+    After `request_suspend`, generation finishes its current window and parks its state: the KV caches of the
+    four streams, the acoustic decoder's streaming cache and the audio decoded so far move to host memory, or
+    to a file in `park_dir` if given, so the device is free for other requests. `on_suspended` (passed to
+    `request_suspend`) is then called from the generation thread, which blocks until `resume()` (or until
+    generation is stopped). The state is moved back and generation continues where it stopped: nothing is
+    recomputed, and the noise scheduler and seeded generator are untouched, so the audio is the same as
+    without the pause. `resume()` before the boundary is reached calls the suspension off.
+    `request_suspend` and `resume` may be called from any thread.
+
+    Args:
+        park_dir (`str`, *optional*):
+            Directory for parked state. Parked state stays in host memory if None.
+    """
+
+    def __init__(self, park_dir: Optional[str] = None):
+        self.park_dir = park_dir
+        self.suspensions = 0
+        self.suspended_sec = 0.0
+        self.parked_bytes = 0
+        self._lock = threading.Lock()
+        self._requested = False
+        self._on_suspended: Optional[Callable[[], None]] = None
+        self._resumed = threading.Event()
+
+    @property
+    def suspend_requested(self) -> bool:
+        return self._requested
+
+    def request_suspend(self, on_suspended: Optional[Callable[[], None]] = None) -> None:
+        with self._lock:
+            self._requested = True
+            self._on_suspended = on_suspended
+            self._resumed.clear()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._requested = False
+            self._resumed.set()
+
+    def checkpoint(self, slots: List[Tuple[Any, Any]], stop_check_fn: Optional[Callable[[], bool]] = None, poll_interval: float = 0.1) -> float:
+        """
+        Called by `generate` at a window boundary with the `(container, key)` slots holding its device state.
+        If a suspension was requested, parks the tensors, waits to be resumed and restores them.
+        Returns the seconds spent suspended (0.0 if generation went on right away).
+        """
+        with self._lock:
+            if not self._requested:
+                return 0.0
+            on_suspended = self._on_suspended
+        start = time.perf_counter()
+        devices = [container[key].device for container, key in slots]
+        parked = [container[key].to("cpu") for container, key in slots]
+        self.parked_bytes = sum(tensor.numel() * tensor.element_size() for tensor in parked)
+        path = None
+        if self.park_dir is not None:
+            fd, path = tempfile.mkstemp(prefix="vibevoice-parked-", suffix=".pt", dir=self.park_dir)
+            os.close(fd)
+            torch.save(parked, path)
+            parked = None
+        # Drop the device copies; the containers hold the host copies (or nothing while on disk) meanwhile.
+        for i, (container, key) in enumerate(slots):
+            container[key] = parked[i] if parked is not None else None
+        self.suspensions += 1
+        if on_suspended is not None:
+            on_suspended()
+
+        while not self._resumed.wait(poll_interval):
+            if stop_check_fn is not None and stop_check_fn():
+                break
+
+        if path is not None:
+            parked = torch.load(path, map_location="cpu")
+            os.remove(path)
+        for (container, key), tensor, device in zip(slots, parked, devices):
+            container[key] = tensor.to(device)
+        suspended_sec = time.perf_counter() - start
+        self.suspended_sec += suspended_sec
+        return suspended_sec
+
+
+def _preemption_slots(caches: List[Any], acoustic_cache: VibeVoiceTokenizerStreamingCache, audio_chunks: List[List[torch.Tensor]]) -> List[Tuple[Any, Any]]:
+    """The `(container, key)` slots of the device state parked by `GenerationPreemption.checkpoint`."""
+    slots = []
+    for cache in caches:
+        for layer_idx in range(len(cache.key_cache)):
+            slots.append((cache.key_cache, layer_idx))
+            slots.append((cache.value_cache, layer_idx))
+    slots.extend((acoustic_cache.cache, key) for key in list(acoustic_cache.cache))
+    for chunks in audio_chunks:
+        slots.extend((chunks, index) for index in range(len(chunks)))
+    return slots
+
+
+class _LazyEOSChecks:
+    """
+    EOS decisions that are read back from the device lazily instead of with one `.item()` per speech token.
+
+    Every flag starts a non-blocking device-to-host copy. Flags are resolved as soon as their copy has
+    landed, and the host only blocks once `check_interval` flags are outstanding. Items produced after
+    the oldest unresolved flag are held back, so anything generated past EOS can be dropped.
+    """
+
+    def __init__(self, check_interval: int = 1):
+        self.check_interval = max(1, int(check_interval))
+        self.flags = deque()  # (host flag, copy-done event or None)
+        self.held = deque()
+
+    def hold(self, item: Any) -> bool:
+        """Hold `item` until earlier flags are resolved. Returns False if it can be released right away."""
+        if not self.flags:
+            return False
+        self.held.append(item)
+        return True
+
+    def add_flag(self, flag: torch.Tensor) -> None:
+        if flag.device.type == "cuda":
+            host_flag = flag.to("cpu", non_blocking=True)
+            ready = torch.cuda.Event()
+            ready.record()
+        else:
+            host_flag, ready = flag, None
+        self.flags.append((host_flag, ready))
+
+    def poll(self, block: bool = False) -> Tuple[List[Any], bool, int]:
+        """
+        Resolve landed flags (all of them if `block` or the interval is reached).
+
+        Returns:
+            (items safe to release, whether EOS was hit, number of held items dropped after EOS)
+        """
+        block = block or len(self.flags) >= self.check_interval
+        released = []
+        while self.flags:
+            host_flag, ready = self.flags[0]
+            if ready is not None and not ready.query():
+                if not block:
+                    break
+                ready.synchronize()
+            self.flags.popleft()
+            if bool(host_flag):
+                dropped = len(self.held)
+                self.flags.clear()
+                self.held.clear()
+                return released, True, dropped
+            if self.held:
+                released.append(self.held.popleft())
+        return released, False, 0
+
+
 def _update_model_kwargs_for_generation(
     outputs: ModelOutput,
     model_kwargs: Dict[str, Any],
@@ -57,6 +373,93 @@ def _update_model_kwargs_for_generation(
     return model_kwargs
 
 
+def _rerotate_keys(keys: torch.Tensor, delta: int, rotary_emb: nn.Module) -> torch.Tensor:
+    """Move RoPE-rotated keys `delta` positions back (i.e. apply the rotation of position -delta)."""
+    position_ids = torch.full((1, 1), delta, dtype=torch.long, device=keys.device)
+    cos, sin = rotary_emb(keys.float(), position_ids)
+    scaling = getattr(rotary_emb, "attention_scaling", 1.0)
+    cos = (cos / scaling).unsqueeze(1)
+    sin = (sin / scaling).unsqueeze(1)
+    keys_fp32 = keys.float()
+    return (keys_fp32 * cos - rotate_half(keys_fp32) * sin).to(keys.dtype)
+
+
+def _evict_kv_window(
+    model_kwargs: Dict[str, Any],
+    input_ids: torch.LongTensor,
+    cache_sink_length: int,
+    ids_sink_length: int,
+    window_size: int,
+    rotary_emb: nn.Module,
+) -> torch.LongTensor:
+    """
+    Sliding-window KV eviction with an attention sink, for long-form generation.
+
+    Keeps the first `cache_sink_length` cache entries (the voice prompt) and at most `window_size`
+    recent entries. Eviction happens in chunks of a quarter window so the copy cost is amortized.
+    Kept keys are re-rotated so the cache stays contiguous in position space, and the attention mask,
+    `cache_position` and `input_ids` are compacted by the same amount, so positions derived from them
+    in `prepare_inputs_for_generation` keep matching the cache. The mask is compacted by dropping
+    its first columns, which assumes batch size 1 without padding (asserted by `generate`).
+
+    Args:
+        model_kwargs: kwargs of one of the four streams (holds `past_key_values`, `attention_mask`, `cache_position`).
+        input_ids: ids of the same stream, aligned with `attention_mask`.
+        cache_sink_length: cache entries of the prefilled prompt that are never evicted.
+        ids_sink_length: `input_ids` / `attention_mask` entries that belong to the prefilled prompt.
+        window_size: maximum number of entries kept after the sink.
+        rotary_emb: rotary embedding module of the transformer that owns the cache.
+
+    Returns:
+        The compacted `input_ids` (unchanged if nothing was evicted).
+    """
+    cache = model_kwargs["past_key_values"]
+    cache_length = cache.get_seq_length()
+    if cache_length - cache_sink_length <= window_size:
+        return input_ids
+
+    num_evict = cache_length - cache_sink_length - (window_size - window_size // 4)
+    for layer_idx in range(len(cache.key_cache)):
+        keys = cache.key_cache[layer_idx]
+        values = cache.value_cache[layer_idx]
+        # Assign new tensors rather than editing in place: the originals may be shared with a cached voice prompt.
+        cache.key_cache[layer_idx] = torch.cat(
+            [keys[:, :, :cache_sink_length], _rerotate_keys(keys[:, :, cache_sink_length + num_evict:], num_evict, rotary_emb)],
+            dim=-2,
+        )
+        cache.value_cache[layer_idx] = torch.cat(
+            [values[:, :, :cache_sink_length], values[:, :, cache_sink_length + num_evict:]], dim=-2
+        )
+    if hasattr(cache, "_seen_tokens"):
+        cache._seen_tokens = cache.get_seq_length()
+
+    model_kwargs["attention_mask"] = model_kwargs["attention_mask"][:, num_evict:]
+    model_kwargs["cache_position"] = model_kwargs["cache_position"] - num_evict
+    return torch.cat([input_ids[:, :ids_sink_length], input_ids[:, ids_sink_length + num_evict:]], dim=-1)
+
+
+def clone_prefilled_outputs(all_prefilled_outputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cheap per-request copy of a voice preset for `generate(all_prefilled_outputs=...)`.
+
+    `generate` never writes into the preset's tensors: `DynamicCache.update` concatenates into new
+    tensors and KV eviction assigns new ones. Copying the containers (outputs, caches and their
+    per-layer lists) is therefore enough to keep the cached preset intact, and costs microseconds
+    where `copy.deepcopy` copies every key and value tensor of the prompt.
+    """
+    cloned = {}
+    for name, output in all_prefilled_outputs.items():
+        output = type(output)(**dict(output.items()))
+        cache = output.get("past_key_values")
+        if cache is not None and hasattr(cache, "key_cache"):
+            cache = copy.copy(cache)
+            cache.key_cache = list(cache.key_cache)
+            cache.value_cache = list(cache.value_cache)
+            output["past_key_values"] = cache
+        cloned[name] = output
+    return cloned
+
+
 @dataclass
 class VibeVoiceCausalLMOutputWithPast(BaseModelOutputWithPast):
     logits: Optional[torch.FloatTensor] = None
@@ -155,8 +558,14 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
         self.model.set_speech_tokenizers(acoustic_tokenizer)
     
     def set_ddpm_inference_steps(self, num_steps=None):
+        """Default diffusion steps of requests that do not set `GenerationRequest.inference_steps`."""
         self.ddpm_inference_steps = num_steps or self.config.diffusion_head_config.ddpm_num_inference_steps
 
+    def make_noise_scheduler(self, sampler: Optional[Dict[str, Any]] = None):
+        """A private copy of the model's noise scheduler, with `sampler` overriding entries of its config."""
+        scheduler = self.model.noise_scheduler
+        return type(scheduler).from_config(scheduler.config, **(sampler or {}))
+
     # @can_return_tuple
     def forward_lm(
         self,
@@ -410,6 +819,17 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
         return_speech: bool = True,
         cfg_scale: float = 1.0,
         stop_check_fn: Optional[Callable[[], bool]] = None,
+        tts_text_window_size: Optional[int] = None,
+        tts_speech_window_size: Optional[int] = None,
+        window_policy: Optional[TTSWindowPolicy] = None,
+        eos_check_interval: int = 1,
+        long_form: bool = False,
+        long_form_window_size: Optional[int] = None,
+        seed: Optional[int] = None,
+        text_streamer: Optional[TextInputStreamer] = None,
+        stage_callback: Optional[Callable[[str, float, int], None]] = None,
+        generation_request: Optional[GenerationRequest] = None,
+        preemption: Optional[GenerationPreemption] = None,
         **kwargs,
     ) -> Union[torch.LongTensor, VibeVoiceGenerationOutput]:
         """
@@ -423,10 +843,38 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
 
         Args (selected):
             tts_text_ids: Full text tokens to stream in windows.
-            audio_streamer: If provided, emits audio chunks during generation.
+            audio_streamer: If provided, emits audio chunks during generation. Generation pauses between windows
+                while the streamer's buffer is full (`max_buffered_sec`).
             cfg_scale: Classifier-free guidance scale for speech diffusion.
             return_speech: If False, skips audio decode concatenation.
             stop_check_fn: External early-stop hook (returns True to halt).
+            tts_text_window_size: Text tokens per window (defaults to `TTS_TEXT_WINDOW_SIZE`).
+            tts_speech_window_size: Speech latents per window (defaults to `TTS_SPEECH_WINDOW_SIZE`).
+            window_policy: `TTSWindowPolicy` deciding window sizes during the utterance. Overrides the two fixed sizes above.
+            eos_check_interval: Maximum number of speech tokens whose EOS decision may still be in flight on the device.
+                1 keeps the exact per-token check; larger values avoid a host sync per token and trim the (at most
+                `eos_check_interval - 1`) frames generated past EOS. Held frames reach `audio_streamer` once resolved.
+            long_form: Lift the `max_position_embeddings` limit. The LM and TTS LM caches keep the voice prompt
+                (attention sink) plus a rolling window of recent entries, so memory and per-token cost stay constant.
+                `sequences` then only holds the prompt plus the current window.
+            long_form_window_size: Cache entries kept after the voice prompt in long-form mode
+                (defaults to half of the context left after the prompt).
+            seed: Seed of every noise draw of the diffusion head (initial noise and SDE scheduler noise), making the
+                output reproducible for the same inputs, settings and device. Unseeded if None.
+            text_streamer: `TextInputStreamer` delivering the text while it is being written; replaces `tts_text_ids`.
+                Generation starts as soon as the first text window is available. When the next window is not
+                complete yet, the current speech window is generated first and `generate` then waits for the text
+                (or `text_streamer.end()`). Windows are the same as for the complete text.
+            stage_callback: Called as `stage_callback(stage, seconds, num_tokens)` after each model stage: "lm" (text
+                window prefill), "tts_lm" (TTS LM step, positive and negative pass), "diffusion" and "decode" (per
+                speech latent). Times are host wall-clock from `time.perf_counter`; on CUDA, kernels are queued
+                asynchronously, so a stage may include device work queued by earlier ones. Keep it cheap: it runs
+                on the generation thread.
+            generation_request: `GenerationRequest` with the sampling options of this call (diffusion steps, sampler,
+                cfg scale, windows, seed). Replaces `cfg_scale`, the window arguments and `seed`. Diffusion runs on a
+                scheduler private to the call, so the model itself is never reconfigured per request.
+            preemption: `GenerationPreemption` through which a scheduler can suspend this call between text windows,
+                parking its caches off the device until it is resumed.
 
         Returns:
             VibeVoiceGenerationOutput with:
@@ -442,7 +890,8 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
         tts_lm_attention_mask = kwargs.pop("tts_lm_attention_mask", None)
         # all_prefilled_outputs: cached prefilled prompt outputs for lm, tts_lm, neg_lm, neg_tts_lm
         all_prefilled_outputs = kwargs.pop("all_prefilled_outputs", None)
-        tts_text_ids = tts_text_ids.to(self.device)
+        if text_streamer is None:
+            tts_text_ids = tts_text_ids.to(self.device)
 
         if kwargs.get('max_new_tokens', None) is None:
             kwargs['max_new_tokens'] = self.config.decoder_config.max_position_embeddings - tts_lm_input_ids.shape[-1]
@@ -480,16 +929,91 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
 
         acoustic_cache = VibeVoiceTokenizerStreamingCache()
         batch_size = input_ids.shape[0]
-        assert batch_size == 1, "Currently only supports batch size == 1"
+        assert batch_size == 1, (
+            "Currently only supports batch size == 1: long-form KV eviction drops attention-mask columns "
+            "from the front, which is only valid for a single sequence without padding"
+        )
         device = input_ids.device
         finished_tags = torch.zeros(batch_size, dtype=torch.bool, device=device)
+        # Host-side mirror of `finished_tags` so control flow never waits on the device.
+        finished = [False] * batch_size
+        eos_checks = _LazyEOSChecks(eos_check_interval)
         verbose = kwargs.get("verbose", False)
 
+        if generation_request is None:
+            generation_request = GenerationRequest(
+                cfg_scale=cfg_scale,
+                tts_text_window_size=tts_text_window_size,
+                tts_speech_window_size=tts_speech_window_size,
+                window_policy=window_policy,
+                seed=seed,
+            )
+        cfg_scale = generation_request.cfg_scale
+        seed = generation_request.seed
+        window_policy = generation_request.window_policy
+        if window_policy is None:
+            window_policy = TTSWindowPolicy(
+                text_window_size=generation_request.tts_text_window_size or TTS_TEXT_WINDOW_SIZE,
+                speech_window_size=generation_request.tts_speech_window_size or TTS_SPEECH_WINDOW_SIZE,
+            )
+        # Scheduler state (timesteps, multistep history) belongs to this call, not to the shared model.
+        noise_scheduler = self.make_noise_scheduler(generation_request.sampler)
+        inference_steps = generation_request.inference_steps or self.ddpm_inference_steps
+
         # Initialize audio chunks storage for each sample
         audio_chunks = [[] for _ in range(batch_size)]
         tts_text_window_index = 0
+        tts_text_offset = 0
+        text_complete = text_streamer is None
+        if text_streamer is not None:
+            tts_text_ids = torch.zeros((batch_size, 0), dtype=torch.long, device=device)
+        total_text_tokens = tts_text_ids.shape[1]
         reach_max_step_sample = torch.zeros(batch_size, dtype=torch.bool, device=device)
-        first_text_window_size = TTS_TEXT_WINDOW_SIZE if tts_text_ids.shape[1] >= TTS_TEXT_WINDOW_SIZE else tts_text_ids.shape[1]
+
+        step = tts_lm_input_ids.shape[1]
+        total_generated_speech_tokens = 0
+        total_prefilled_text_tokens = 0
+        generated_audio_samples = 0
+        generation_start_time = time.perf_counter()
+
+        def window_state(window_index: int, text_window_size: int = 0) -> TTSWindowState:
+            return TTSWindowState(
+                window_index=window_index,
+                text_window_size=text_window_size,
+                prefilled_text_tokens=total_prefilled_text_tokens,
+                remaining_text_tokens=total_text_tokens - tts_text_offset,
+                generated_speech_tokens=total_generated_speech_tokens,
+                generated_audio_samples=generated_audio_samples,
+                elapsed_sec=time.perf_counter() - generation_start_time,
+            )
+
+        def refresh_text(min_tokens: int = 0) -> None:
+            # Pick up streamed text; blocks until `min_tokens` tokens exist (or the text ended / generation stopped).
+            nonlocal tts_text_ids, total_text_tokens, text_complete
+            if text_complete:
+                return
+            token_ids, text_complete = text_streamer.wait_for_tokens(min_tokens, stop_check_fn)
+            if len(token_ids) > total_text_tokens:
+                tts_text_ids = torch.tensor([token_ids], dtype=torch.long, device=device)
+                total_text_tokens = tts_text_ids.shape[1]
+
+        def report_stage(stage: str, seconds: float, num_tokens: int = 1) -> None:
+            if stage_callback is not None:
+                stage_callback(stage, seconds, num_tokens)
+
+        def emit_audio(chunk: torch.Tensor, sample_indices: torch.Tensor) -> None:
+            for i, idx in enumerate(sample_indices.tolist()):
+                # Only append audio chunk if the sample is not finished
+                if not finished[idx]:
+                    audio_chunks[idx].append(chunk[i])
+            if audio_streamer is not None:
+                audio_streamer.put(chunk, sample_indices)
+
+        refresh_text()
+        first_text_window_size = max(1, window_policy.text_window_size(window_state(0)))
+        refresh_text(first_text_window_size)
+        first_text_window_size = min(first_text_window_size, total_text_tokens)
+        cur_text_window_size = first_text_window_size
 
         outputs = all_prefilled_outputs["lm"]
         tts_lm_outputs = all_prefilled_outputs["tts_lm"]
@@ -509,12 +1033,27 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
             tts_lm_negative_outputs, tts_lm_negative_model_kwargs, is_encoder_decoder=False,
         )
 
-        step = tts_lm_input_ids.shape[1]
-        total_generated_speech_tokens = 0
-        total_prefilled_text_tokens = 0
+        # A CPU generator gives the same noise on every device; draws are moved to the model device afterwards.
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+
+        if long_form:
+            # Sink lengths: the prefilled voice prompt of each stream is never evicted.
+            lm_sink_length = input_ids.shape[1]
+            tts_lm_sink_length = tts_lm_input_ids.shape[1]
+            tts_lm_negative_cache_sink_length = tts_lm_negative_outputs.past_key_values.get_seq_length()
+            tts_lm_negative_ids_sink_length = tts_lm_negative_input_ids.shape[1]
+            # Room for one text window plus one speech window on top of the kept entries.
+            available_length = tts_lm_generation_config.max_length - max(tts_lm_sink_length, lm_sink_length) - 64
+            if long_form_window_size is None:
+                long_form_window_size = available_length // 2
+            if not 0 < long_form_window_size <= available_length:
+                raise ValueError(
+                    f"long_form_window_size must be in (0, {available_length}] for this voice prompt, got {long_form_window_size}."
+                )
+
         if kwargs.get("show_progress_bar", True):
             progress_bar = tqdm(
-                total=tts_lm_generation_config.max_length,
+                total=None if long_form else tts_lm_generation_config.max_length,
                 desc=f"Prefilled {step} tokens, current step ({step} / {tts_lm_generation_config.max_length})",
                 initial=step,
                 leave=False
@@ -523,6 +1062,18 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
             progress_bar = None
 
         while True:
+            # Backpressure: hold the next window while a consumer is behind (see `AudioStreamer.max_buffered_sec`).
+            if audio_streamer is not None and hasattr(audio_streamer, "wait_for_capacity"):
+                audio_streamer.wait_for_capacity(stop_check_fn)
+
+            # Preemption: higher-priority work may take the device between windows (see `GenerationPreemption`).
+            if preemption is not None and preemption.suspend_requested and not all(finished):
+                streams = (model_kwargs, tts_lm_model_kwargs, negative_model_kwargs, tts_lm_negative_model_kwargs)
+                caches = [stream_kwargs["past_key_values"] for stream_kwargs in streams]
+                suspended_sec = preemption.checkpoint(_preemption_slots(caches, acoustic_cache, audio_chunks), stop_check_fn)
+                if verbose:
+                    print(f"Generation suspended for {suspended_sec:.2f}s at step {step}")
+
             # Check for external stop signal
             if stop_check_fn is not None and stop_check_fn():
                 if verbose:
@@ -539,13 +1090,43 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
             #             print(f"Audio generation stopped externally at step {step + 1}")
             #         break
             
-            if finished_tags.all():
+            if all(finished):
                 if hasattr(progress_bar, 'set_description'):
                     progress_bar.set_description("Generation complete")
                 break
 
-            cur_input_tts_text_ids = tts_text_ids[:, tts_text_window_index*TTS_TEXT_WINDOW_SIZE:(tts_text_window_index+1)*TTS_TEXT_WINDOW_SIZE]
-            next_text_window_size = tts_text_ids[:, (tts_text_window_index+1)*TTS_TEXT_WINDOW_SIZE:(tts_text_window_index+2)*TTS_TEXT_WINDOW_SIZE].shape[1]
+            if long_form:
+                input_ids = _evict_kv_window(
+                    model_kwargs, input_ids, lm_sink_length, lm_sink_length,
+                    long_form_window_size, self.model.language_model.rotary_emb,
+                )
+                tts_lm_input_ids = _evict_kv_window(
+                    tts_lm_model_kwargs, tts_lm_input_ids, tts_lm_sink_length, tts_lm_sink_length,
+                    long_form_window_size, self.model.tts_language_model.rotary_emb,
+                )
+                tts_lm_negative_input_ids = _evict_kv_window(
+                    tts_lm_negative_model_kwargs, tts_lm_negative_input_ids,
+                    tts_lm_negative_cache_sink_length, tts_lm_negative_ids_sink_length,
+                    long_form_window_size, self.model.tts_language_model.rotary_emb,
+                )
+
+            cur_input_tts_text_ids = tts_text_ids[:, tts_text_offset:tts_text_offset + cur_text_window_size]
+            tts_text_offset += cur_input_tts_text_ids.shape[1]
+            desired_next_text_window_size = max(1, window_policy.text_window_size(window_state(tts_text_window_index + 1)))
+            refresh_text()
+            # With streamed text, an incomplete next window is settled after the speech window (see below).
+            next_window_pending = (
+                not text_complete
+                and cur_input_tts_text_ids.shape[1] > 0
+                and total_text_tokens - tts_text_offset < desired_next_text_window_size
+            )
+            next_text_window_size = 0 if next_window_pending else min(
+                desired_next_text_window_size, total_text_tokens - tts_text_offset,
+            )
+            speech_window_size = max(
+                1, window_policy.speech_window_size(window_state(tts_text_window_index, cur_input_tts_text_ids.shape[1]))
+            )
+            cur_text_window_size = next_text_window_size
             tts_text_window_index += 1
 
             if cur_input_tts_text_ids.shape[1] > 0:
@@ -567,39 +1148,50 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
                     progress_bar.set_description(f"Prefilled {total_prefilled_text_tokens} text tokens, generated {total_generated_speech_tokens} speech tokens, current step ({step} / {tts_lm_generation_config.max_length})")
 
                 model_inputs = self.prepare_inputs_for_generation(input_ids, **model_kwargs)
+                stage_start = time.perf_counter()
                 # Forward pass through the model
                 outputs = self.forward_lm(
                     **model_inputs, return_dict=True, output_attentions=False, output_hidden_states=False,
                 )
-                model_kwargs = _update_model_kwargs_for_generation(
-                    outputs, model_kwargs, num_new_tokens=next_text_window_size,
-                )
+                report_stage("lm", time.perf_counter() - stage_start, cur_input_tts_text_ids.shape[1])
+                if not next_window_pending:
+                    model_kwargs = _update_model_kwargs_for_generation(
+                        outputs, model_kwargs, num_new_tokens=next_text_window_size,
+                    )
 
                 tts_lm_model_inputs = self.prepare_inputs_for_generation(tts_lm_input_ids, **tts_lm_model_kwargs)
                 tts_lm_additional_inputs = {
                     "tts_text_masks": torch.ones_like(tts_lm_input_ids[:, -1:]),
                     "lm_last_hidden_state": outputs.last_hidden_state,
                 }
+                stage_start = time.perf_counter()
                 # Forward pass through the model
                 tts_lm_outputs = self.forward_tts_lm(
                     **tts_lm_model_inputs, **tts_lm_additional_inputs, return_dict=True, output_attentions=False, output_hidden_states=False,
                 )
+                report_stage("tts_lm", time.perf_counter() - stage_start, cur_input_tts_text_ids.shape[1])
                 tts_lm_model_kwargs = self._update_model_kwargs_for_generation(
                     tts_lm_outputs, tts_lm_model_kwargs, is_encoder_decoder=False,
                 )
 
             diffusion_indices = torch.LongTensor([0])
-            for cur_speech_index in range(TTS_SPEECH_WINDOW_SIZE):
+            for cur_speech_index in range(speech_window_size):
                 positive_condition = tts_lm_outputs.last_hidden_state[diffusion_indices, -1, :]
                 negative_condition = tts_lm_negative_outputs.last_hidden_state[diffusion_indices, -1, :]
                 
+                stage_start = time.perf_counter()
                 speech_latent = self.sample_speech_tokens(
                     positive_condition,
                     negative_condition,
                     cfg_scale=cfg_scale,
+                    generator=generator,
+                    noise_scheduler=noise_scheduler,
+                    inference_steps=inference_steps,
                 ).unsqueeze(1)
+                report_stage("diffusion", time.perf_counter() - stage_start)
                                 
                 # Decode acoustic latent to audio using acoustic streaming cache
+                stage_start = time.perf_counter()
                 scaled_latent = speech_latent / self.model.speech_scaling_factor.to(speech_latent.device) - self.model.speech_bias_factor.to(speech_latent.device)
                 audio_chunk = self.model.acoustic_tokenizer.decode(
                     scaled_latent.to(self.model.acoustic_tokenizer.device),
@@ -608,18 +1200,13 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
                     use_cache=True,
                     debug=False
                 )
+                report_stage("decode", time.perf_counter() - stage_start)
                 
-                # Store audio chunks for each sample
-                for i, sample_idx in enumerate(diffusion_indices):
-                    idx = sample_idx.item()
-                    # Only append audio chunk if the sample is not finished
-                    if not finished_tags[idx]:
-                        audio_chunks[idx].append(audio_chunk[i])
-
-                 # Add streaming support here
-                if audio_streamer is not None:
-                    # Stream the audio chunks immediately
-                    audio_streamer.put(audio_chunk, diffusion_indices)
+                generated_audio_samples += audio_chunk.shape[-1]
+
+                # Store / stream the chunk now unless an earlier EOS decision is still in flight
+                if not eos_checks.hold((audio_chunk, diffusion_indices)):
+                    emit_audio(audio_chunk, diffusion_indices)
 
                 acoustic_embed = self.model.acoustic_connector(speech_latent)
                 tts_lm_input_ids = torch.cat([tts_lm_input_ids, torch.ones_like(tts_lm_input_ids[:, -1:])], dim=-1)
@@ -638,11 +1225,23 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
                     "tts_text_masks": torch.zeros_like(tts_lm_input_ids[:, -1:]),
                     "lm_last_hidden_state": acoustic_embed,
                 }
+                stage_start = time.perf_counter()
                 # Forward pass through the model
                 tts_lm_outputs = self.forward_tts_lm(
                     **tts_lm_model_inputs, **tts_lm_additional_inputs, return_dict=True, output_attentions=False, output_hidden_states=False,
                 )
-                if cur_speech_index == TTS_SPEECH_WINDOW_SIZE - 1 and next_text_window_size > 0:
+                tts_lm_sec = time.perf_counter() - stage_start
+                if cur_speech_index == speech_window_size - 1 and next_window_pending:
+                    # The audio of this window is out; now wait for the text of the next one.
+                    refresh_text(tts_text_offset + desired_next_text_window_size)
+                    next_text_window_size = min(desired_next_text_window_size, total_text_tokens - tts_text_offset)
+                    cur_text_window_size = next_text_window_size
+                    next_window_pending = False
+                    if next_text_window_size > 0:
+                        model_kwargs = _update_model_kwargs_for_generation(
+                            outputs, model_kwargs, num_new_tokens=next_text_window_size,
+                        )
+                if cur_speech_index == speech_window_size - 1 and next_text_window_size > 0:
                     tts_lm_model_kwargs = _update_model_kwargs_for_generation(
                         tts_lm_outputs, tts_lm_model_kwargs, num_new_tokens=next_text_window_size,
                     )
@@ -658,19 +1257,30 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
                     "tts_text_masks": torch.zeros_like(tts_lm_negative_input_ids[:, -1:]),
                     "lm_last_hidden_state": acoustic_embed,
                 }
+                stage_start = time.perf_counter()
                 tts_lm_negative_outputs = self.forward_tts_lm(
                     **tts_lm_negative_model_inputs, **tts_lm_negative_additional_inputs, return_dict=True, output_attentions=False, output_hidden_states=False,
                 )
+                report_stage("tts_lm", tts_lm_sec + time.perf_counter() - stage_start)
                 tts_lm_negative_model_kwargs = self._update_model_kwargs_for_generation(
                     tts_lm_negative_outputs, tts_lm_negative_model_kwargs, is_encoder_decoder=False,
                 )
 
                 tts_eos_logits = torch.sigmoid(self.tts_eos_classifier(tts_lm_outputs.last_hidden_state[diffusion_indices, -1, :]))
-                if tts_eos_logits[0].item() > 0.5:
+                eos_checks.add_flag(tts_eos_logits[0, 0] > 0.5)
+                released_audio, eos_reached, dropped_frames = eos_checks.poll()
+                for held_chunk, held_indices in released_audio:
+                    emit_audio(held_chunk, held_indices)
+                if eos_reached:
                     # If EOS token is predicted, we can stop generation for this sample
+                    if verbose and dropped_frames:
+                        print(f"Trimmed {dropped_frames} speech frames generated after EOS")
                     finished_tags[diffusion_indices] = True
+                    for idx in diffusion_indices.tolist():
+                        finished[idx] = True
                     if audio_streamer is not None:
                         audio_streamer.end(diffusion_indices)
+                    break
 
             if tts_lm_input_ids.shape[1] > tts_lm_generation_config.max_length:
                 if verbose:
@@ -680,6 +1290,13 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
                     reach_max_step_sample[reached_samples] = True
                 break
 
+        # Resolve EOS decisions still in flight and flush (or trim) the frames held behind them
+        released_audio, eos_reached, _ = eos_checks.poll(block=True)
+        for held_chunk, held_indices in released_audio:
+            emit_audio(held_chunk, held_indices)
+        if eos_reached:
+            finished_tags[:] = True
+
         if audio_streamer is not None:
             audio_streamer.end()
 
@@ -704,18 +1321,34 @@ class VibeVoiceStreamingForConditionalGenerationInference(VibeVoiceStreamingPreT
         )
 
     @torch.no_grad()
-    def sample_speech_tokens(self, condition, neg_condition, cfg_scale=3.0):
-        self.model.noise_scheduler.set_timesteps(self.ddpm_inference_steps)
+    def sample_speech_tokens(
+        self,
+        condition,
+        neg_condition,
+        cfg_scale=3.0,
+        generator: Optional[torch.Generator] = None,
+        noise_scheduler=None,
+        inference_steps: Optional[int] = None,
+    ):
+        # Without a `noise_scheduler` (see `make_noise_scheduler`) the one on the model is used, which is
+        # not safe for concurrent calls.
+        if noise_scheduler is None:
+            noise_scheduler = self.model.noise_scheduler
+        noise_scheduler.set_timesteps(inference_steps or self.ddpm_inference_steps)
         condition = torch.cat([condition, neg_condition], dim=0).to(self.model.prediction_head.device)
-        speech = torch.randn(condition.shape[0], self.config.acoustic_vae_dim).to(condition)
-        for t in self.model.noise_scheduler.timesteps:
+        if generator is None:
+            speech = torch.randn(condition.shape[0], self.config.acoustic_vae_dim, device=condition.device, dtype=condition.dtype)
+        else:
+            # Seeded requests draw from a CPU generator so the noise is the same on every device.
+            speech = torch.randn(condition.shape[0], self.config.acoustic_vae_dim, generator=generator).to(condition)
+        for t in noise_scheduler.timesteps:
             half = speech[: len(speech) // 2]
             combined = torch.cat([half, half], dim=0)
             eps = self.model.prediction_head(combined, t.repeat(combined.shape[0]).to(combined), condition=condition)
             cond_eps, uncond_eps = torch.split(eps, len(eps) // 2, dim=0)
             half_eps = uncond_eps + cfg_scale * (cond_eps - uncond_eps)
             eps = torch.cat([half_eps, half_eps], dim=0)
-            speech = self.model.noise_scheduler.step(eps, t, speech).prev_sample
+            speech = noise_scheduler.step(eps, t, speech, generator=generator).prev_sample
         return speech[: len(speech) // 2]
     
 
@@ -723,4 +1356,9 @@ AutoModelForCausalLM.register(VibeVoiceStreamingConfig, VibeVoiceStreamingForCon
 
 __all__ = [
     "VibeVoiceStreamingForConditionalGenerationInference",
+    "TTSWindowPolicy",
+    "AdaptiveTTSWindowPolicy",
+    "TTSWindowState",
+    "GenerationRequest",
+    "clone_prefilled_outputs",
 ]
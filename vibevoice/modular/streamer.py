@@ -3,13 +3,65 @@ from __future__ import annotations
 import torch
 
 import asyncio
-from queue import Queue
+import threading
+import time
+import unicodedata
+from collections import deque
+from queue import Empty, Queue
 from typing import TYPE_CHECKING, Optional
 
 
 from transformers.generation import BaseStreamer
 
 
+class _HostAudioChunk:
+    """Audio chunk whose device-to-host copy may still be in flight."""
+
+    __slots__ = ("tensor", "ready")
+
+    def __init__(self, tensor: torch.Tensor, ready):
+        self.tensor = tensor
+        self.ready = ready
+
+    def wait(self) -> torch.Tensor:
+        self.ready.synchronize()
+        return self.tensor
+
+
+def _copy_to_host(audio_chunk: torch.Tensor):
+    """
+    Move a chunk to the CPU without blocking the generation thread.
+
+    On CUDA the copy is issued with `non_blocking=True` and the consumer waits on an event
+    (see `_wait_for_host`), so `generate` does not sync the device for every streamed chunk.
+    """
+    audio_chunk = audio_chunk.detach()
+    if audio_chunk.device.type != "cuda":
+        return audio_chunk.cpu()
+    host_chunk = audio_chunk.to("cpu", non_blocking=True)
+    ready = torch.cuda.Event()
+    ready.record()
+    return _HostAudioChunk(host_chunk, ready)
+
+
+def _num_samples(value) -> int:
+    tensor = value.tensor if isinstance(value, _HostAudioChunk) else value
+    return tensor.shape[-1] if tensor.dim() > 0 else 1
+
+
+def _wait_for_host(value):
+    return value.wait() if isinstance(value, _HostAudioChunk) else value
+
+
+async def _await_host(value):
+    """`_wait_for_host` for event loops: polls the copy event instead of blocking the loop on it."""
+    if not isinstance(value, _HostAudioChunk):
+        return value
+    while not value.ready.query():
+        await asyncio.sleep(0.0005)
+    return value.tensor
+
+
 class AudioStreamer(BaseStreamer):
     """
     Audio streamer that stores audio chunks in queues for each sample in the batch.
@@ -22,6 +74,12 @@ class AudioStreamer(BaseStreamer):
             The signal to put in the queue when generation ends. Defaults to None.
         timeout (`float`, *optional*):
             The timeout for the audio queue. If `None`, the queue will block indefinitely.
+        max_buffered_sec (`float`, *optional*):
+            Bound on the audio a stream may hold before its consumer reads it. When any unfinished stream
+            is full, `generate` pauses between speech windows (see `wait_for_capacity`) until the consumer
+            catches up, so memory per stream stays flat. Unbounded if `None`.
+        sample_rate (`int`, *optional*):
+            Sample rate used to convert `max_buffered_sec` to samples. Defaults to 24000.
     """
     
     def __init__(
@@ -29,16 +87,95 @@ class AudioStreamer(BaseStreamer):
         batch_size: int,
         stop_signal: Optional[any] = None,
         timeout: Optional[float] = None,
+        max_buffered_sec: Optional[float] = None,
+        sample_rate: int = 24000,
     ):
         self.batch_size = batch_size
         self.stop_signal = stop_signal
         self.timeout = timeout
+        self.max_buffered_sec = max_buffered_sec
+        self.sample_rate = sample_rate
+        # Backpressure accounting, guarded by `_capacity`.
+        self._capacity = threading.Condition()
+        self.buffered_samples = [0] * batch_size
+        self.peak_buffered_samples = [0] * batch_size
+        self.pause_count = 0
+        self.pause_sec = 0.0
         
         # Create a queue for each sample in the batch
         self.audio_queues = [Queue() for _ in range(batch_size)]
         self.finished_flags = [False for _ in range(batch_size)]
         self.sample_indices_map = {}  # Maps from sample index to queue index
+        # Shared queue of sample indices with a pending value, created when batch iteration starts.
+        self._ready_queue = None
         
+    def _add_buffered(self, idx: int, num_samples: int):
+        with self._capacity:
+            self.buffered_samples[idx] += num_samples
+            self.peak_buffered_samples[idx] = max(self.peak_buffered_samples[idx], self.buffered_samples[idx])
+
+    def _consumed(self, idx: int, value):
+        with self._capacity:
+            self.buffered_samples[idx] -= _num_samples(value)
+            self._capacity.notify_all()
+
+    def wait_for_capacity(self, stop_check_fn=None, poll_interval: float = 0.1) -> float:
+        """
+        Block the producer while any unfinished stream buffers `max_buffered_sec` or more.
+
+        `stop_check_fn` is polled every `poll_interval` seconds so a consumer that went away
+        releases the producer. Returns the seconds spent waiting.
+        """
+        if self.max_buffered_sec is None:
+            return 0.0
+        limit = int(self.max_buffered_sec * self.sample_rate)
+        start = None
+        with self._capacity:
+            while any(
+                not self.finished_flags[idx] and self.buffered_samples[idx] >= limit
+                for idx in range(self.batch_size)
+            ):
+                if stop_check_fn is not None and stop_check_fn():
+                    break
+                if start is None:
+                    start = time.perf_counter()
+                    self.pause_count += 1
+                self._capacity.wait(poll_interval)
+            if start is None:
+                return 0.0
+            waited = time.perf_counter() - start
+            self.pause_sec += waited
+        return waited
+
+    def backpressure_stats(self) -> dict:
+        """Buffer and pause statistics; a consumer that made generation pause is reading slower than real time."""
+        with self._capacity:
+            return {
+                "buffered_sec": [n / self.sample_rate for n in self.buffered_samples],
+                "peak_buffered_sec": [n / self.sample_rate for n in self.peak_buffered_samples],
+                "max_buffered_sec": self.max_buffered_sec,
+                "pause_count": self.pause_count,
+                "pause_sec": self.pause_sec,
+            }
+
+    def _notify_ready(self, idx: int):
+        ready_queue = self._ready_queue
+        if ready_queue is not None:
+            ready_queue.put(idx)
+
+    def _enable_ready_queue(self) -> Queue:
+        """
+        Start tagging every queued value with its sample index in one shared queue, so a batch
+        consumer can block on a single queue. Values queued before this call are tagged here.
+        A value put concurrently may get two tags; consumers skip tags whose queue is empty.
+        """
+        if self._ready_queue is None:
+            self._ready_queue = Queue()
+            for idx, audio_queue in enumerate(self.audio_queues):
+                for _ in range(audio_queue.qsize()):
+                    self._ready_queue.put(idx)
+        return self._ready_queue
+
     def put(self, audio_chunks: torch.Tensor, sample_indices: torch.Tensor):
         """
         Receives audio chunks and puts them in the appropriate queues.
@@ -50,9 +187,10 @@ class AudioStreamer(BaseStreamer):
         for i, sample_idx in enumerate(sample_indices):
             idx = sample_idx.item()
             if idx < self.batch_size and not self.finished_flags[idx]:
-                # Convert to numpy or keep as tensor based on preference
-                audio_chunk = audio_chunks[i].detach().cpu()
+                audio_chunk = _copy_to_host(audio_chunks[i])
+                self._add_buffered(idx, _num_samples(audio_chunk))
                 self.audio_queues[idx].put(audio_chunk, timeout=self.timeout)
+                self._notify_ready(idx)
     
     def end(self, sample_indices: Optional[torch.Tensor] = None):
         """
@@ -67,6 +205,7 @@ class AudioStreamer(BaseStreamer):
                 if not self.finished_flags[idx]:
                     self.audio_queues[idx].put(self.stop_signal, timeout=self.timeout)
                     self.finished_flags[idx] = True
+                    self._notify_ready(idx)
         else:
             # End specific samples
             for sample_idx in sample_indices:
@@ -74,6 +213,7 @@ class AudioStreamer(BaseStreamer):
                 if idx < self.batch_size and not self.finished_flags[idx]:
                     self.audio_queues[idx].put(self.stop_signal, timeout=self.timeout)
                     self.finished_flags[idx] = True
+                    self._notify_ready(idx)
     
     def __iter__(self):
         """Returns an iterator over the batch of audio streams."""
@@ -100,51 +240,59 @@ class AudioSampleIterator:
         value = self.streamer.audio_queues[self.sample_idx].get(timeout=self.streamer.timeout)
         if value == self.streamer.stop_signal:
             raise StopIteration()
-        return value
+        self.streamer._consumed(self.sample_idx, value)
+        return _wait_for_host(value)
 
 
 class AudioBatchIterator:
-    """Iterator that yields audio chunks for all samples in the batch."""
+    """
+    Iterator that yields audio chunks for all samples in the batch.
+
+    Blocks on the streamer's shared ready queue and wakes as soon as any sample produces a value.
+    Each step returns a dict with at most one chunk per sample: the first ready one plus whatever
+    else is already queued.
+    """
     
     def __init__(self, streamer: AudioStreamer):
         self.streamer = streamer
         self.active_samples = set(range(streamer.batch_size))
+        self.ready_queue = streamer._enable_ready_queue()
+        # Tags of samples that already had a chunk in the returned batch, served first next time.
+        self.deferred = deque()
         
     def __iter__(self):
         return self
     
     def __next__(self):
-        if not self.active_samples:
-            raise StopIteration()
-            
         batch_chunks = {}
-        samples_to_remove = set()
-        
-        # Try to get chunks from all active samples
-        for idx in self.active_samples:
+        deferred_now = []
+        while self.active_samples and len(batch_chunks) < len(self.active_samples):
+            if self.deferred:
+                idx = self.deferred.popleft()
+            elif not batch_chunks:
+                idx = self.ready_queue.get(timeout=self.streamer.timeout)
+            else:
+                try:
+                    idx = self.ready_queue.get_nowait()
+                except Empty:
+                    break
+            if idx in batch_chunks:
+                deferred_now.append(idx)
+                continue
             try:
-                value = self.streamer.audio_queues[idx].get(block=False)
-                if value == self.streamer.stop_signal:
-                    samples_to_remove.add(idx)
-                else:
-                    batch_chunks[idx] = value
-            except:
-                # Queue is empty for this sample, skip it this iteration
-                pass
-        
-        # Remove finished samples
-        self.active_samples -= samples_to_remove
-        
+                value = self.streamer.audio_queues[idx].get_nowait()
+            except Empty:
+                continue
+            if value == self.streamer.stop_signal:
+                self.active_samples.discard(idx)
+            else:
+                self.streamer._consumed(idx, value)
+                batch_chunks[idx] = _wait_for_host(value)
+        self.deferred.extend(deferred_now)
+
         if batch_chunks:
             return batch_chunks
-        elif self.active_samples:
-            # If no chunks were ready but we still have active samples, 
-            # wait a bit and try again
-            import time
-            time.sleep(0.01)
-            return self.__next__()
-        else:
-            raise StopIteration()
+        raise StopIteration()
 
 
 class AsyncAudioStreamer(AudioStreamer):
@@ -157,21 +305,37 @@ class AsyncAudioStreamer(AudioStreamer):
         batch_size: int,
         stop_signal: Optional[any] = None,
         timeout: Optional[float] = None,
+        max_buffered_sec: Optional[float] = None,
+        sample_rate: int = 24000,
     ):
-        super().__init__(batch_size, stop_signal, timeout)
+        super().__init__(batch_size, stop_signal, timeout, max_buffered_sec, sample_rate)
         # Replace regular queues with async queues
         self.audio_queues = [asyncio.Queue() for _ in range(batch_size)]
         self.loop = asyncio.get_running_loop()
         
+    def _put_on_loop(self, idx: int, value):
+        # Runs on the event loop, so the sample queue and the ready queue change together.
+        self.audio_queues[idx].put_nowait(value)
+        if self._ready_queue is not None:
+            self._ready_queue.put_nowait(idx)
+
+    def _enable_ready_queue(self) -> asyncio.Queue:
+        """See `AudioStreamer._enable_ready_queue`; must be called on the event loop."""
+        if self._ready_queue is None:
+            self._ready_queue = asyncio.Queue()
+            for idx, audio_queue in enumerate(self.audio_queues):
+                for _ in range(audio_queue.qsize()):
+                    self._ready_queue.put_nowait(idx)
+        return self._ready_queue
+
     def put(self, audio_chunks: torch.Tensor, sample_indices: torch.Tensor):
         """Put audio chunks in the appropriate async queues."""
         for i, sample_idx in enumerate(sample_indices):
             idx = sample_idx.item()
             if idx < self.batch_size and not self.finished_flags[idx]:
-                audio_chunk = audio_chunks[i].detach().cpu()
-                self.loop.call_soon_threadsafe(
-                    self.audio_queues[idx].put_nowait, audio_chunk
-                )
+                audio_chunk = _copy_to_host(audio_chunks[i])
+                self._add_buffered(idx, _num_samples(audio_chunk))
+                self.loop.call_soon_threadsafe(self._put_on_loop, idx, audio_chunk)
     
     def end(self, sample_indices: Optional[torch.Tensor] = None):
         """Signal the end of generation for specified samples."""
@@ -182,9 +346,7 @@ class AsyncAudioStreamer(AudioStreamer):
             
         for idx in indices_to_end:
             if idx < self.batch_size and not self.finished_flags[idx]:
-                self.loop.call_soon_threadsafe(
-                    self.audio_queues[idx].put_nowait, self.stop_signal
-                )
+                self.loop.call_soon_threadsafe(self._put_on_loop, idx, self.stop_signal)
                 self.finished_flags[idx] = True
     
     async def get_stream(self, sample_idx: int):
@@ -196,7 +358,8 @@ class AsyncAudioStreamer(AudioStreamer):
             value = await self.audio_queues[sample_idx].get()
             if value == self.stop_signal:
                 break
-            yield value
+            self._consumed(sample_idx, value)
+            yield await _await_host(value)
     
     def __aiter__(self):
         """Returns an async iterator over all audio streams."""
@@ -204,61 +367,128 @@ class AsyncAudioStreamer(AudioStreamer):
 
 
 class AsyncAudioBatchIterator:
-    """Async iterator for batch audio streaming."""
+    """Async iterator for batch audio streaming, driven by the streamer's shared ready queue (see `AudioBatchIterator`)."""
     
     def __init__(self, streamer: AsyncAudioStreamer):
         self.streamer = streamer
         self.active_samples = set(range(streamer.batch_size))
+        self.ready_queue = streamer._enable_ready_queue()
+        self.deferred = deque()
         
     def __aiter__(self):
         return self
         
     async def __anext__(self):
-        if not self.active_samples:
-            raise StopAsyncIteration()
-            
         batch_chunks = {}
-        samples_to_remove = set()
-        
-        # Create tasks for all active samples
-        tasks = {
-            idx: asyncio.create_task(self._get_chunk(idx)) 
-            for idx in self.active_samples
-        }
-        
-        # Wait for at least one chunk to be ready
-        done, pending = await asyncio.wait(
-            tasks.values(), 
-            return_when=asyncio.FIRST_COMPLETED,
-            timeout=self.streamer.timeout
-        )
-        
-        # Cancel pending tasks
-        for task in pending:
-            task.cancel()
-            
-        # Process completed tasks
-        for idx, task in tasks.items():
-            if task in done:
+        deferred_now = []
+        while self.active_samples and len(batch_chunks) < len(self.active_samples):
+            if self.deferred:
+                idx = self.deferred.popleft()
+            elif not batch_chunks:
+                if self.streamer.timeout is None:
+                    idx = await self.ready_queue.get()
+                else:
+                    idx = await asyncio.wait_for(self.ready_queue.get(), self.streamer.timeout)
+            else:
                 try:
-                    value = await task
-                    if value == self.streamer.stop_signal:
-                        samples_to_remove.add(idx)
-                    else:
-                        batch_chunks[idx] = value
-                except asyncio.CancelledError:
-                    pass
-                    
-        self.active_samples -= samples_to_remove
-        
+                    idx = self.ready_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            if idx in batch_chunks:
+                deferred_now.append(idx)
+                continue
+            try:
+                value = self.streamer.audio_queues[idx].get_nowait()
+            except asyncio.QueueEmpty:
+                continue
+            if value == self.streamer.stop_signal:
+                self.active_samples.discard(idx)
+            else:
+                self.streamer._consumed(idx, value)
+                batch_chunks[idx] = await _await_host(value)
+        self.deferred.extend(deferred_now)
+
         if batch_chunks:
             return batch_chunks
-        elif self.active_samples:
-            # Try again if we still have active samples
-            return await self.__anext__()
-        else:
-            raise StopAsyncIteration()
-    
-    async def _get_chunk(self, idx):
-        """Helper to get a chunk from a specific queue."""
-        return await self.streamer.audio_queues[idx].get()
\ No newline at end of file
+        raise StopAsyncIteration()
+
+
+class TextInputStreamer:
+    """
+    Text arriving in pieces (e.g. tokens of an LLM response), tokenized incrementally for
+    `generate(text_streamer=...)` so speech can start before the whole text is known.
+
+    Text is only tokenized up to the last boundary the tokenizer never merges across (a single space
+    between two words, or punctuation right after a letter or digit, which also covers scripts written
+    without spaces). The token ids are therefore the same as tokenizing the complete text at once
+    (`text.strip() + "\\n"`, like the processor). The tail is tokenized by `end()`.
+    `put` and `end` may be called from any thread.
+
+    Parameters:
+        tokenizer:
+            The text tokenizer of the processor (`processor.tokenizer`).
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._pending_text = ""
+        self._token_ids = []
+        self._finished = False
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def _stable_prefix_length(text: str) -> int:
+        for i in range(len(text) - 2, 0, -1):
+            char, previous = text[i], text[i - 1]
+            if char == " " and not previous.isspace() and not text[i + 1].isspace():
+                return i
+            if previous.isalnum() and unicodedata.category(char).startswith("P"):
+                return i
+        return 0
+
+    def put(self, text: str):
+        """Append a piece of text; complete words become available to `generate`."""
+        with self._condition:
+            if self._finished:
+                raise RuntimeError("TextInputStreamer.put() called after end()")
+            self._pending_text += text
+            if not self._token_ids:
+                # Leading whitespace is stripped, as for a complete text.
+                self._pending_text = self._pending_text.lstrip()
+            cut = self._stable_prefix_length(self._pending_text)
+            if cut > 0:
+                self._token_ids.extend(self.tokenizer.encode(self._pending_text[:cut], add_special_tokens=False))
+                self._pending_text = self._pending_text[cut:]
+                self._condition.notify_all()
+
+    def end(self):
+        """Mark the text as complete and tokenize the remainder."""
+        with self._condition:
+            if self._finished:
+                return
+            tail = self._pending_text.rstrip() if self._token_ids else self._pending_text.strip()
+            self._token_ids.extend(self.tokenizer.encode(tail + "\n", add_special_tokens=False))
+            self._pending_text = ""
+            self._finished = True
+            self._condition.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def token_ids(self) -> tuple:
+        """Returns `(token_ids, finished)`: a copy of the ids tokenized so far and whether the text is complete."""
+        with self._condition:
+            return list(self._token_ids), self._finished
+
+    def wait_for_tokens(self, count: int, stop_check_fn=None, poll_interval: float = 0.1) -> tuple:
+        """
+        Block until at least `count` tokens are available or the text is complete, then return `token_ids()`.
+        `stop_check_fn` is polled every `poll_interval` seconds so a stopped request does not wait for text forever.
+        """
+        with self._condition:
+            while len(self._token_ids) < count and not self._finished:
+                if stop_check_fn is not None and stop_check_fn():
+                    break
+                self._condition.wait(poll_interval)
+            return list(self._token_ids), self._finished
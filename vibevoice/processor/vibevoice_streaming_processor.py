@@ -90,9 +90,14 @@ class VibeVoiceStreamingProcessor:
         db_normalize = config.get("db_normalize", True)
         
         # Load tokenizer - try from model path first, then fallback to Qwen        
-        language_model_pretrained_name = config.get("language_model_pretrained_name", None) or kwargs.pop("language_model_pretrained_name", "Qwen/Qwen2.5-1.5B")
+        language_model_pretrained_name = config.get("language_model_pretrained_name", None) or kwargs.pop("language_model_pretrained_name", None)
+        if language_model_pretrained_name is None:
+            if os.path.exists(os.path.join(pretrained_model_name_or_path, "tokenizer_config.json")):
+                language_model_pretrained_name = pretrained_model_name_or_path
+            else:
+                language_model_pretrained_name = "Qwen/Qwen2.5-1.5B"
         logger.info(f"Loading tokenizer from {language_model_pretrained_name}")
-        if 'qwen' in language_model_pretrained_name.lower():
+        if language_model_pretrained_name == pretrained_model_name_or_path or 'qwen' in language_model_pretrained_name.lower():
             tokenizer = VibeVoiceTextTokenizerFast.from_pretrained(
                 language_model_pretrained_name,
                 **kwargs
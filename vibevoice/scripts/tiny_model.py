@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Build a tiny VibeVoice-Realtime checkpoint with seeded random weights.
+
+The checkpoint keeps the interfaces of the real model -- 24 kHz audio in 3200-sample chunks, the
+split Qwen2 language model, the four prefilled voice caches -- at a size that runs on a laptop CPU
+in seconds. It produces noise rather than speech, so it is only useful to exercise `generate`, the
+demo server and the benchmarks offline:
+
+    python -m vibevoice.scripts.tiny_model --output_dir outputs/tiny_model
+    python demo/vibevoice_realtime_demo.py --model_path outputs/tiny_model --device cpu
+
+Random weights know nothing about when an utterance is over, so the end-of-speech classifier is
+calibrated to fire with a fixed probability per generated frame: utterance lengths are random
+(geometric, `1 / eos_rate` frames on average) rather than following the text.
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import torch
+from transformers.modeling_outputs import BaseModelOutputWithPast
+from transformers.utils import logging
+
+from vibevoice.modular.configuration_vibevoice_streaming import VibeVoiceStreamingConfig
+from vibevoice.modular.modeling_vibevoice_streaming_inference import VibeVoiceStreamingForConditionalGenerationInference
+from vibevoice.modular.modular_vibevoice_text_tokenizer import VibeVoiceTextTokenizerFast
+from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+from vibevoice.processor.vibevoice_tokenizer_processor import VibeVoiceTokenizerProcessor
+
+logger = logging.get_logger(__name__)
+
+# Byte-level vocabulary plus the Qwen2 special tokens the VibeVoice tokenizer looks up by name
+SPECIAL_TOKENS = ["<|endoftext|>", "<|image_pad|>", "<|vision_start|>", "<|vision_end|>", "<|vision_pad|>"]
+VOICE_NAMES = ["en-Tiny_man", "en-Tiny_woman"]
+CALIBRATION_TEXT = "The quick brown fox jumps over the lazy dog while the band keeps playing."
+
+
+def tiny_streaming_config(
+    hidden_size: int = 64,
+    lm_layers: int = 1,
+    tts_layers: int = 2,
+    vae_dim: int = 16,
+    n_filters: int = 4,
+) -> VibeVoiceStreamingConfig:
+    """
+    Config of a tiny streaming model. The acoustic tokenizer keeps the real ratios so that one
+    latent still decodes to 3200 samples at 24 kHz; everything else is shrunk.
+    """
+    decoder_config = {
+        "model_type": "qwen2",
+        "vocab_size": 256 + len(SPECIAL_TOKENS),
+        "hidden_size": hidden_size,
+        "intermediate_size": 2 * hidden_size,
+        "num_hidden_layers": lm_layers + tts_layers,
+        "num_attention_heads": 4,
+        "num_key_value_heads": 2,
+        "max_position_embeddings": 8192,
+        "rope_theta": 1000000.0,
+        "tie_word_embeddings": True,
+    }
+    acoustic_tokenizer_config = {
+        "vae_dim": vae_dim,
+        "encoder_n_filters": n_filters,
+        "decoder_n_filters": n_filters,
+        "encoder_ratios": [8, 5, 5, 4, 2, 2],
+        "encoder_depths": "1-1-1-1-1-1-1",
+        "fix_std": 0.5,
+        "std_dist_type": "gaussian",
+    }
+    diffusion_head_config = {
+        "hidden_size": hidden_size,
+        "head_layers": 1,
+        "head_ffn_ratio": 2.0,
+        "latent_size": vae_dim,
+        "speech_vae_dim": vae_dim,
+    }
+    return VibeVoiceStreamingConfig(
+        acoustic_tokenizer_config=acoustic_tokenizer_config,
+        decoder_config=decoder_config,
+        diffusion_head_config=diffusion_head_config,
+        tts_backbone_num_hidden_layers=tts_layers,
+    )
+
+
+def build_tiny_tokenizer() -> VibeVoiceTextTokenizerFast:
+    """Byte-level BPE tokenizer without merges: every UTF-8 byte is one token."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    vocab = {char: i for i, char in enumerate(bytes_to_unicode().values())}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=True)
+    backend.decoder = decoders.ByteLevel()
+    backend.add_special_tokens(SPECIAL_TOKENS)
+    return VibeVoiceTextTokenizerFast(tokenizer_object=backend)
+
+
+def build_tiny_model(config: VibeVoiceStreamingConfig, seed: int = 0) -> VibeVoiceStreamingForConditionalGenerationInference:
+    """Instantiate the inference model with weights drawn from `seed`."""
+    torch.manual_seed(seed)
+    model = VibeVoiceStreamingForConditionalGenerationInference(config)
+    model.model.speech_scaling_factor.fill_(1.0)
+    model.model.speech_bias_factor.fill_(0.0)
+    model.eval()
+    return model
+
+
+@torch.no_grad()
+def make_voice_preset(
+    model: VibeVoiceStreamingForConditionalGenerationInference,
+    tokenizer: VibeVoiceTextTokenizerFast,
+    prompt_tokens: int = 32,
+    speech_frames: int = 24,
+    seed: int = 0,
+) -> Dict[str, BaseModelOutputWithPast]:
+    """
+    Fake voice preset in the layout of `demo/voices/streaming_model/*.pt`: the prefilled outputs
+    (last hidden state and KV cache) of the lm, tts_lm, neg_lm and neg_tts_lm streams. The
+    positive prompt is random text followed by random speech latents; the negative prompts are a
+    single pad token, as in the released presets.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    device = model.device
+    text_ids = torch.randint(0, 256, (1, prompt_tokens), generator=generator).to(device)
+    latents = torch.randn(1, speech_frames, model.config.acoustic_vae_dim, generator=generator).to(device)
+    pad_ids = torch.full((1, 1), tokenizer.pad_id, dtype=torch.long, device=device)
+
+    lm = model.forward_lm(input_ids=text_ids, use_cache=True, return_dict=True)
+    neg_lm = model.forward_lm(input_ids=pad_ids, use_cache=True, return_dict=True)
+
+    type_embed = model.model.tts_input_types.weight
+    text_embeds = lm.last_hidden_state + type_embed[1]
+    speech_embeds = model.model.acoustic_connector(latents) + type_embed[0]
+    tts_lm = model.model.tts_language_model(
+        inputs_embeds=torch.cat([text_embeds, speech_embeds], dim=1), use_cache=True, return_dict=True,
+    )
+    neg_tts_lm = model.model.tts_language_model(
+        inputs_embeds=neg_lm.last_hidden_state + type_embed[1], use_cache=True, return_dict=True,
+    )
+
+    def output(out) -> BaseModelOutputWithPast:
+        return BaseModelOutputWithPast(last_hidden_state=out.last_hidden_state, past_key_values=out.past_key_values)
+
+    return {"lm": output(lm), "tts_lm": output(tts_lm), "neg_lm": output(neg_lm), "neg_tts_lm": output(neg_tts_lm)}
+
+
+@torch.no_grad()
+def calibrate_eos(
+    model: VibeVoiceStreamingForConditionalGenerationInference,
+    processor: VibeVoiceStreamingProcessor,
+    voice_preset: Dict[str, Any],
+    eos_rate: float,
+    frames: int = 240,
+) -> None:
+    """
+    Shift the bias of the end-of-speech classifier so that it fires on about `eos_rate` of the
+    frames: generate `frames` frames with the classifier muted, then put the threshold at the
+    matching quantile of the logits seen.
+    """
+    from vibevoice.modular.modeling_vibevoice_streaming_inference import clone_prefilled_outputs
+
+    fc2 = model.tts_eos_classifier.fc2
+    bias = fc2.bias.clone()
+    logits: List[torch.Tensor] = []
+    hook = fc2.register_forward_hook(lambda module, inputs, out: logits.append((out - module.bias).flatten().float().cpu()))
+    fc2.bias.fill_(-1e4)
+    try:
+        inputs = processor.process_input_with_cached_prompt(
+            text=CALIBRATION_TEXT, cached_prompt=voice_preset, padding=True, return_tensors="pt", return_attention_mask=True,
+        )
+        inputs = {k: v.to(model.device) if torch.is_tensor(v) else v for k, v in inputs.items()}
+        model.generate(
+            **inputs,
+            max_new_tokens=frames,
+            cfg_scale=1.5,
+            tokenizer=processor.tokenizer,
+            generation_config={"do_sample": False},
+            verbose=False,
+            show_progress_bar=False,
+            all_prefilled_outputs=clone_prefilled_outputs(voice_preset),
+        )
+    finally:
+        hook.remove()
+        fc2.bias.copy_(bias)
+    if not logits:
+        raise RuntimeError("EOS calibration saw no speech frames")
+    threshold = torch.quantile(torch.cat(logits), 1.0 - eos_rate)
+    fc2.bias.fill_(-threshold.item())
+    logger.info(f"Calibrated EOS on {len(logits)} frames: fires above logit {threshold.item():.4f}")
+
+
+def build_tiny(
+    seed: int = 0, eos_rate: float = 1 / 60, device: str = "cpu",
+) -> Tuple[VibeVoiceStreamingForConditionalGenerationInference, VibeVoiceStreamingProcessor, Dict[str, Dict[str, Any]]]:
+    """Model, processor and voice presets (by name) of the tiny checkpoint, in memory on `device`."""
+    model = build_tiny_model(tiny_streaming_config(), seed=seed).to(device)
+    processor = VibeVoiceStreamingProcessor(
+        tokenizer=build_tiny_tokenizer(), audio_processor=VibeVoiceTokenizerProcessor(), speech_tok_compress_ratio=3200,
+    )
+    presets = {name: make_voice_preset(model, processor.tokenizer, seed=seed + i) for i, name in enumerate(VOICE_NAMES)}
+    calibrate_eos(model, processor, presets[VOICE_NAMES[0]], eos_rate)
+    return model, processor, presets
+
+
+def build_tiny_checkpoint(output_dir: str, seed: int = 0, eos_rate: float = 1 / 60) -> None:
+    """
+    Write model, tokenizer, processor config and `voices/*.pt` presets to `output_dir`, loadable
+    with the same `from_pretrained` calls as the released checkpoint.
+    """
+    model, processor, presets = build_tiny(seed=seed, eos_rate=eos_rate)
+
+    os.makedirs(os.path.join(output_dir, "voices"), exist_ok=True)
+    model.save_pretrained(output_dir)
+    processor.tokenizer.save_pretrained(output_dir)
+    processor_config = {
+        "processor_class": "VibeVoiceStreamingProcessor",
+        "speech_tok_compress_ratio": 3200,
+        "db_normalize": True,
+        "audio_processor": {
+            "feature_extractor_type": "VibeVoiceTokenizerProcessor",
+            "sampling_rate": 24000,
+            "normalize_audio": True,
+            "target_dB_FS": -25,
+            "eps": 1e-6,
+        },
+    }
+    with open(os.path.join(output_dir, "preprocessor_config.json"), "w") as f:
+        json.dump(processor_config, f, indent=2)
+    for name, preset in presets.items():
+        torch.save(preset, os.path.join(output_dir, "voices", f"{name}.pt"))
+    num_params = sum(p.numel() for p in model.parameters())
+    logger.info(f"Saved tiny model ({num_params / 1e6:.2f}M parameters) and {len(presets)} voices to {output_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a tiny random-weight VibeVoice-Realtime checkpoint for CPU benchmarks")
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default="outputs/tiny_model",
+        help="Directory to write the checkpoint to",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the random weights and voice presets",
+    )
+    parser.add_argument(
+        "--eos_rate",
+        type=float,
+        default=1 / 60,
+        help="Fraction of generated frames on which the end-of-speech classifier fires (mean utterance: 1 / eos_rate frames)",
+    )
+    args = parser.parse_args()
+    if not 0.0 < args.eos_rate < 1.0:
+        parser.error("--eos_rate must be in (0, 1)")
+
+    logging.set_verbosity_info()
+    build_tiny_checkpoint(args.output_dir, seed=args.seed, eos_rate=args.eos_rate)
+
+
+if __name__ == "__main__":
+    main()